@@ -0,0 +1,380 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from guardrails import AWS_REGION, backoff_delays
+from guardrail_client import apply_guardrail, build_request_body, get_runtime_client, parse_guardrail_assessment
+
+# Records per batch job (Bedrock accepts at most 50,000 per job by default and at least 100)
+BATCH_MAX_RECORDS = 50000
+BATCH_MIN_RECORDS = 100
+
+# Batch job statuses after which polling stops
+BATCH_TERMINAL_STATUSES = ["Completed", "PartiallyCompleted", "Failed", "Stopped", "Expired"]
+
+
+def build_batch_records(prompts, model_id, max_tokens=1000):
+    """
+    Converts test prompts into batch inference records.
+
+    :param prompts: Test prompts (category, prompt, optional is_harmful)
+    :param model_id: Model ID
+    :param max_tokens: Maximum number of tokens to generate
+    :return: List of records with recordId (index of the prompt) and modelInput
+    """
+    return [{"recordId": f"{i:08d}", "modelInput": build_request_body(model_id, test['prompt'], max_tokens)}
+            for i, test in enumerate(prompts)]
+
+
+def chunk_records(records, max_records=BATCH_MAX_RECORDS):
+    """
+    Splits records into batch job inputs of at most max_records each.
+
+    :param records: Batch records
+    :param max_records: Maximum records per job
+    :return: List of record lists
+    """
+    return [records[i:i + max_records] for i in range(0, len(records), max_records)]
+
+
+def extract_output_text(model_output):
+    """
+    Extracts the generated text from a batch output record's modelOutput.
+
+    :param model_output: modelOutput of a batch output record
+    :return: Generated text
+    """
+    if 'content' in model_output:
+        return "".join(c.get('text', '') for c in model_output['content'] if c.get('type', 'text') == 'text')
+    for key in ('completion', 'generation', 'outputText'):
+        if key in model_output:
+            return model_output[key]
+    return ""
+
+
+class S3BatchBackend:
+    """
+    Runs batch jobs with Bedrock batch inference (create_model_invocation_job) on S3 input and output files.
+    """
+
+    def __init__(self, s3_uri, role_arn, region=AWS_REGION):
+        """
+        :param s3_uri: S3 prefix for job inputs and outputs (s3://bucket/prefix)
+        :param role_arn: IAM service role Bedrock assumes to read and write the S3 prefix
+        :param region: AWS region
+        """
+        self.s3_uri = s3_uri.rstrip('/')
+        self.bucket, _, self.prefix = self.s3_uri[len("s3://"):].partition('/')
+        self.role_arn = role_arn
+        self.bedrock = boto3.client('bedrock', region_name=region)
+        self.s3 = boto3.client('s3', region_name=region)
+        self.input_files = {}
+
+    def submit(self, job_name, model_id, records):
+        """
+        Uploads the records and starts a batch inference job.
+
+        :return: Job ARN
+        """
+        key = f"{self.prefix}/input/{job_name}.jsonl".lstrip('/')
+        body = "\n".join(json.dumps(record, ensure_ascii=False) for record in records)
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=body.encode('utf-8'))
+
+        response = self.bedrock.create_model_invocation_job(
+            jobName=job_name,
+            roleArn=self.role_arn,
+            modelId=model_id,
+            inputDataConfig={"s3InputDataConfig": {"s3Uri": f"s3://{self.bucket}/{key}", "s3InputFormat": "JSONL"}},
+            outputDataConfig={"s3OutputDataConfig": {"s3Uri": f"{self.s3_uri}/output/"}}
+        )
+        self.input_files[response['jobArn']] = f"{job_name}.jsonl"
+        return response['jobArn']
+
+    def get_status(self, job_id):
+        """
+        :return: Job status (Submitted, InProgress, Completed, ...)
+        """
+        return self.bedrock.get_model_invocation_job(jobIdentifier=job_id)['status']
+
+    def read_outputs(self, job_id):
+        """
+        Downloads the output records of a finished job ({output prefix}/{job ID}/{input file}.out).
+
+        :return: List of output records
+        """
+        key = f"{self.prefix}/output/{job_id.split('/')[-1]}/{self.input_files[job_id]}.out".lstrip('/')
+        body = self.s3.get_object(Bucket=self.bucket, Key=key)['Body'].read().decode('utf-8')
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+
+
+class LocalBatchBackend:
+    """
+    Stand-in for Bedrock batch inference that writes the same input and output files to a local
+    directory and produces the outputs with invoke_model calls.
+
+    Useful for trying the batch path on small prompt sets without S3 or an IAM role.
+    """
+
+    def __init__(self, work_dir, region=AWS_REGION, max_workers=8):
+        """
+        :param work_dir: Directory for input and output files
+        :param region: AWS region
+        :param max_workers: Maximum number of concurrent invoke_model calls
+        """
+        self.work_dir = work_dir
+        self.runtime = get_runtime_client(region)
+        self.max_workers = max_workers
+        os.makedirs(work_dir, exist_ok=True)
+
+    def submit(self, job_name, model_id, records):
+        """
+        Writes the input file and produces the output file right away.
+
+        :return: Job ID (the job name)
+        """
+        input_file = os.path.join(self.work_dir, f"{job_name}.jsonl")
+        with open(input_file, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        def run(record):
+            try:
+                response = self.runtime.invoke_model(modelId=model_id, body=json.dumps(record['modelInput']))
+                return {**record, "modelOutput": json.loads(response['body'].read())}
+            except Exception as e:
+                return {**record, "error": {"errorMessage": str(e)}}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            outputs = list(executor.map(run, records))
+
+        with open(f"{input_file}.out", 'w', encoding='utf-8') as f:
+            for output in outputs:
+                f.write(json.dumps(output, ensure_ascii=False) + "\n")
+        return job_name
+
+    def get_status(self, job_id):
+        return "Completed" if os.path.exists(os.path.join(self.work_dir, f"{job_id}.jsonl.out")) else "InProgress"
+
+    def read_outputs(self, job_id):
+        with open(os.path.join(self.work_dir, f"{job_id}.jsonl.out"), 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+def wait_for_batch_jobs(backend, job_ids, max_wait_time=24 * 60 * 60, initial_delay=10.0, max_delay=300.0):
+    """
+    Polls batch jobs with exponential backoff until all of them finish.
+
+    :param backend: S3BatchBackend or LocalBatchBackend
+    :param job_ids: IDs returned by backend.submit
+    :param max_wait_time: Maximum time to wait in seconds
+    :param initial_delay: First interval between polls in seconds
+    :param max_delay: Largest interval between polls in seconds
+    :return: Dictionary of job ID to last seen status
+    """
+    statuses = {job_id: None for job_id in job_ids}
+    deadline = time.monotonic() + max_wait_time
+    delays = backoff_delays(initial_delay, max_delay)
+
+    while True:
+        for job_id in statuses:
+            if statuses[job_id] not in BATCH_TERMINAL_STATUSES:
+                try:
+                    statuses[job_id] = backend.get_status(job_id)
+                except Exception as e:
+                    print(f"Error checking batch job {job_id}: {str(e)}")
+
+        pending = [job_id for job_id, status in statuses.items() if status not in BATCH_TERMINAL_STATUSES]
+        print(f"Batch jobs: {len(statuses) - len(pending)}/{len(statuses)} finished")
+        if not pending:
+            return statuses
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print("Warning: Maximum wait time exceeded. Some batch jobs are still running.")
+            return statuses
+        time.sleep(min(next(delays), remaining))
+
+
+def check_batch_outputs(outputs, prompts, guardrail_id, guardrail_version="DRAFT", region=AWS_REGION, max_workers=8,
+                        results=None):
+    """
+    Applies the guardrail to batch outputs and converts them into the validator's result schema.
+
+    Batch inference does not run guardrails, so each prompt is checked with ApplyGuardrail
+    (source INPUT) and, if it passes, its response is checked with source OUTPUT. A blocked
+    prompt or response gives guardrail_status 'blocked' with the guardrail's message as the response.
+
+    :param outputs: Output records from the batch jobs
+    :param prompts: Test prompts the records were built from
+    :param guardrail_id: Guardrail ID
+    :param guardrail_version: 'DRAFT' or a published version number
+    :param region: AWS region
+    :param max_workers: Maximum number of concurrent ApplyGuardrail calls
+    :param results: Container to append the results to (a new list if None; pass a ResultStore for large runs)
+    :return: Results (test_id, category, request, response, guardrail_check_time, guardrail_status, ...) in test_id order.
+             response_time is None: batch inference doesn't measure model latency
+    """
+    runtime = get_runtime_client(region)
+
+    def check(output):
+        index = int(output['recordId'])
+        test = prompts[index]
+        result = {
+            "test_id": index + 1,
+            "category": test['category'],
+            "guardrail_version": guardrail_version,
+            "request": test['prompt'],
+            "api": "batch"
+        }
+        if 'is_harmful' in test:
+            result["is_harmful"] = test['is_harmful']
+
+        start_time = time.time()
+        if 'error' in output:
+            result.update({"error": output['error'].get('errorMessage', str(output['error'])),
+                           "response_time": None, "guardrail_check_time": None, "guardrail_status": "error"})
+            return result
+
+        try:
+            source = "INPUT"
+            blocked, text, assessments = apply_guardrail(runtime, guardrail_id, test['prompt'], source,
+                                                         guardrail_version)
+            trace = [parse_guardrail_assessment(a, source) for a in assessments]
+            if not blocked:
+                source = "OUTPUT"
+                blocked, text, assessments = apply_guardrail(runtime, guardrail_id,
+                                                             extract_output_text(output['modelOutput']),
+                                                             source, guardrail_version)
+                trace += [parse_guardrail_assessment(a, source) for a in assessments]
+            result.update({"response": text, "response_time": None, "guardrail_check_time": time.time() - start_time,
+                           "guardrail_status": "blocked" if blocked else "passed"})
+            if trace:
+                result["guardrail_trace"] = {"action_reason": None, "assessments": trace}
+            if blocked:
+                result["blocked_source"] = source
+        except Exception as e:
+            result.update({"error": str(e), "response_time": None, "guardrail_check_time": time.time() - start_time,
+                           "guardrail_status": "error"})
+        return result
+
+    if results is None:
+        results = []
+    outputs = sorted(outputs, key=lambda output: int(output['recordId']))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for result in executor.map(check, outputs):
+            results.append(result)
+    return results
+
+
+def run_batch_test(
+    guardrail_id,
+    prompts,
+    backend,
+    model_id="anthropic.claude-3-sonnet-20240229-v1:0",
+    guardrail_version="DRAFT",
+    max_records=BATCH_MAX_RECORDS,
+    max_wait_time=24 * 60 * 60,
+    poll_interval=10.0,
+    region=AWS_REGION,
+    max_workers=8,
+    results=None
+):
+    """
+    Tests a guardrail on a large prompt set through batch inference.
+
+    :param guardrail_id: Guardrail ID
+    :param prompts: Test prompts
+    :param backend: S3BatchBackend or LocalBatchBackend
+    :param model_id: Model ID
+    :param guardrail_version: 'DRAFT' or a published version number
+    :param max_records: Maximum records per batch job
+    :param max_wait_time: Maximum time to wait for the jobs in seconds
+    :param poll_interval: First interval between job status polls in seconds
+    :param region: AWS region
+    :param max_workers: Maximum number of concurrent ApplyGuardrail calls
+    :param results: Container to append the results to (a new list if None; pass a ResultStore for large runs)
+    :return: Results in the validator's result schema
+    """
+    chunks = chunk_records(build_batch_records(prompts, model_id), max_records)
+    if isinstance(backend, S3BatchBackend) and any(len(chunk) < BATCH_MIN_RECORDS for chunk in chunks):
+        print(f"Warning: Bedrock batch jobs need at least {BATCH_MIN_RECORDS} records; small jobs may be rejected.")
+
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    job_ids = []
+    for number, chunk in enumerate(chunks, 1):
+        job_id = backend.submit(f"guardrail-test-{guardrail_id}-{timestamp}-{number}", model_id, chunk)
+        print(f"Submitted batch job {number}/{len(chunks)} with {len(chunk)} records: {job_id}")
+        job_ids.append(job_id)
+
+    statuses = wait_for_batch_jobs(backend, job_ids, max_wait_time, initial_delay=poll_interval)
+
+    outputs = []
+    for job_id, status in statuses.items():
+        if status in ("Completed", "PartiallyCompleted"):
+            outputs.extend(backend.read_outputs(job_id))
+        else:
+            print(f"Warning: Batch job {job_id} ended with status {status}; its records are skipped.")
+
+    print(f"Checking {len(outputs)} responses with the guardrail...")
+    return check_batch_outputs(outputs, prompts, guardrail_id, guardrail_version, region, max_workers, results)
+
+
+def recheck_output_verdicts(results, guardrail_id, guardrail_version="DRAFT", region=AWS_REGION, max_workers=8):
+    """
+    Re-evaluates recorded model responses with the guardrail's current output policy.
+
+    Each stored response is sent to ApplyGuardrail with source OUTPUT; no model is invoked.
+    Only responses the model actually produced can be re-checked: passed results, and results
+    an earlier re-check blocked (which keep the original response). Every other blocked result
+    keeps its verdict - its response is the guardrail's block message, whether the input
+    (blocked_source INPUT) or the output was blocked. Errors are left unchanged. A result whose
+    ApplyGuardrail call fails keeps its verdict and gets an output_recheck_error note.
+
+    :param results: Results from a test run (test --export or batch)
+    :param guardrail_id: Guardrail ID
+    :param guardrail_version: 'DRAFT' or a published version number
+    :param region: AWS region
+    :param max_workers: Maximum number of concurrent ApplyGuardrail calls
+    :return: (updated results, counts of rechecked/flipped/failed/kept results)
+    """
+    runtime = get_runtime_client(region)
+
+    def recheck(result):
+        response = result.get('response')
+        original_output = result.get('guardrail_status') == 'passed' or (
+            'output_recheck' in result and result.get('blocked_source') == 'OUTPUT')
+        # Compacted results (see guardrail_results) keep only a prefix or a hash of the response
+        if response is None or not original_output or 'response_sha256' in result:
+            return result
+
+        try:
+            blocked, text, _ = apply_guardrail(runtime, guardrail_id, response, "OUTPUT", guardrail_version)
+        except Exception as e:
+            # One failed call (e.g., throttling beyond the retries) must not discard the other re-checks
+            return {**result, "output_recheck_error": str(e)}
+        updated = {**result, "guardrail_status": "blocked" if blocked else "passed",
+                   "output_recheck": {"guardrail_version": str(guardrail_version),
+                                      "previous_guardrail_status": result.get('guardrail_status'),
+                                      "checked_at": time.strftime("%Y-%m-%d %H:%M:%S")}}
+        if blocked:
+            updated["blocked_source"] = "OUTPUT"
+            updated["guardrail_response"] = text
+        else:
+            updated.pop("blocked_source", None)
+            updated.pop("guardrail_response", None)
+        updated.pop("output_recheck_error", None)
+        return updated
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        updated = list(executor.map(recheck, results))
+
+    changed = [new for new, old in zip(updated, results) if new is not old]
+    failed = [r for r in changed if 'output_recheck_error' in r]
+    rechecked = [r for r in changed if 'output_recheck_error' not in r]
+    counts = {
+        "rechecked": len(rechecked),
+        "flipped": sum(1 for r in rechecked if r['guardrail_status'] != r['output_recheck']['previous_guardrail_status']),
+        "failed": len(failed),
+        "kept": len(updated) - len(changed)
+    }
+    return updated, counts
@@ -0,0 +1,405 @@
+import os
+import sys
+import gzip
+import json
+import time
+import base64
+import runpy
+import hashlib
+import argparse
+import threading
+import boto3
+from botocore import UNSIGNED
+from botocore.awsrequest import AWSResponse
+from botocore.httpsession import URLLib3Session
+
+# Cassette file format version
+CASSETTE_VERSION = 1
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when a request has no recorded response left."""
+
+
+def request_key(method, url, body):
+    """
+    Returns the key identifying a request in a cassette (hash of method, URL and body).
+
+    :param method: HTTP method
+    :param url: Request URL
+    :param body: Request body (bytes, str or None)
+    :return: Hex digest
+    """
+    if body is None:
+        body = b""
+    elif isinstance(body, str):
+        body = body.encode('utf-8')
+    elif not isinstance(body, bytes):
+        body = b""
+    return hashlib.sha256(method.encode('utf-8') + b" " + url.encode('utf-8') + b"\n" + body).hexdigest()
+
+
+class _RecordingStream:
+    """
+    Wraps a streamed HTTP response body and records each chunk with its arrival time
+    as the caller reads it, so streaming responses keep their timing while being recorded.
+    """
+
+    def __init__(self, raw, interaction, start_time):
+        self._raw = raw
+        self._interaction = interaction
+        self._start_time = start_time
+
+    def _record(self, data):
+        if data:
+            self._interaction["chunks"].append(base64.b64encode(data).decode('ascii'))
+            self._interaction["offsets"].append(round(time.perf_counter() - self._start_time, 6))
+        return data
+
+    def stream(self, amt=1024, decode_content=None):
+        for data in self._raw.stream(amt, decode_content=decode_content):
+            yield self._record(data)
+
+    def read(self, amt=None, decode_content=None):
+        return self._record(self._raw.read(amt, decode_content=decode_content))
+
+    def close(self):
+        self._raw.close()
+
+
+class _ReplayStream:
+    """
+    Serves recorded chunks of a response body, optionally waiting until each chunk's
+    original arrival time.
+    """
+
+    def __init__(self, chunks, offsets, start_time=None):
+        """
+        :param chunks: Recorded body chunks (bytes)
+        :param offsets: Arrival time of each chunk in seconds after the request was sent
+        :param start_time: perf_counter time the request was sent (None replays at full speed)
+        """
+        self._chunks = list(chunks)
+        self._offsets = list(offsets)
+        self._start_time = start_time
+        self._buffer = b""
+
+    def _next_chunk(self):
+        if not self._chunks:
+            return None
+        offset = self._offsets.pop(0)
+        if self._start_time is not None:
+            delay = self._start_time + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return self._chunks.pop(0)
+
+    def stream(self, amt=1024, decode_content=None):
+        if self._buffer:
+            data, self._buffer = self._buffer, b""
+            yield data
+        while True:
+            data = self._next_chunk()
+            if data is None:
+                return
+            yield data
+
+    def read(self, amt=None, decode_content=None):
+        while amt is None or len(self._buffer) < amt:
+            data = self._next_chunk()
+            if data is None:
+                break
+            self._buffer += data
+        if amt is None:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def close(self):
+        self._chunks = []
+        self._buffer = b""
+
+
+class Cassette:
+    """
+    Records Bedrock HTTP interactions to a cassette file and replays them without network access.
+
+    The cassette hooks into botocore's before-send event, so every client created after
+    install() (bedrock, bedrock-runtime, s3, ...) is covered, including event-stream responses
+    such as invoke_model_with_response_stream and converse_stream. Recorded chunks keep their
+    arrival times, so a replay can run at full speed or with the original timings.
+
+    Requests are matched by a hash of method, URL and body. Requests whose body differs between
+    runs (generated names, timestamps, client tokens) fall back to the next unused interaction
+    of the same operation, in recorded order.
+    """
+
+    def __init__(self, path, mode="replay", timed=False):
+        """
+        :param path: Cassette file path (gzip-compressed JSON)
+        :param mode: 'record' or 'replay'
+        :param timed: In replay mode, wait for the recorded latency and chunk arrival times
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode '{mode}'. Use 'record' or 'replay'.")
+        self.path = path
+        self.mode = mode
+        self.timed = timed
+        self.interactions = []
+        self._by_key = {}
+        self._by_operation = {}
+        self._used = set()
+        self._lock = threading.Lock()
+        self._http_session = None
+        self._emitters = []
+
+        if mode == "replay":
+            self.load()
+
+    def load(self):
+        """
+        Loads the interactions and index of the cassette file.
+        """
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version {data.get('version')} in '{self.path}'.")
+        self.interactions = data["interactions"]
+        self._by_key = {key: list(ids) for key, ids in data["index"]["by_key"].items()}
+        self._by_operation = {op: list(ids) for op, ids in data["index"]["by_operation"].items()}
+        self._used = set()
+
+    def save(self):
+        """
+        Saves the recorded interactions with their index atomically (write to a temporary file, then rename).
+        """
+        with self._lock:
+            by_key, by_operation = {}, {}
+            for i, interaction in enumerate(self.interactions):
+                by_key.setdefault(interaction["key"], []).append(i)
+                by_operation.setdefault(interaction["operation"], []).append(i)
+            data = {
+                "version": CASSETTE_VERSION,
+                "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "index": {"by_key": by_key, "by_operation": by_operation},
+                "interactions": self.interactions
+            }
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_file = f"{self.path}.tmp"
+            with gzip.open(temp_file, 'wt', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_file, self.path)
+
+    def install(self, session=None):
+        """
+        Hooks the cassette into a boto3 session so that every client it creates afterwards
+        records or replays through the cassette.
+
+        :param session: boto3 session (default: the default session used by boto3.client)
+        """
+        if session is None:
+            if boto3.DEFAULT_SESSION is None:
+                boto3.setup_default_session()
+            session = boto3.DEFAULT_SESSION
+        self._register(session.events)
+
+    def attach(self, client):
+        """
+        Hooks the cassette into a client created before install().
+
+        :param client: boto3 client
+        """
+        self._register(client.meta.events)
+
+    def uninstall(self):
+        """
+        Removes the cassette's hooks from every session and client it was registered with.
+        """
+        for events in self._emitters:
+            events.unregister('before-send', self._before_send)
+            events.unregister('choose-signer', self._choose_signer)
+        self._emitters = []
+
+    def _register(self, events):
+        events.register('before-send', self._before_send)
+        if self.mode == "replay":
+            # Replayed requests never leave the process, so no credentials are needed to sign them
+            events.register('choose-signer', self._choose_signer)
+        self._emitters.append(events)
+
+    def _choose_signer(self, **kwargs):
+        return UNSIGNED
+
+    def _before_send(self, request, event_name, **kwargs):
+        operation = event_name.split('.', 1)[1]
+        key = request_key(request.method, request.url, request.body)
+        if self.mode == "record":
+            return self._record(request, operation, key)
+        return self._replay(request, operation, key)
+
+    def _record(self, request, operation, key):
+        with self._lock:
+            if self._http_session is None:
+                self._http_session = URLLib3Session(max_pool_connections=50)
+
+        start_time = time.perf_counter()
+        response = self._http_session.send(request)
+        body = request.body
+        if isinstance(body, bytes):
+            body = body.decode('utf-8', errors='replace')
+        elif not isinstance(body, str):
+            body = None
+
+        interaction = {
+            "operation": operation,
+            "key": key,
+            "method": request.method,
+            "url": request.url,
+            "request_body": body,
+            "status_code": response.status_code,
+            "headers": dict(response.headers),
+            "latency": round(time.perf_counter() - start_time, 6),
+            "chunks": [],
+            "offsets": []
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+
+        if request.stream_output:
+            response.raw = _RecordingStream(response.raw, interaction, start_time)
+        else:
+            # Non-streaming bodies are read by the HTTP session before it returns
+            interaction["chunks"].append(base64.b64encode(response.content).decode('ascii'))
+            interaction["offsets"].append(interaction["latency"])
+        return response
+
+    def _replay(self, request, operation, key):
+        with self._lock:
+            index = self._next_unused(self._by_key.get(key, []))
+            if index is None:
+                index = self._next_unused(self._by_operation.get(operation, []))
+            if index is None:
+                raise CassetteMiss(f"No recorded response left for {operation} {request.url} in '{self.path}'.")
+            self._used.add(index)
+        interaction = self.interactions[index]
+
+        start_time = time.perf_counter()
+        if self.timed:
+            time.sleep(interaction["latency"])
+        chunks = [base64.b64decode(chunk) for chunk in interaction["chunks"]]
+        raw = _ReplayStream(chunks, interaction["offsets"], start_time if self.timed else None)
+        return AWSResponse(request.url, interaction["status_code"], interaction["headers"], raw)
+
+    def _next_unused(self, indexes):
+        for index in indexes:
+            if index not in self._used:
+                return index
+        return None
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.uninstall()
+        if self.mode == "record":
+            self.save()
+        return False
+
+
+def use_cassette(path, mode="replay", timed=False):
+    """
+    Returns a cassette for use as a context manager around code that creates boto3 clients.
+
+    Example:
+        with use_cassette("cassettes/test_run.cassette", mode="record"):
+            test_guardrail(guardrail_id)
+
+    :param path: Cassette file path
+    :param mode: 'record' or 'replay'
+    :param timed: In replay mode, reproduce the recorded timings
+    :return: Cassette
+    """
+    return Cassette(path, mode, timed)
+
+
+def print_cassette(path):
+    """
+    Prints a summary of a cassette's interactions.
+
+    :param path: Cassette file path
+    """
+    cassette = Cassette(path, mode="replay")
+    print(f"\n{len(cassette.interactions)} interactions in '{path}':")
+    print(f"{'#':<5} {'Operation':<48} {'Status':<7} {'Chunks':<7} {'Latency':<9} {'Duration'}")
+    print("-" * 92)
+    for i, interaction in enumerate(cassette.interactions):
+        duration = interaction["offsets"][-1] if interaction["offsets"] else interaction["latency"]
+        print(f"{i:<5} {interaction['operation']:<48} {interaction['status_code']:<7} "
+              f"{len(interaction['chunks']):<7} {interaction['latency']:<9.3f} {duration:.3f}")
+
+
+def run_script(cassette, script, script_args):
+    """
+    Runs a Python script as __main__ with the cassette installed, saving the recording afterwards.
+
+    :param cassette: Cassette
+    :param script: Script path (e.g., guardrail_validator.py)
+    :param script_args: Arguments passed to the script
+    """
+    sys.argv = [script] + list(script_args)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    start_time = time.time()
+    with cassette:
+        try:
+            runpy.run_path(script, run_name="__main__")
+        except SystemExit:
+            pass
+    print(f"\n[cassette] {cassette.mode} of '{cassette.path}' finished in {time.time() - start_time:.2f}s "
+          f"({len(cassette.interactions)} interactions).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record and replay Bedrock interactions of the guardrail tools")
+    subparsers = parser.add_subparsers(dest="command", help="Command to run")
+
+    record_parser = subparsers.add_parser("record", help="Run a script and record its Bedrock interactions")
+    record_parser.add_argument("cassette", help="Cassette file to write")
+    record_parser.add_argument("script", help="Script to run (e.g., guardrail_validator.py)")
+    record_parser.add_argument("script_args", nargs=argparse.REMAINDER, help="Arguments passed to the script")
+
+    replay_parser = subparsers.add_parser("replay", help="Run a script against a recorded cassette, without network")
+    replay_parser.add_argument("cassette", help="Cassette file to replay")
+    replay_parser.add_argument("--timed", action="store_true", help="Reproduce the recorded latencies and chunk timings")
+    replay_parser.add_argument("script", help="Script to run (e.g., guardrail_validator.py)")
+    replay_parser.add_argument("script_args", nargs=argparse.REMAINDER, help="Arguments passed to the script")
+
+    show_parser = subparsers.add_parser("show", help="List the interactions in a cassette")
+    show_parser.add_argument("cassette", help="Cassette file")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "record":
+            run_script(Cassette(args.cassette, mode="record"), args.script, args.script_args)
+        elif args.command == "replay":
+            run_script(Cassette(args.cassette, mode="replay", timed=args.timed), args.script, args.script_args)
+        elif args.command == "show":
+            print_cassette(args.cassette)
+        else:
+            parser.print_help()
+            print("\n\nUsage Examples:")
+            print("  python guardrail_cassette.py record cassettes/test.cassette guardrail_validator.py test 1abc2def3ghi")
+            print("  python guardrail_cassette.py replay cassettes/test.cassette guardrail_validator.py test 1abc2def3ghi")
+            print("  python guardrail_cassette.py replay --timed cassettes/test.cassette guardrail_validator.py test 1abc2def3ghi")
+            print("  python guardrail_cassette.py show cassettes/test.cassette")
+
+    except KeyboardInterrupt:
+        print("\n\nExiting program.")
+    except Exception as e:
+        print(f"\nError occurred: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,637 @@
+import json
+import time
+import asyncio
+import argparse
+import threading
+import statistics
+from typing import NamedTuple
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from guardrails import AWS_REGION, list_all_guardrails
+from guardrail_registry import REGISTRY_FILE, record_guardrail_use, resolve_user_guardrail
+from guardrail_tracing import span
+
+DEFAULT_MODEL_ID = "anthropic.claude-3-sonnet-20240229-v1:0"
+
+# Minimum seconds between two last-used records of the same guardrail (keeps file writes off the hot path)
+USAGE_RECORD_INTERVAL = 300
+# Seconds a resolved guardrail ID is reused before the registry is read again
+# (picks up guardrails that were deleted, evicted or reassigned in the meantime)
+GUARDRAIL_ID_CACHE_TTL = 300
+
+# bedrock-runtime clients shared by every GuardedClient, keyed by (region, pool size)
+_runtime_clients = {}
+# bedrock (control plane) clients for the by-name fallback of resolve_guardrail_id, keyed by region
+_control_clients = {}
+# (guardrail ID, time resolved) for each (role, user), shared by every GuardedClient
+_guardrail_id_cache = {}
+_usage_recorded_at = {}
+_client_lock = threading.Lock()
+
+
+class TextDelta(NamedTuple):
+    """A piece of generated text."""
+    text: str
+
+
+class GuardrailVerdict(NamedTuple):
+    """Final event of a stream: whether the guardrail blocked the request or the response."""
+    blocked: bool
+    action_reason: str
+    text: str
+    latency: float
+    trace: dict = None
+
+
+def build_request_body(model_id, prompt, max_tokens=1000):
+    """
+    Builds the invoke_model request body for a model.
+
+    :param model_id: Model ID
+    :param prompt: User prompt
+    :param max_tokens: Maximum number of tokens to generate
+    :return: Request body dictionary
+    """
+    if 'claude' in model_id.lower():
+        return {
+            'anthropic_version': 'bedrock-2023-05-31',
+            'max_tokens': max_tokens,
+            'messages': [
+                {
+                    'role': 'user',
+                    'content': prompt
+                }
+            ]
+        }
+    # Request format for other models (Titan, Llama, etc.)
+    return {
+        'prompt': prompt,
+        'max_tokens': max_tokens,
+        'temperature': 0.7
+    }
+
+
+def parse_stream_chunk(model_id, chunk_data):
+    """
+    Extracts the generated text and the guardrail action reason from a decoded stream chunk.
+
+    :param model_id: Model ID
+    :param chunk_data: Decoded JSON of one response stream chunk
+    :return: (text, action reason if the guardrail intervened else None)
+    """
+    text = ''
+    if 'claude' in model_id.lower():
+        if chunk_data.get('type') == 'content_block_delta':
+            text = chunk_data.get('delta', {}).get('text', '')
+    elif 'completion' in chunk_data:
+        text = chunk_data['completion']
+
+    action_reason = None
+    if chunk_data.get('amazon-bedrock-guardrailAction') == 'INTERVENED':
+        action_reason = chunk_data.get('amazon-bedrock-trace', {}).get('guardrail', {}).get('actionReason', '')
+    return text, action_reason
+
+
+# Assessment lists that report what a policy detected: (policy, list path, finding kind)
+_FINDING_SOURCES = [
+    ("topicPolicy", ("topicPolicy", "topics"), "topic"),
+    ("contentPolicy", ("contentPolicy", "filters"), "filter"),
+    ("wordPolicy", ("wordPolicy", "customWords"), "customWord"),
+    ("wordPolicy", ("wordPolicy", "managedWordLists"), "managedWord"),
+    ("sensitiveInformationPolicy", ("sensitiveInformationPolicy", "piiEntities"), "pii"),
+    ("sensitiveInformationPolicy", ("sensitiveInformationPolicy", "regexes"), "regex"),
+    ("contextualGroundingPolicy", ("contextualGroundingPolicy", "filters"), "grounding")
+]
+
+
+def parse_guardrail_assessment(assessment, source):
+    """
+    Converts one guardrail assessment into a compact record.
+
+    :param assessment: Assessment from a guardrail trace or an ApplyGuardrail response
+    :param source: 'INPUT' or 'OUTPUT'
+    :return: Dictionary with source, latency_ms, units (non-zero text units per policy),
+             characters (guarded/total) and findings (policy, kind, entity, action and scores)
+    """
+    metrics = assessment.get('invocationMetrics', {})
+    units = {key[:-len("Units")]: value for key, value in metrics.get('usage', {}).items()
+             if key.endswith("Units") and value}
+    characters = metrics.get('guardrailCoverage', {}).get('textCharacters', {})
+
+    findings = []
+    for policy, (section, items), kind in _FINDING_SOURCES:
+        for item in assessment.get(section, {}).get(items, []):
+            finding = {"policy": policy, "kind": kind,
+                       "entity": item.get('name') or item.get('type') or item.get('match'),
+                       "action": item.get('action')}
+            for key in ("match", "confidence", "filterStrength", "score", "threshold"):
+                if key in item and item[key] != finding["entity"]:
+                    finding[key] = item[key]
+            findings.append(finding)
+
+    return {
+        "source": source,
+        "latency_ms": metrics.get('guardrailProcessingLatency'),
+        "units": units,
+        "characters": {"guarded": characters.get('guarded'), "total": characters.get('total')} if characters else None,
+        "findings": findings
+    }
+
+
+def parse_guardrail_trace(guardrail_trace, record=None):
+    """
+    Converts a guardrail trace into a compact record of its assessments.
+
+    Reads both trace shapes: 'input'/'outputs' from the amazon-bedrock-trace of
+    InvokeModelWithResponseStream chunks, and 'inputAssessment'/'outputAssessments' from the
+    ConverseStream metadata event. A streamed response may carry traces in several chunks;
+    pass the record returned for earlier chunks to add to it.
+
+    :param guardrail_trace: 'guardrail' part of the trace
+    :param record: Record of earlier traces of the same response (None starts a new one)
+    :return: Dictionary with action_reason and assessments
+    """
+    if record is None:
+        record = {"action_reason": None, "assessments": []}
+    if not guardrail_trace:
+        return record
+
+    if guardrail_trace.get('actionReason'):
+        record["action_reason"] = guardrail_trace['actionReason']
+
+    raw = []
+    for assessment in (guardrail_trace.get('input') or guardrail_trace.get('inputAssessment') or {}).values():
+        raw.append(("INPUT", assessment))
+    for outputs in guardrail_trace.get('outputs') or []:
+        raw.extend(("OUTPUT", assessment) for assessment in outputs.values())
+    for assessments in (guardrail_trace.get('outputAssessments') or {}).values():
+        raw.extend(("OUTPUT", assessment) for assessment in assessments)
+
+    for source, assessment in raw:
+        parsed = parse_guardrail_assessment(assessment, source)
+        if parsed not in record["assessments"]:
+            record["assessments"].append(parsed)
+    return record
+
+
+def guardrail_blocked_source(record):
+    """
+    Returns the side a guardrail blocked, from the record of parse_guardrail_trace.
+
+    :param record: Trace record (None if the response had no trace)
+    :return: 'INPUT' or 'OUTPUT' (None if no assessment blocked anything)
+    """
+    for source in ("INPUT", "OUTPUT"):
+        for assessment in (record or {}).get("assessments", []):
+            if assessment["source"] == source and any(f["action"] == "BLOCKED" for f in assessment["findings"]):
+                return source
+    return None
+
+
+def is_blocked(action_reason):
+    """
+    Whether a guardrail action reason means the content was blocked.
+
+    "Guardrail blocked." may come together with "No action." - it is always treated as blocked.
+    """
+    return action_reason is not None and "Guardrail blocked." in action_reason
+
+
+def converse_stream(
+    runtime,
+    model_id,
+    prompt,
+    guardrail_id,
+    guardrail_version="DRAFT",
+    stream_processing_mode="sync",
+    max_tokens=1000
+):
+    """
+    Streams a model's answer through a guardrail with the ConverseStream API.
+
+    ConverseStream uses one message format for every model. In 'sync' mode the guardrail checks
+    each chunk before it is sent; in 'async' mode chunks are sent right away and checked in the
+    background, so the first token arrives sooner but blocked content may be partly streamed.
+
+    :param runtime: bedrock-runtime client
+    :param model_id: Model ID
+    :param prompt: User prompt
+    :param guardrail_id: Guardrail ID
+    :param guardrail_version: 'DRAFT' or a published version number
+    :param stream_processing_mode: 'sync' or 'async'
+    :param max_tokens: Maximum number of tokens to generate
+    :return: Iterator of TextDelta events followed by one GuardrailVerdict
+    """
+    start_time = time.perf_counter()
+    with span("model.invoke", api="converse-stream", model=model_id, stream_processing_mode=stream_processing_mode):
+        response = runtime.converse_stream(
+            modelId=model_id,
+            messages=[{"role": "user", "content": [{"text": prompt}]}],
+            inferenceConfig={"maxTokens": max_tokens},
+            guardrailConfig={
+                "guardrailIdentifier": guardrail_id,
+                "guardrailVersion": str(guardrail_version),
+                "trace": "enabled",
+                "streamProcessingMode": stream_processing_mode
+            }
+        )
+
+    text_parts = []
+    stop_reason = ""
+    trace = None
+    for event in response.get('stream') or []:
+        if 'contentBlockDelta' in event:
+            text = event['contentBlockDelta'].get('delta', {}).get('text', '')
+            if text:
+                text_parts.append(text)
+                yield TextDelta(text)
+        elif 'messageStop' in event:
+            stop_reason = event['messageStop'].get('stopReason', '')
+        elif 'metadata' in event and 'guardrail' in event['metadata'].get('trace', {}):
+            trace = parse_guardrail_trace(event['metadata']['trace']['guardrail'], trace)
+
+    yield GuardrailVerdict(stop_reason == 'guardrail_intervened', stop_reason, "".join(text_parts),
+                           time.perf_counter() - start_time, trace)
+
+
+def apply_guardrail(runtime, guardrail_id, text, source="OUTPUT", guardrail_version="DRAFT"):
+    """
+    Checks a piece of text with the ApplyGuardrail API, without invoking a model.
+
+    :param runtime: bedrock-runtime client
+    :param guardrail_id: Guardrail ID
+    :param text: Text to check
+    :param source: 'INPUT' (user prompt) or 'OUTPUT' (model response)
+    :param guardrail_version: 'DRAFT' or a published version number
+    :return: (whether the guardrail intervened, text returned by the guardrail, assessments)
+    """
+    with span("guardrail.apply", source=source):
+        response = runtime.apply_guardrail(
+            guardrailIdentifier=guardrail_id,
+            guardrailVersion=str(guardrail_version),
+            source=source,
+            content=[{"text": {"text": text}}]
+        )
+    intervened = response.get('action') == 'GUARDRAIL_INTERVENED'
+    output_text = "".join(o.get('text', '') for o in response.get('outputs', [])) if intervened else text
+    return intervened, output_text, response.get('assessments', [])
+
+
+def get_runtime_client(region=AWS_REGION, max_pool_connections=50):
+    """
+    Returns a bedrock-runtime client shared across GuardedClient instances and threads.
+
+    Client creation is not thread-safe and each client owns its own connection pool, so one
+    client per region keeps connections warm for every caller.
+
+    :param region: AWS region
+    :param max_pool_connections: Size of the HTTP connection pool
+    :return: bedrock-runtime client
+    """
+    key = (region, max_pool_connections)
+    with _client_lock:
+        client = _runtime_clients.get(key)
+        if client is None:
+            config = Config(max_pool_connections=max_pool_connections, retries={"mode": "adaptive", "max_attempts": 5})
+            with span("client.create", service="bedrock-runtime"):
+                client = boto3.client('bedrock-runtime', region_name=region, config=config)
+            _runtime_clients[key] = client
+        return client
+
+
+def resolve_guardrail_id(role_name, user_id, registry_file=REGISTRY_FILE, refresh=False, region=AWS_REGION):
+    """
+    Resolves the guardrail of a user, caching the answer in memory for GUARDRAIL_ID_CACHE_TTL seconds.
+
+    Looks up the registry assignment first (shared and pooled guardrails), then a fresh inventory
+    snapshot if one is already cached. Without one, the list_guardrails summaries are searched
+    for Guardrail-{role}-{user}; the inventory is never fetched and hydrated here.
+
+    :param role_name: Role name
+    :param user_id: User identifier
+    :param registry_file: Registry file path
+    :param refresh: Ignore the cached answer and the inventory snapshot (e.g., after the guardrail was not found)
+    :param region: AWS region
+    :return: Guardrail ID (None if the user has no guardrail)
+    """
+    key = (role_name, user_id)
+    cached = _guardrail_id_cache.get(key)
+    if cached and not refresh and time.monotonic() - cached[1] < GUARDRAIL_ID_CACHE_TTL:
+        return cached[0]
+
+    guardrail_id = resolve_user_guardrail(role_name, user_id, registry_file)
+    if guardrail_id is None:
+        from guardrail_inventory import find_user_guardrail, load_inventory
+        snapshot = load_inventory(refresh=refresh, region=region, fetch=False)
+        if snapshot is not None:
+            record = find_user_guardrail(snapshot, role_name, user_id)
+        else:
+            name = f"Guardrail-{role_name}-{user_id}"
+            record = next((g for g in list_all_guardrails(_get_control_client(region))
+                           if g.get('name') == name and g.get('status') != 'DELETING'), None)
+        guardrail_id = record['id'] if record else None
+
+    if guardrail_id:
+        _guardrail_id_cache[key] = (guardrail_id, time.monotonic())
+    else:
+        _guardrail_id_cache.pop(key, None)
+    return guardrail_id
+
+
+def _get_control_client(region):
+    with _client_lock:
+        client = _control_clients.get(region)
+        if client is None:
+            client = _control_clients[region] = boto3.client('bedrock', region_name=region)
+        return client
+
+
+def invalidate_guardrail_id(role_name, user_id):
+    """
+    Drops the cached guardrail ID of a user, so the next lookup reads the registry again.
+
+    :param role_name: Role name
+    :param user_id: User identifier
+    """
+    _guardrail_id_cache.pop((role_name, user_id), None)
+
+
+class GuardedClient:
+    """
+    Calls Bedrock models through a user's guardrail and streams the answer with the verdict.
+
+    Example:
+        client = GuardedClient("developer", "john123")
+        async for event in client.astream("How do I reverse a list in Python?"):
+            if isinstance(event, TextDelta):
+                print(event.text, end="")
+            else:
+                print("\\nblocked" if event.blocked else "\\npassed")
+    """
+
+    def __init__(
+        self,
+        role_name=None,
+        user_id=None,
+        guardrail_id=None,
+        guardrail_version="DRAFT",
+        model_id=DEFAULT_MODEL_ID,
+        region=AWS_REGION,
+        max_tokens=1000,
+        max_pool_connections=50,
+        registry_file=REGISTRY_FILE,
+        api="invoke",
+        stream_processing_mode="sync"
+    ):
+        """
+        :param role_name: Role of the user (used to resolve the guardrail)
+        :param user_id: User identifier (used to resolve the guardrail)
+        :param guardrail_id: Guardrail ID to use instead of resolving it from role and user
+        :param guardrail_version: 'DRAFT' or a published version number
+        :param model_id: Model ID
+        :param region: AWS region
+        :param max_tokens: Maximum number of tokens to generate
+        :param max_pool_connections: Size of the shared HTTP connection pool
+        :param registry_file: Registry file used to resolve the guardrail and record its use
+        :param api: 'invoke' (InvokeModelWithResponseStream) or 'converse-stream' (ConverseStream)
+        :param stream_processing_mode: Guardrail stream processing with ConverseStream ('sync' or 'async')
+        """
+        # A guardrail resolved from role and user is looked up again when the cached ID expires or is not found
+        self.role_name = role_name
+        self.user_id = user_id
+        self.resolved = guardrail_id is None
+        if guardrail_id is None:
+            guardrail_id = resolve_guardrail_id(role_name, user_id, registry_file, region=region)
+            if guardrail_id is None:
+                raise ValueError(f"No guardrail found for user '{user_id}' ({role_name}).")
+
+        self.guardrail_id = guardrail_id
+        self.region = region
+        self.guardrail_version = str(guardrail_version)
+        self.model_id = model_id
+        self.max_tokens = max_tokens
+        self.registry_file = registry_file
+        self.api = api
+        self.stream_processing_mode = stream_processing_mode
+        self.runtime = get_runtime_client(region, max_pool_connections)
+
+    def _record_use(self):
+        now = time.monotonic()
+        with _client_lock:
+            last = _usage_recorded_at.get(self.guardrail_id)
+            if last is not None and now - last < USAGE_RECORD_INTERVAL:
+                return
+            _usage_recorded_at[self.guardrail_id] = now
+        try:
+            record_guardrail_use(self.guardrail_id, self.registry_file)
+        except Exception as e:
+            print(f"Failed to record guardrail use: {str(e)}")
+
+    def _resolve(self, refresh=False):
+        guardrail_id = resolve_guardrail_id(self.role_name, self.user_id, self.registry_file, refresh, self.region)
+        if guardrail_id is None:
+            raise ValueError(f"No guardrail found for user '{self.user_id}' ({self.role_name}).")
+        self.guardrail_id = guardrail_id
+
+    def stream(self, prompt):
+        """
+        Streams the model's answer to a prompt through the guardrail.
+
+        If the user's guardrail no longer exists (ResourceNotFoundException), the guardrail
+        is resolved again and the request is retried once.
+
+        :param prompt: User prompt
+        :return: Iterator of TextDelta events followed by one GuardrailVerdict
+        """
+        if self.resolved:
+            self._resolve()
+        events = self._stream(prompt)
+        try:
+            first_event = next(events)
+        except StopIteration:
+            return
+        except ClientError as e:
+            if not self.resolved or e.response.get('Error', {}).get('Code') != 'ResourceNotFoundException':
+                raise
+            invalidate_guardrail_id(self.role_name, self.user_id)
+            self._resolve(refresh=True)
+            events = self._stream(prompt)
+            first_event = next(events)
+        yield first_event
+        yield from events
+
+    def _stream(self, prompt):
+        if self.api == "converse-stream":
+            self._record_use()
+            yield from converse_stream(self.runtime, self.model_id, prompt, self.guardrail_id, self.guardrail_version,
+                                       self.stream_processing_mode, self.max_tokens)
+            return
+
+        start_time = time.perf_counter()
+        with span("model.invoke", api="invoke", model=self.model_id):
+            response = self.runtime.invoke_model_with_response_stream(
+                modelId=self.model_id,
+                contentType='application/json',
+                accept='application/json',
+                body=json.dumps(build_request_body(self.model_id, prompt, self.max_tokens)),
+                guardrailIdentifier=self.guardrail_id,
+                guardrailVersion=self.guardrail_version,
+                trace='ENABLED'
+            )
+        self._record_use()
+
+        text_parts = []
+        blocked = False
+        reasons = []
+        trace = None
+        for event in response.get('body') or []:
+            if 'chunk' not in event:
+                continue
+            with span("stream.parse"):
+                chunk_data = json.loads(event['chunk']['bytes'])
+                text, action_reason = parse_stream_chunk(self.model_id, chunk_data)
+                if 'amazon-bedrock-trace' in chunk_data:
+                    trace = parse_guardrail_trace(chunk_data['amazon-bedrock-trace'].get('guardrail'), trace)
+            if text:
+                text_parts.append(text)
+                yield TextDelta(text)
+            if action_reason is not None:
+                reasons.append(action_reason)
+                blocked = blocked or is_blocked(action_reason)
+
+        yield GuardrailVerdict(blocked, " ".join(reasons), "".join(text_parts), time.perf_counter() - start_time,
+                               trace)
+
+    def invoke(self, prompt):
+        """
+        Sends a prompt through the guardrail and waits for the whole answer.
+
+        :param prompt: User prompt
+        :return: GuardrailVerdict with the full text
+        """
+        for event in self.stream(prompt):
+            if isinstance(event, GuardrailVerdict):
+                return event
+
+    async def astream(self, prompt):
+        """
+        Async version of stream for asyncio applications.
+
+        The blocking boto3 stream is read in a worker thread and handed over chunk by chunk,
+        so the event loop is never blocked.
+
+        :param prompt: User prompt
+        :return: Async iterator of TextDelta events followed by one GuardrailVerdict
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def pump():
+            try:
+                for event in self.stream(prompt):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, event)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        producer = loop.run_in_executor(None, pump)
+        try:
+            while True:
+                event = await queue.get()
+                if event is done:
+                    break
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+        finally:
+            stop.set()
+            await producer
+
+    async def ainvoke(self, prompt):
+        """
+        Async version of invoke.
+
+        :param prompt: User prompt
+        :return: GuardrailVerdict with the full text
+        """
+        async for event in self.astream(prompt):
+            if isinstance(event, GuardrailVerdict):
+                return event
+
+
+def measure_overhead(client, prompt, requests=20):
+    """
+    Compares GuardedClient latency with the same raw boto3 call and stream loop.
+
+    Requests alternate between the two so network conditions affect both equally.
+
+    :param client: GuardedClient
+    :param prompt: Prompt to send
+    :param requests: Number of requests per variant
+    :return: Dictionary with median raw and guarded latencies and the median overhead, in seconds
+    """
+    body = json.dumps(build_request_body(client.model_id, prompt, client.max_tokens))
+
+    def raw_call():
+        start_time = time.perf_counter()
+        response = client.runtime.invoke_model_with_response_stream(
+            modelId=client.model_id, contentType='application/json', accept='application/json', body=body,
+            guardrailIdentifier=client.guardrail_id, guardrailVersion=client.guardrail_version, trace='ENABLED'
+        )
+        for event in response.get('body') or []:
+            if 'chunk' in event:
+                json.loads(event['chunk']['bytes'])
+        return time.perf_counter() - start_time
+
+    def guarded_call():
+        start_time = time.perf_counter()
+        client.invoke(prompt)
+        return time.perf_counter() - start_time
+
+    raw, guarded = [], []
+    for _ in range(requests):
+        raw.append(raw_call())
+        guarded.append(guarded_call())
+
+    return {
+        "raw_median": statistics.median(raw),
+        "guarded_median": statistics.median(guarded),
+        "overhead_median": statistics.median(g - r for g, r in zip(guarded, raw))
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send a prompt through a user's guardrail")
+    parser.add_argument("prompt", help="Prompt to send")
+    parser.add_argument("--role", help="Role of the user")
+    parser.add_argument("--user", help="User identifier")
+    parser.add_argument("--guardrail-id", help="Guardrail ID (instead of --role/--user)")
+    parser.add_argument("--guardrail-version", default="DRAFT", help="Guardrail version (default: DRAFT)")
+    parser.add_argument("--model", default=DEFAULT_MODEL_ID, help="Model ID to use (default: Claude 3 Sonnet)")
+    parser.add_argument("--overhead", type=int, metavar="N",
+                        help="Measure the client overhead over N requests instead of printing the answer")
+    args = parser.parse_args()
+
+    try:
+        client = GuardedClient(args.role, args.user, guardrail_id=args.guardrail_id,
+                               guardrail_version=args.guardrail_version, model_id=args.model)
+        if args.overhead:
+            stats = measure_overhead(client, args.prompt, args.overhead)
+            print(f"Raw boto3 median:     {stats['raw_median'] * 1000:.1f} ms")
+            print(f"GuardedClient median: {stats['guarded_median'] * 1000:.1f} ms")
+            print(f"Median overhead:      {stats['overhead_median'] * 1000:.2f} ms")
+        else:
+            for event in client.stream(args.prompt):
+                if isinstance(event, TextDelta):
+                    print(event.text, end="", flush=True)
+                else:
+                    print(f"\n\nGuardrail status: {'🚫 Blocked' if event.blocked else '✅ Passed'} ({event.latency:.2f}s)")
+    except KeyboardInterrupt:
+        print("\n\nExiting program.")
+    except Exception as e:
+        print(f"\nError occurred: {str(e)}")
@@ -0,0 +1,1163 @@
+import boto3
+import csv
+import json
+import time
+import hashlib
+import argparse
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from botocore.config import Config
+from guardrails import (
+    AWS_REGION,
+    GUARDRAIL_QUOTA,
+    TERMINAL_STATUSES,
+    backoff_delays,
+    compile_guardrail_params,
+    compute_policy_hash,
+    ask_yes_no_question,
+    create_dynamic_guardrail,
+    list_all_guardrails,
+    load_guardrail_config
+)
+from guardrail_registry import (
+    REGISTRY_FILE,
+    assign_users,
+    ensure_shared_guardrail,
+    forget_guardrails,
+    load_registry,
+    record_guardrail_generations,
+    rekey_policy,
+    user_key
+)
+from guardrail_tracing import span, traced
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket limiting how many control-plane calls start per second.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        :param rate: Sustained calls per second
+        :param burst: Maximum calls allowed back-to-back (defaults to the rate, at least 1)
+        """
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a call may start.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+def create_fleet_client(region=AWS_REGION, max_workers=8):
+    """
+    Creates a Bedrock control-plane client shared by all worker threads.
+
+    Adaptive retry mode backs off client-side on ThrottlingException.
+
+    :param region: AWS region
+    :param max_workers: Number of threads that will share the client
+    :return: Bedrock client
+    """
+    config = Config(
+        max_pool_connections=max(10, max_workers),
+        retries={"mode": "adaptive", "max_attempts": 10}
+    )
+    with span("client.create", service="bedrock"):
+        return boto3.client('bedrock', region_name=region, config=config)
+
+
+def load_user_manifest(manifest_file):
+    """
+    Loads the list of users to provision from a CSV or JSON manifest.
+
+    CSV files need a header with 'role' and 'user_id' columns. JSON files contain a list of
+    objects with the same keys. Optional 'check_harmful_content' / 'check_prompt_attacks'
+    values are passed on to create_dynamic_guardrail.
+
+    :param manifest_file: Manifest file path (.csv or .json)
+    :return: List of manifest entries
+    """
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            if manifest_file.lower().endswith('.csv'):
+                entries = [dict(row) for row in csv.DictReader(f)]
+            else:
+                entries = json.load(f)
+    except FileNotFoundError:
+        print(f"Error: Manifest file '{manifest_file}' not found.")
+        return []
+    except json.JSONDecodeError:
+        print(f"Error: Invalid JSON format in manifest file '{manifest_file}'.")
+        return []
+
+    manifest = []
+    for line_number, entry in enumerate(entries, 1):
+        role_name = (entry.get('role') or '').strip()
+        user_id = str(entry.get('user_id') or '').strip()
+        if not role_name or not user_id:
+            print(f"Warning: Skipping manifest entry {line_number} without role/user_id: {entry}")
+            continue
+
+        item = {"role": role_name, "user_id": user_id}
+        for flag in ("check_harmful_content", "check_prompt_attacks"):
+            if flag in entry and entry[flag] not in (None, ''):
+                value = entry[flag]
+                item[flag] = value if isinstance(value, bool) else str(value).strip().lower() in ('true', 'yes', 'y', '1')
+        manifest.append(item)
+
+    print(f"Loaded {len(manifest)} users from manifest '{manifest_file}'.")
+    return manifest
+
+
+def guardrail_name_for(role_name, user_id):
+    """
+    Returns the guardrail name create_dynamic_guardrail uses for a user.
+    """
+    return f"Guardrail-{role_name}-{user_id}"
+
+
+def make_client_request_token(role_name, user_id, policy_hash, generation=1):
+    """
+    Builds a deterministic clientRequestToken for a user's guardrail.
+
+    The same (role, user, policy, generation) always maps to the same token, so retrying a
+    batch after a crash or timeout cannot create duplicate guardrails. A changed configuration
+    changes the policy hash, and a user whose guardrail was deleted gets the next generation,
+    so neither reuses a token sent with other parameters or answered with a deleted guardrail.
+
+    :param role_name: Role name
+    :param user_id: User identifier
+    :param policy_hash: Hash of the compiled policy (compute_policy_hash)
+    :param generation: Number of the user's guardrail (see record_guardrail_generations)
+    :return: Idempotency token
+    """
+    digest = hashlib.sha256(f"{role_name}|{user_id}|{policy_hash}|{generation}".encode('utf-8')).hexdigest()
+    return f"gr-{digest[:48]}"
+
+
+def wait_for_batch_ready(bedrock_client, guardrail_ids, max_wait_time=300, initial_delay=0.5, max_delay=10.0):
+    """
+    Waits until every guardrail in the batch reaches a terminal status.
+
+    Each round is a single paginated list_guardrails sweep instead of one
+    get_guardrail poll per guardrail; rounds are spaced with exponential backoff.
+
+    :param bedrock_client: Bedrock client
+    :param guardrail_ids: IDs of guardrails to wait for
+    :param max_wait_time: Maximum time to wait in seconds
+    :param initial_delay: First interval between sweeps in seconds
+    :param max_delay: Largest interval between sweeps in seconds
+    :return: Dictionary of guardrail ID to last seen status
+    """
+    pending = set(guardrail_ids)
+    statuses = {guardrail_id: None for guardrail_id in guardrail_ids}
+    deadline = time.monotonic() + max_wait_time
+    delays = backoff_delays(initial_delay, max_delay)
+
+    while pending:
+        try:
+            for guardrail in list_all_guardrails(bedrock_client):
+                if guardrail.get('id') in statuses:
+                    statuses[guardrail['id']] = guardrail.get('status')
+        except Exception as e:
+            print(f"Error listing guardrails: {str(e)}")
+
+        pending = {g for g in pending if statuses[g] not in TERMINAL_STATUSES}
+        ready_count = sum(1 for s in statuses.values() if s == 'READY')
+        print(f"Readiness: {ready_count}/{len(statuses)} ready, {len(pending)} pending")
+
+        if not pending:
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print("Warning: Maximum wait time exceeded. Some guardrails are not ready yet.")
+            break
+        time.sleep(min(next(delays), remaining))
+
+    return statuses
+
+
+def provision_users(
+    manifest,
+    config_file="guardrail_config.json",
+    region=AWS_REGION,
+    max_workers=8,
+    rate=2.0,
+    max_wait_time=300,
+    bedrock_client=None,
+    quota=None,
+    registry_file=REGISTRY_FILE,
+    confirm_eviction=True
+):
+    """
+    Creates guardrails for every user in the manifest concurrently.
+
+    Users whose guardrail already exists are skipped, creation calls are rate limited,
+    and readiness is tracked for the whole batch at once.
+
+    :param manifest: Entries from load_user_manifest
+    :param config_file: Guardrail configuration file path
+    :param region: AWS region
+    :param max_workers: Maximum number of concurrent create calls
+    :param rate: Maximum create_guardrail calls started per second
+    :param max_wait_time: Maximum time to wait for the batch to become ready
+    :param bedrock_client: Existing Bedrock client to reuse
+    :param quota: Account guardrail quota; least recently used guardrails are evicted (deleted) to stay within it
+                  (None, the default, never deletes anything)
+    :param registry_file: Registry file with the usage records used for eviction and the guardrail generations
+    :param confirm_eviction: Ask before evicting guardrails
+    :return: List of result dictionaries (role, user_id, guardrail_id, status)
+    """
+    if bedrock_client is None:
+        bedrock_client = create_fleet_client(region, max_workers)
+
+    # Skip users whose guardrail already exists (makes reruns cheap as well as safe).
+    # Guardrails taken from the warm pool keep their pool name, so registry assignments are checked too.
+    # A guardrail being deleted doesn't count: its user is created again (with the next generation's token).
+    summaries = [g for g in list_all_guardrails(bedrock_client) if g.get('status') != 'DELETING']
+    existing = {g.get('name'): g for g in summaries}
+    existing_ids = {g.get('id'): g for g in summaries}
+    assignments = load_registry(registry_file)["users"]
+
+    results = []
+    to_create = []
+    for entry in manifest:
+        found = existing.get(guardrail_name_for(entry['role'], entry['user_id']))
+        if found is None:
+            assignment = assignments.get(user_key(entry['role'], entry['user_id']))
+            found = existing_ids.get(assignment["guardrail_id"]) if assignment else None
+        if found:
+            results.append({**entry, "guardrail_id": found.get('id'), "status": found.get('status'), "created": False})
+        else:
+            to_create.append(entry)
+
+    print(f"\n{len(results)} users already have a guardrail, creating {len(to_create)}...")
+
+    if quota is not None and to_create:
+        ensure_guardrail_capacity(len(to_create), quota, bedrock_client, registry_file, region, max_workers, rate,
+                                  confirm=confirm_eviction)
+
+    limiter = RateLimiter(rate)
+    # A user who needs a guardrail again lost the previous one, so its token must not be reused
+    generations = load_registry(registry_file)["generations"]
+
+    def create(entry):
+        limiter.acquire()
+        try:
+            check_harmful_content = entry.get('check_harmful_content', True)
+            check_prompt_attacks = entry.get('check_prompt_attacks', True)
+            compiled_params = compile_guardrail_params(entry['role'], check_harmful_content, check_prompt_attacks,
+                                                       config_file=config_file, verbose=False)
+            previous = generations.get(user_key(entry['role'], entry['user_id']))
+            generation = previous["generation"] + 1 if previous else 1
+            guardrail_id = create_dynamic_guardrail(
+                entry['role'],
+                entry['user_id'],
+                check_harmful_content=check_harmful_content,
+                check_prompt_attacks=check_prompt_attacks,
+                config_file=config_file,
+                region=region,
+                bedrock_client=bedrock_client,
+                client_request_token=make_client_request_token(entry['role'], entry['user_id'],
+                                                               compute_policy_hash(compiled_params), generation),
+                wait_until_ready=False,
+                verbose=False,
+                compiled_params=compiled_params
+            )
+            print(f"Created guardrail {guardrail_id} for {entry['role']}/{entry['user_id']}")
+            return {**entry, "guardrail_id": guardrail_id, "status": "CREATING", "created": True,
+                    "generation": generation}
+        except Exception as e:
+            return {**entry, "guardrail_id": None, "status": "ERROR", "error": str(e), "created": False}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(create, entry) for entry in to_create]
+        for done_count, future in enumerate(as_completed(futures), 1):
+            results.append(future.result())
+            if done_count % 10 == 0 or done_count == len(futures):
+                print(f"Progress: {done_count}/{len(futures)} create calls finished")
+    record_guardrail_generations([r for r in results if r['created']], registry_file)
+
+    # Track readiness of the whole batch with list sweeps
+    waiting = [r['guardrail_id'] for r in results if r['guardrail_id'] and r['status'] not in TERMINAL_STATUSES]
+    if waiting:
+        print(f"\nWaiting for {len(waiting)} guardrails to become ready...")
+        statuses = wait_for_batch_ready(bedrock_client, waiting, max_wait_time)
+        for result in results:
+            if result['guardrail_id'] in statuses and statuses[result['guardrail_id']]:
+                result['status'] = statuses[result['guardrail_id']]
+
+    return results
+
+
+def provision_users_shared(
+    manifest,
+    config_file="guardrail_config.json",
+    registry_file=REGISTRY_FILE,
+    region=AWS_REGION,
+    max_workers=8,
+    bedrock_client=None
+):
+    """
+    Assigns every user in the manifest to a guardrail shared by all users with the same effective policy.
+
+    One guardrail is created per distinct policy (at most); all user assignments are then
+    written to the local registry in a single update.
+
+    :param manifest: Entries from load_user_manifest
+    :param config_file: Guardrail configuration file path
+    :param registry_file: Registry file path
+    :param region: AWS region
+    :param max_workers: Maximum number of policies provisioned concurrently
+    :param bedrock_client: Existing Bedrock client to reuse
+    :return: List of result dictionaries (role, user_id, guardrail_id, status)
+    """
+    if bedrock_client is None:
+        bedrock_client = create_fleet_client(region, max_workers)
+
+    # Group users by the inputs that determine their policy
+    groups = {}
+    for entry in manifest:
+        key = (entry['role'], entry.get('check_harmful_content', True), entry.get('check_prompt_attacks', True))
+        groups.setdefault(key, []).append(entry)
+
+    print(f"\n{len(manifest)} users map to {len(groups)} role/flag combinations.")
+
+    def ensure(key):
+        role_name, check_harmful_content, check_prompt_attacks = key
+        try:
+            compiled_params = compile_guardrail_params(role_name, check_harmful_content, check_prompt_attacks,
+                                                       config_file=config_file, verbose=False)
+            guardrail_id, policy_hash = ensure_shared_guardrail(
+                role_name, compiled_params, check_harmful_content, check_prompt_attacks,
+                registry_file=registry_file, bedrock_client=bedrock_client, region=region, verbose=False,
+                config_file=config_file
+            )
+            return key, guardrail_id, policy_hash, None
+        except Exception as e:
+            return key, None, None, str(e)
+
+    results = []
+    assignments = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for key, guardrail_id, policy_hash, error in executor.map(ensure, groups):
+            for entry in groups[key]:
+                if guardrail_id:
+                    assignments.append({**entry, "guardrail_id": guardrail_id, "policy_hash": policy_hash})
+                    results.append({**entry, "guardrail_id": guardrail_id, "status": "READY", "created": False})
+                else:
+                    results.append({**entry, "guardrail_id": None, "status": "ERROR", "error": error, "created": False})
+
+    assign_users(assignments, registry_file)
+    print(f"Recorded {len(assignments)} user assignments in '{registry_file}'.")
+    return results
+
+
+def print_provision_summary(results):
+    """
+    Prints a summary of a provisioning batch.
+
+    :param results: Results returned by provision_users
+    """
+    created = sum(1 for r in results if r.get('created'))
+    skipped = sum(1 for r in results if r['guardrail_id'] and not r.get('created'))
+    ready = sum(1 for r in results if r['status'] == 'READY')
+    failed = [r for r in results if r['status'] in ('FAILED', 'ERROR')]
+
+    print("\n=== Provisioning Summary ===")
+    print(f"Total users: {len(results)}")
+    print(f"Created: {created}")
+    print(f"Already existed: {skipped}")
+    print(f"Ready: {ready}")
+    print(f"Failed: {len(failed)}")
+    for r in failed:
+        print(f"  - {r['role']}/{r['user_id']}: {r.get('error', r['status'])}")
+
+
+def get_guardrail_tags(bedrock_client, guardrail_arn):
+    """
+    Gets the tags of a guardrail as a dictionary.
+
+    :param bedrock_client: Bedrock client
+    :param guardrail_arn: Guardrail ARN
+    :return: Dictionary of tag key to value
+    """
+    response = bedrock_client.list_tags_for_resource(resourceARN=guardrail_arn)
+    return {tag['key']: tag['value'] for tag in response.get('tags', [])}
+
+
+def normalize_guardrail_policy(guardrail):
+    """
+    Converts a get_guardrail response into the shape produced by compile_guardrail_params.
+
+    Only the fields the toolkit manages are kept, so the two can be compared directly.
+
+    :param guardrail: get_guardrail response
+    :return: Dictionary of create_guardrail parameters
+    """
+    params = {
+        "description": guardrail.get('description'),
+        "blockedInputMessaging": guardrail.get('blockedInputMessaging'),
+        "blockedOutputsMessaging": guardrail.get('blockedOutputsMessaging')
+    }
+
+    topics = [{"name": t['name'], "definition": t['definition'], "type": t.get('type', 'DENY')}
+              for t in guardrail.get('topicPolicy', {}).get('topics', [])]
+    if topics:
+        params["topicPolicyConfig"] = {"topicsConfig": topics}
+
+    filters = [{"type": f['type'], "inputStrength": f['inputStrength'], "outputStrength": f['outputStrength']}
+               for f in guardrail.get('contentPolicy', {}).get('filters', [])]
+    if filters:
+        params["contentPolicyConfig"] = {"filtersConfig": filters}
+
+    word_policy = {}
+    words = [{"text": w['text']} for w in guardrail.get('wordPolicy', {}).get('words', [])]
+    if words:
+        word_policy["wordsConfig"] = words
+    managed_word_lists = [{"type": m['type']} for m in guardrail.get('wordPolicy', {}).get('managedWordLists', [])]
+    if managed_word_lists:
+        word_policy["managedWordListsConfig"] = managed_word_lists
+    if word_policy:
+        params["wordPolicyConfig"] = word_policy
+
+    return params
+
+
+def diff_guardrail_policy(live, desired):
+    """
+    Compares a live guardrail policy with the compiled configuration.
+
+    Lists are compared as sets, so ordering differences are not reported as drift.
+
+    :param live: Policy from normalize_guardrail_policy
+    :param desired: Policy from compile_guardrail_params
+    :return: List of human-readable differences (empty if the guardrail has not drifted)
+    """
+    changes = []
+
+    for field in ("description", "blockedInputMessaging", "blockedOutputsMessaging"):
+        if live.get(field) != desired.get(field):
+            changes.append(f"{field}: {live.get(field)!r} -> {desired.get(field)!r}")
+
+    sections = [
+        ("topic", "topicPolicyConfig", "topicsConfig", "name"),
+        ("filter", "contentPolicyConfig", "filtersConfig", "type"),
+        ("word", "wordPolicyConfig", "wordsConfig", "text"),
+        ("managed word list", "wordPolicyConfig", "managedWordListsConfig", "type")
+    ]
+    for label, policy, items, key in sections:
+        live_items = {item[key]: item for item in live.get(policy, {}).get(items, [])}
+        desired_items = {item[key]: item for item in desired.get(policy, {}).get(items, [])}
+
+        for name in sorted(desired_items.keys() - live_items.keys()):
+            changes.append(f"+ {label} {name}")
+        for name in sorted(live_items.keys() - desired_items.keys()):
+            changes.append(f"- {label} {name}")
+        for name in sorted(live_items.keys() & desired_items.keys()):
+            if live_items[name] != desired_items[name]:
+                changed = [f"{k}: {live_items[name].get(k)} -> {v}" for k, v in desired_items[name].items()
+                           if live_items[name].get(k) != v]
+                changes.append(f"~ {label} {name} ({', '.join(changed)})")
+
+    return changes
+
+
+def unmanaged_reason(tags, desired):
+    """
+    Tells whether a guardrail's policy is owned by the configuration file.
+
+    Only guardrails created from the role settings alone (PolicySource=role) are updated to
+    match the configuration. Guardrails created with custom denied topics or filter overrides
+    (PolicySource=custom) belong to their user. Guardrails from before the PolicySource tag
+    cannot be told apart from customized ones, so they are only treated as managed when
+    they already match the configuration.
+
+    :param tags: Guardrail tags
+    :param desired: Policy from compile_guardrail_params
+    :return: Reason the guardrail is not managed (None if the configuration may update it)
+    """
+    source = tags.get('PolicySource')
+    if source == 'role':
+        return None
+    if source == 'custom':
+        return "created with custom topics or filter overrides"
+    if tags.get('PolicyHash') == compute_policy_hash(desired):
+        return None
+    return "no PolicySource tag (created before policy sources were recorded)"
+
+
+def plan_reconcile(config_file="guardrail_config.json", role_name=None, bedrock_client=None, region=AWS_REGION, max_workers=8):
+    """
+    Finds the guardrails whose live definition differs from the compiled configuration.
+
+    Guardrails are matched to their role and flags through the tags create_dynamic_guardrail sets
+    (RoleName, HarmfulContentFilter, PromptAttackPrevention); untagged guardrails are ignored.
+    Drifted guardrails the configuration doesn't own (see unmanaged_reason) are returned with an
+    'unmanaged' reason and are never updated.
+
+    :param config_file: Guardrail configuration file path
+    :param role_name: Only check guardrails of this role (None checks all roles in the configuration)
+    :param bedrock_client: Existing Bedrock client to reuse
+    :param region: AWS region
+    :param max_workers: Maximum number of guardrails inspected concurrently
+    :return: List of drift dictionaries (guardrail_id, name, arn, role, changes, desired, unmanaged)
+    """
+    if bedrock_client is None:
+        bedrock_client = create_fleet_client(region, max_workers)
+
+    config = load_guardrail_config(config_file)
+    candidates = [g for g in list_all_guardrails(bedrock_client)
+                  if g.get('name', '').startswith('Guardrail-') and g.get('status') == 'READY']
+
+    def inspect(summary):
+        try:
+            tags = get_guardrail_tags(bedrock_client, summary['arn'])
+            role = tags.get('RoleName')
+            if not role or role not in config or (role_name and role != role_name):
+                return None
+
+            check_harmful_content = tags.get('HarmfulContentFilter', 'True') == 'True'
+            check_prompt_attacks = tags.get('PromptAttackPrevention', 'True') == 'True'
+            desired = compile_guardrail_params(role, check_harmful_content, check_prompt_attacks,
+                                               config_file=config_file, verbose=False)
+            live = normalize_guardrail_policy(bedrock_client.get_guardrail(guardrailIdentifier=summary['id']))
+
+            changes = diff_guardrail_policy(live, desired)
+            if not changes:
+                return None
+            return {
+                "guardrail_id": summary['id'],
+                "name": summary['name'],
+                "arn": summary['arn'],
+                "role": role,
+                "policy_hash": tags.get('PolicyHash'),
+                "changes": changes,
+                "desired": desired,
+                "unmanaged": unmanaged_reason(tags, desired)
+            }
+        except Exception as e:
+            print(f"Error inspecting guardrail {summary.get('id')}: {str(e)}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        drifted = [d for d in executor.map(inspect, candidates) if d]
+
+    unmanaged = sum(1 for d in drifted if d['unmanaged'])
+    print(f"Checked {len(candidates)} guardrails: {len(drifted)} drifted from '{config_file}'"
+          + (f", {unmanaged} of them not managed by the configuration." if unmanaged else "."))
+    return drifted
+
+
+def apply_reconcile(drifted, bedrock_client, registry_file=REGISTRY_FILE, max_workers=8, rate=2.0, max_wait_time=300):
+    """
+    Sends one update_guardrail call per drifted guardrail, concurrently and rate limited.
+
+    update_guardrail replaces the managed policies with the compiled configuration in place,
+    so the guardrail keeps its ID and no delete/recreate cycle is needed. Entries marked
+    'unmanaged' (custom policies) are skipped.
+
+    :param drifted: Drift entries from plan_reconcile
+    :param bedrock_client: Bedrock client
+    :param registry_file: Registry file whose shared policy hashes are kept in sync
+    :param max_workers: Maximum number of concurrent update calls
+    :param rate: Maximum update calls started per second
+    :param max_wait_time: Maximum time to wait for the updated guardrails to become ready
+    :return: List of result dictionaries (guardrail_id, name, status)
+    """
+    limiter = RateLimiter(rate)
+
+    def update(entry):
+        limiter.acquire()
+        try:
+            bedrock_client.update_guardrail(
+                guardrailIdentifier=entry['guardrail_id'],
+                name=entry['name'],
+                **entry['desired']
+            )
+            new_hash = compute_policy_hash(entry['desired'])
+            tags = {"PolicyHash": new_hash, **entry.get('tags', {})}
+            bedrock_client.tag_resource(resourceARN=entry['arn'], tags=[{"key": k, "value": v} for k, v in tags.items()])
+            if entry.get('policy_hash'):
+                rekey_policy(entry['policy_hash'], new_hash, registry_file)
+            print(f"Updated {entry['name']} ({entry['guardrail_id']}): {len(entry['changes'])} changes")
+            return {"guardrail_id": entry['guardrail_id'], "name": entry['name'], "status": "UPDATING"}
+        except Exception as e:
+            print(f"Error updating guardrail {entry['guardrail_id']}: {str(e)}")
+            return {"guardrail_id": entry['guardrail_id'], "name": entry['name'], "status": "ERROR", "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(update, [entry for entry in drifted if not entry.get('unmanaged')]))
+
+    updated = [r['guardrail_id'] for r in results if r['status'] == 'UPDATING']
+    if updated:
+        statuses = wait_for_batch_ready(bedrock_client, updated, max_wait_time)
+        for result in results:
+            result['status'] = statuses.get(result['guardrail_id']) or result['status']
+
+    return results
+
+
+def print_reconcile_plan(drifted):
+    """
+    Prints the changes the reconciler would make.
+
+    :param drifted: Drift entries from plan_reconcile
+    """
+    managed = [entry for entry in drifted if not entry.get('unmanaged')]
+    unmanaged = [entry for entry in drifted if entry.get('unmanaged')]
+    if not managed:
+        print("\nAll managed guardrails match the configuration. Nothing to update.")
+    else:
+        print(f"\n=== {len(managed)} guardrails to update ===")
+        for entry in managed:
+            print(f"\n{entry['name']} ({entry['guardrail_id']}, role: {entry['role']})")
+            for change in entry['changes']:
+                print(f"  {change}")
+
+    if unmanaged:
+        print(f"\n=== {len(unmanaged)} unmanaged guardrails differ from the configuration (left unchanged) ===")
+        for entry in unmanaged:
+            print(f"{entry['name']} ({entry['guardrail_id']}): {entry['unmanaged']}, {len(entry['changes'])} differences")
+
+
+def select_guardrails(
+    bedrock_client=None,
+    role_name=None,
+    user_id=None,
+    older_than_days=None,
+    include_shared=False,
+    region=AWS_REGION,
+    max_workers=8,
+    snapshot=None
+):
+    """
+    Selects toolkit-created guardrails by the tags create_dynamic_guardrail sets.
+
+    Reads a freshly fetched inventory snapshot. Guardrails without a RoleName tag were not
+    created by the toolkit and are never selected. Shared guardrails (UserId 'shared-...') and
+    unassigned warm-pool guardrails (PoolStatus=AVAILABLE) are skipped unless include_shared is set,
+    because other users may still be assigned to them or the pool still lists them.
+
+    :param bedrock_client: Existing Bedrock client to reuse
+    :param role_name: Only select guardrails of this role
+    :param user_id: Only select the guardrails of this user
+    :param older_than_days: Only select guardrails whose CreatedAt tag is older than this many days
+    :param include_shared: Also select shared and unassigned pool guardrails
+    :param region: AWS region
+    :param max_workers: Maximum number of guardrails hydrated concurrently
+    :param snapshot: Inventory snapshot to select from (a fresh one is fetched if None)
+    :return: List of inventory records
+    """
+    from guardrail_inventory import load_inventory
+
+    if snapshot is None:
+        if bedrock_client is None:
+            bedrock_client = create_fleet_client(region, max_workers)
+        snapshot = load_inventory(refresh=True, bedrock_client=bedrock_client, region=region, max_workers=max_workers)
+    cutoff = None
+    if older_than_days is not None:
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=older_than_days)
+
+    selected = []
+    for record in snapshot["guardrails"]:
+        tags = record.get('tags', {})
+        if 'RoleName' not in tags or record.get('status') == 'DELETING':
+            continue
+        if role_name and tags['RoleName'] != role_name:
+            continue
+        if user_id and tags.get('UserId') != user_id:
+            continue
+        if not include_shared and (tags.get('UserId', '').startswith('shared-') or tags.get('PoolStatus') == 'AVAILABLE'):
+            continue
+        if cutoff is not None:
+            try:
+                created_at = datetime.datetime.strptime(tags['CreatedAt'], "%Y-%m-%d %H:%M:%S")
+            except (KeyError, ValueError):
+                continue
+            if created_at >= cutoff:
+                continue
+        selected.append(record)
+
+    return selected
+
+
+def delete_guardrails(records, bedrock_client, max_workers=8, rate=2.0, registry_file=REGISTRY_FILE):
+    """
+    Deletes guardrails concurrently under a rate limit, reporting progress as each call completes.
+
+    :param records: Inventory records (id, name) of the guardrails to delete
+    :param bedrock_client: Bedrock client
+    :param max_workers: Maximum number of concurrent delete calls
+    :param rate: Maximum delete calls started per second
+    :param registry_file: Registry file whose usage records of deleted guardrails are removed
+    :return: List of result dictionaries (guardrail_id, name, status)
+    """
+    from guardrail_inventory import invalidate_inventory
+
+    limiter = RateLimiter(rate)
+
+    def delete(record):
+        limiter.acquire()
+        try:
+            bedrock_client.delete_guardrail(guardrailIdentifier=record['id'])
+            return {"guardrail_id": record['id'], "name": record['name'], "status": "DELETED"}
+        except Exception as e:
+            return {"guardrail_id": record['id'], "name": record['name'], "status": "ERROR", "error": str(e)}
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(delete, record) for record in records]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result['status'] == 'DELETED':
+                print(f"[{len(results)}/{len(records)}] Deleted {result['name']} ({result['guardrail_id']})")
+            else:
+                print(f"[{len(results)}/{len(records)}] Error deleting {result['name']} ({result['guardrail_id']}): "
+                      f"{result['error']}")
+
+    invalidate_inventory()
+    forget_guardrails([r['guardrail_id'] for r in results if r['status'] == 'DELETED'], registry_file)
+    return results
+
+
+def ensure_guardrail_capacity(
+    needed,
+    quota=GUARDRAIL_QUOTA,
+    bedrock_client=None,
+    registry_file=REGISTRY_FILE,
+    region=AWS_REGION,
+    max_workers=8,
+    rate=2.0,
+    confirm=True
+):
+    """
+    Makes room for new guardrails by deleting the least recently used per-user guardrails.
+
+    Nothing is deleted while the account stays within the quota after the creates. Guardrails
+    are ordered by their last recorded use (see record_guardrail_use), falling back to their
+    CreatedAt tag for guardrails that were never used. Shared guardrails are never evicted.
+    The guardrails to evict belong to other users, so they are listed and confirmed first.
+
+    :param needed: Number of guardrails about to be created
+    :param quota: Maximum number of guardrails in the account
+    :param bedrock_client: Existing Bedrock client to reuse
+    :param registry_file: Registry file with the usage records
+    :param region: AWS region
+    :param max_workers: Maximum number of concurrent calls
+    :param rate: Maximum delete calls started per second
+    :param confirm: Ask before deleting (False deletes without asking)
+    :return: List of evicted guardrail IDs
+    """
+    from guardrail_inventory import load_inventory
+
+    if bedrock_client is None:
+        bedrock_client = create_fleet_client(region, max_workers)
+
+    # Counting only needs the list pages; details and tags are fetched once eviction is necessary
+    in_use = sum(1 for g in list_all_guardrails(bedrock_client) if g.get('status') != 'DELETING')
+    excess = in_use + needed - quota
+    if excess <= 0:
+        return []
+
+    snapshot = load_inventory(refresh=True, bedrock_client=bedrock_client, region=region, max_workers=max_workers)
+    last_used = load_registry(registry_file)["last_used"]
+    candidates = select_guardrails(snapshot=snapshot)
+    candidates.sort(key=lambda r: last_used.get(r['id']) or r['tags'].get('CreatedAt', ''))
+    victims = candidates[:excess]
+
+    print(f"{in_use} of {quota} guardrails in use and {needed} requested: "
+          f"{len(victims)} least recently used guardrails must be evicted.")
+    if len(victims) < excess:
+        print(f"Warning: Only {len(victims)} per-user guardrails can be evicted; "
+              f"{excess - len(victims)} creates may exceed the quota.")
+    if not victims:
+        return []
+
+    if confirm:
+        print_delete_plan(victims)
+        if not ask_yes_no_question(f"Delete these {len(victims)} guardrails to stay within the quota?", False):
+            print("Eviction cancelled. Creates beyond the quota may fail.")
+            return []
+
+    results = delete_guardrails(victims, bedrock_client, max_workers=max_workers, rate=rate, registry_file=registry_file)
+    return [r['guardrail_id'] for r in results if r['status'] == 'DELETED']
+
+
+def print_delete_plan(records):
+    """
+    Prints the guardrails a bulk delete would remove.
+
+    :param records: Inventory records from select_guardrails
+    """
+    if not records:
+        print("\nNo guardrails match the selection.")
+        return
+
+    print(f"\n=== {len(records)} guardrails selected for deletion ===")
+    for record in sorted(records, key=lambda r: r['tags'].get('CreatedAt', '')):
+        tags = record['tags']
+        print(f"{record['id']:<14} {record['name']:<40} role: {tags.get('RoleName', '-')}, "
+              f"created: {tags.get('CreatedAt', 'unknown')}")
+
+
+def load_desired_state(state_file):
+    """
+    Loads a desired-state file describing which users of which roles should have a guardrail.
+
+    Format:
+        {
+          "config_file": "guardrail_config.json",
+          "prune": false,
+          "roles": {
+            "developer": {"users": ["john123", "jane456"], "check_harmful_content": true, "check_prompt_attacks": true},
+            "admin": {"users": ["alice789"]}
+          }
+        }
+
+    With "prune": true, guardrails of the listed roles whose user is not listed are deleted.
+
+    :param state_file: Desired-state JSON file path
+    :return: Dictionary with config_file, prune, roles and users (manifest entries), or None if invalid
+    """
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        print(f"Error: Desired-state file '{state_file}' not found.")
+        return None
+    except json.JSONDecodeError:
+        print(f"Error: Invalid JSON format in desired-state file '{state_file}'.")
+        return None
+
+    config_file = state.get("config_file", "guardrail_config.json")
+    config = load_guardrail_config(config_file)
+    roles = state.get("roles", {})
+
+    unknown_roles = [role for role in roles if role not in config]
+    if unknown_roles:
+        print(f"Error: Roles not found in '{config_file}': {', '.join(unknown_roles)}")
+        return None
+
+    users = []
+    for role_name, role_state in roles.items():
+        for user_id in role_state.get("users", []):
+            users.append({
+                "role": role_name,
+                "user_id": str(user_id),
+                "check_harmful_content": role_state.get("check_harmful_content", True),
+                "check_prompt_attacks": role_state.get("check_prompt_attacks", True)
+            })
+
+    return {"config_file": config_file, "prune": state.get("prune", False), "roles": list(roles), "users": users}
+
+
+def plan_desired_state(state, bedrock_client=None, region=AWS_REGION, max_workers=8):
+    """
+    Computes the guardrails to create, update and delete to reach the desired state.
+
+    Existing guardrails are found by their RoleName/UserId tags (or name) in a fresh inventory
+    snapshot. Only those whose PolicyHash tag or live definition (live_policy_hash, which also
+    catches console edits) differs from the compiled configuration are fetched and diffed.
+    Guardrails with custom policies (see unmanaged_reason) are listed as unmanaged instead of updated.
+
+    :param state: Desired state from load_desired_state
+    :param bedrock_client: Existing Bedrock client to reuse
+    :param region: AWS region
+    :param max_workers: Maximum number of concurrent calls
+    :return: Dictionary with create (manifest entries), update (drift entries), unmanaged (drift entries),
+             delete (inventory records) and unchanged (count)
+    """
+    from guardrail_inventory import find_user_guardrail, load_inventory
+
+    if bedrock_client is None:
+        bedrock_client = create_fleet_client(region, max_workers)
+
+    snapshot = load_inventory(refresh=True, bedrock_client=bedrock_client, region=region, max_workers=max_workers)
+    config_file = state["config_file"]
+
+    to_create, candidates = [], []
+    for entry in state["users"]:
+        record = find_user_guardrail(snapshot, entry['role'], entry['user_id'])
+        if record is None or record.get('status') == 'DELETING':
+            to_create.append(entry)
+            continue
+        desired = compile_guardrail_params(entry['role'], entry['check_harmful_content'], entry['check_prompt_attacks'],
+                                           config_file=config_file, verbose=False)
+        # The tag records the policy at creation; the live hash also catches edits made outside the toolkit
+        desired_hash = compute_policy_hash(desired)
+        if record['tags'].get('PolicyHash') != desired_hash or record.get('live_policy_hash') != desired_hash:
+            candidates.append((entry, record, desired))
+
+    def inspect(candidate):
+        entry, record, desired = candidate
+        try:
+            live = normalize_guardrail_policy(bedrock_client.get_guardrail(guardrailIdentifier=record['id']))
+        except Exception as e:
+            print(f"Error inspecting guardrail {record['id']}: {str(e)}")
+            return None
+        changes = diff_guardrail_policy(live, desired)
+        if not changes:
+            return None
+        return {
+            "guardrail_id": record['id'],
+            "name": record['name'],
+            "arn": record['arn'],
+            "role": entry['role'],
+            "policy_hash": record['tags'].get('PolicyHash'),
+            "changes": changes,
+            "desired": desired,
+            "unmanaged": unmanaged_reason(record['tags'], desired),
+            "tags": {"HarmfulContentFilter": str(entry['check_harmful_content']),
+                     "PromptAttackPrevention": str(entry['check_prompt_attacks'])}
+        }
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        drifted = [d for d in executor.map(inspect, candidates) if d]
+    to_update = [d for d in drifted if not d['unmanaged']]
+    unmanaged = [d for d in drifted if d['unmanaged']]
+
+    to_delete = []
+    if state["prune"]:
+        desired_users = {user_key(e['role'], e['user_id']) for e in state["users"]}
+        desired_names = {guardrail_name_for(e['role'], e['user_id']) for e in state["users"]}
+        to_delete = [r for r in select_guardrails(snapshot=snapshot)
+                     if r['tags']['RoleName'] in state["roles"] and r['name'] not in desired_names
+                     and user_key(r['tags']['RoleName'], r['tags'].get('UserId', '')) not in desired_users]
+
+    return {
+        "create": to_create,
+        "update": to_update,
+        "unmanaged": unmanaged,
+        "delete": to_delete,
+        "unchanged": len(state["users"]) - len(to_create) - len(to_update) - len(unmanaged)
+    }
+
+
+def print_plan(plan):
+    """
+    Prints a desired-state plan.
+
+    :param plan: Plan from plan_desired_state
+    """
+    for entry in plan["create"]:
+        print(f"+ create {guardrail_name_for(entry['role'], entry['user_id'])}")
+    for entry in plan["update"]:
+        print(f"~ update {entry['name']} ({entry['guardrail_id']})")
+        for change in entry['changes']:
+            print(f"    {change}")
+    for entry in plan.get("unmanaged", []):
+        print(f"! skip {entry['name']} ({entry['guardrail_id']}): {entry['unmanaged']}")
+    for record in plan["delete"]:
+        print(f"- delete {record['name']} ({record['id']})")
+
+    print(f"\nPlan: {len(plan['create'])} to create, {len(plan['update'])} to update, "
+          f"{len(plan['delete'])} to delete, {plan['unchanged']} unchanged"
+          + (f", {len(plan['unmanaged'])} unmanaged." if plan.get("unmanaged") else "."))
+
+
+def apply_plan(
+    plan,
+    config_file="guardrail_config.json",
+    bedrock_client=None,
+    registry_file=REGISTRY_FILE,
+    region=AWS_REGION,
+    max_workers=8,
+    rate=2.0,
+    max_wait_time=300
+):
+    """
+    Executes a desired-state plan.
+
+    Deletions run first so they free quota for the creates; each phase runs concurrently
+    under the rate limit.
+
+    :param plan: Plan from plan_desired_state
+    :param config_file: Guardrail configuration file path
+    :param bedrock_client: Existing Bedrock client to reuse
+    :param registry_file: Registry file path
+    :param region: AWS region
+    :param max_workers: Maximum number of concurrent calls
+    :param rate: Maximum calls started per second in each phase
+    :param max_wait_time: Maximum time to wait for created and updated guardrails to become ready
+    :return: Dictionary with created, updated and deleted result lists
+    """
+    if bedrock_client is None:
+        bedrock_client = create_fleet_client(region, max_workers)
+
+    summary = {"created": [], "updated": [], "deleted": []}
+    if plan["delete"]:
+        print(f"\nDeleting {len(plan['delete'])} guardrails...")
+        summary["deleted"] = delete_guardrails(plan["delete"], bedrock_client, max_workers, rate, registry_file)
+    if plan["create"]:
+        print(f"\nCreating {len(plan['create'])} guardrails...")
+        summary["created"] = provision_users(plan["create"], config_file=config_file, region=region,
+                                             max_workers=max_workers, rate=rate, max_wait_time=max_wait_time,
+                                             bedrock_client=bedrock_client, registry_file=registry_file)
+    if plan["update"]:
+        print(f"\nUpdating {len(plan['update'])} guardrails...")
+        summary["updated"] = apply_reconcile(plan["update"], bedrock_client, registry_file, max_workers, rate,
+                                             max_wait_time)
+
+    from guardrail_inventory import invalidate_inventory
+    invalidate_inventory()
+
+    print("\n=== Apply Summary ===")
+    print(f"Created: {sum(1 for r in summary['created'] if r['status'] == 'READY')}/{len(plan['create'])}")
+    print(f"Updated: {sum(1 for r in summary['updated'] if r['status'] == 'READY')}/{len(plan['update'])}")
+    print(f"Deleted: {sum(1 for r in summary['deleted'] if r['status'] == 'DELETED')}/{len(plan['delete'])}")
+    return summary
+
+
+def export_provision_results(results, filename=None):
+    """
+    Exports the user to guardrail mapping of a provisioning batch to a JSON file.
+
+    :param results: Results returned by provision_users
+    :param filename: Filename to save as (auto-generated if None)
+    """
+    if filename is None:
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"guardrail_provision_results_{timestamp}.json"
+
+    try:
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nProvisioning results saved to '{filename}'.")
+        return True
+    except Exception as e:
+        print(f"Error saving results: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Amazon Bedrock Guardrails Fleet Tool")
+
+    # Set up subparsers
+    subparsers = parser.add_subparsers(dest="command", help="Command to run")
+
+    # Bulk provisioning command
+    provision_parser = subparsers.add_parser("provision", help="Create guardrails for all users in a manifest")
+    provision_parser.add_argument("manifest", help="CSV or JSON manifest with role and user_id per user")
+    provision_parser.add_argument("--config", default="guardrail_config.json", help="Guardrail configuration file path")
+    provision_parser.add_argument("--workers", type=int, default=8, help="Maximum number of concurrent create calls")
+    provision_parser.add_argument("--rate", type=float, default=2.0, help="Maximum create calls per second (default: 2)")
+    provision_parser.add_argument("--max-wait", type=int, default=300, help="Maximum seconds to wait for readiness")
+    provision_parser.add_argument("--export", action="store_true", help="Export the user to guardrail mapping to JSON file")
+    provision_parser.add_argument("--shared", action="store_true",
+                                  help="Share one guardrail among all users with the same effective policy")
+    provision_parser.add_argument("--registry", default=REGISTRY_FILE, help="Registry file for shared guardrail assignments")
+    provision_parser.add_argument("--evict", action="store_true",
+                                  help="Delete other users' least recently used guardrails when the quota would be exceeded")
+    provision_parser.add_argument("--quota", type=int, default=GUARDRAIL_QUOTA,
+                                  help=f"Account guardrail quota used with --evict (default: {GUARDRAIL_QUOTA})")
+    provision_parser.add_argument("--yes", action="store_true", help="Evict without asking for confirmation")
+
+    # Reconcile command
+    reconcile_parser = subparsers.add_parser("reconcile", help="Update guardrails that drifted from the configuration file")
+    reconcile_parser.add_argument("--config", default="guardrail_config.json", help="Guardrail configuration file path")
+    reconcile_parser.add_argument("--role", help="Only reconcile guardrails of this role")
+    reconcile_parser.add_argument("--dry-run", action="store_true", help="Only show the changes without updating")
+    reconcile_parser.add_argument("--workers", type=int, default=8, help="Maximum number of concurrent calls")
+    reconcile_parser.add_argument("--rate", type=float, default=2.0, help="Maximum update calls per second (default: 2)")
+    reconcile_parser.add_argument("--registry", default=REGISTRY_FILE, help="Registry file for shared guardrail assignments")
+
+    # Bulk delete command
+    delete_parser = subparsers.add_parser("delete", help="Delete guardrails selected by their tags")
+    delete_parser.add_argument("--role", help="Only delete guardrails of this role")
+    delete_parser.add_argument("--user", help="Only delete the guardrails of this user")
+    delete_parser.add_argument("--older-than", type=float, metavar="DAYS",
+                               help="Only delete guardrails created more than DAYS days ago")
+    delete_parser.add_argument("--include-shared", action="store_true",
+                               help="Also delete shared guardrails (users assigned to them lose their guardrail)")
+    delete_parser.add_argument("--dry-run", action="store_true", help="Only show the selected guardrails without deleting")
+    delete_parser.add_argument("--yes", action="store_true", help="Do not ask for confirmation")
+    delete_parser.add_argument("--workers", type=int, default=8, help="Maximum number of concurrent calls")
+    delete_parser.add_argument("--rate", type=float, default=2.0, help="Maximum delete calls per second (default: 2)")
+    delete_parser.add_argument("--registry", default=REGISTRY_FILE,
+                               help="Registry file the deleted guardrails are removed from")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    try:
+        if args.command == "provision":
+            manifest = load_user_manifest(args.manifest)
+            if manifest:
+                if args.shared:
+                    results = provision_users_shared(manifest, config_file=args.config, registry_file=args.registry,
+                                                     max_workers=args.workers)
+                else:
+                    results = provision_users(manifest, config_file=args.config, max_workers=args.workers,
+                                              rate=args.rate, max_wait_time=args.max_wait,
+                                              quota=args.quota if args.evict else None,
+                                              registry_file=args.registry, confirm_eviction=not args.yes)
+                print_provision_summary(results)
+                if args.export:
+                    export_provision_results(results)
+
+        elif args.command == "reconcile":
+            bedrock_client = create_fleet_client(max_workers=args.workers)
+            drifted = plan_reconcile(args.config, role_name=args.role, bedrock_client=bedrock_client,
+                                     max_workers=args.workers)
+            print_reconcile_plan(drifted)
+            if drifted and not args.dry_run:
+                results = apply_reconcile(drifted, bedrock_client, registry_file=args.registry,
+                                          max_workers=args.workers, rate=args.rate)
+                ready = sum(1 for r in results if r['status'] == 'READY')
+                print(f"\nUpdated {ready}/{len(results)} guardrails successfully.")
+
+        elif args.command == "delete":
+            if not (args.role or args.user or args.older_than is not None):
+                print("Error: Select guardrails with at least one of --role, --user or --older-than.")
+            else:
+                bedrock_client = create_fleet_client(max_workers=args.workers)
+                records = select_guardrails(bedrock_client, role_name=args.role, user_id=args.user,
+                                            older_than_days=args.older_than, include_shared=args.include_shared,
+                                            max_workers=args.workers)
+                print_delete_plan(records)
+                if records and not args.dry_run:
+                    if args.yes or ask_yes_no_question(f"\nDelete {len(records)} guardrails?", False):
+                        results = delete_guardrails(records, bedrock_client, max_workers=args.workers, rate=args.rate,
+                                                    registry_file=args.registry)
+                        deleted = sum(1 for r in results if r['status'] == 'DELETED')
+                        print(f"\nDeleted {deleted}/{len(results)} guardrails.")
+                    else:
+                        print("Deletion cancelled.")
+
+        else:
+            parser.print_help()
+            print("\n\nUsage Examples:")
+            print("  python guardrail_fleet.py provision users.csv")
+            print("  python guardrail_fleet.py provision users.json --rate 1 --workers 4 --export")
+            print("  python guardrail_fleet.py provision users.csv --shared")
+            print("  python guardrail_fleet.py provision users.csv --evict --quota 100")
+            print("  python guardrail_fleet.py reconcile --dry-run")
+            print("  python guardrail_fleet.py reconcile --role developer")
+            print("  python guardrail_fleet.py delete --role developer --older-than 30 --dry-run")
+            print("  python guardrail_fleet.py delete --user john123 --yes")
+
+    except KeyboardInterrupt:
+        print("\n\nExiting program.")
+    except Exception as e:
+        print(f"\nError occurred: {str(e)}")
+        import traceback
+        traceback.print_exc()
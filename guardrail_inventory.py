@@ -0,0 +1,297 @@
+import os
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from guardrails import AWS_REGION, compute_policy_hash, list_all_guardrails
+from guardrail_fleet import create_fleet_client, get_guardrail_tags, normalize_guardrail_policy
+from guardrail_registry import user_key
+
+# Local snapshot of the account's guardrails (summaries, details and tags)
+INVENTORY_FILE = "guardrail_inventory.json"
+# Seconds before a snapshot is considered stale and fetched again
+INVENTORY_TTL = 300
+
+# In-process copy of the indexed snapshot, keyed by inventory file path
+_inventory_cache = {}
+_inventory_lock = threading.Lock()
+
+
+def summarize_guardrail_policy(guardrail):
+    """
+    Summarizes the policies of a get_guardrail response.
+
+    :param guardrail: get_guardrail response
+    :return: Dictionary with topic names, filter strengths (input/output), denied word count and managed word lists
+    """
+    return {
+        "topics": [t['name'] for t in guardrail.get('topicPolicy', {}).get('topics', [])],
+        "filters": {f['type']: f"{f['inputStrength']}/{f['outputStrength']}"
+                    for f in guardrail.get('contentPolicy', {}).get('filters', [])},
+        "denied_words": len(guardrail.get('wordPolicy', {}).get('words', [])),
+        "managed_word_lists": [m['type'] for m in guardrail.get('wordPolicy', {}).get('managedWordLists', [])]
+    }
+
+
+def fetch_guardrail_inventory(bedrock_client=None, region=AWS_REGION, max_workers=8):
+    """
+    Fetches every guardrail in the account with its details and tags.
+
+    All list_guardrails pages are read first, then get_guardrail and list_tags_for_resource
+    are called concurrently for each guardrail.
+
+    :param bedrock_client: Existing Bedrock client to reuse
+    :param region: AWS region
+    :param max_workers: Maximum number of guardrails hydrated concurrently
+    :return: List of guardrail records (id, arn, name, status, version, description, updated_at, tags, policy,
+             live_policy_hash: compute_policy_hash of the live definition, comparable with compiled parameters)
+    """
+    if bedrock_client is None:
+        bedrock_client = create_fleet_client(region, max_workers)
+
+    summaries = list_all_guardrails(bedrock_client)
+
+    def hydrate(summary):
+        record = {
+            "id": summary.get('id'),
+            "arn": summary.get('arn'),
+            "name": summary.get('name'),
+            "status": summary.get('status'),
+            "version": summary.get('version'),
+            "description": summary.get('description'),
+            "updated_at": str(summary.get('updatedAt', '')),
+            "tags": {},
+            "policy": None,
+            "live_policy_hash": None
+        }
+        try:
+            detail = bedrock_client.get_guardrail(guardrailIdentifier=record['id'])
+            record["status"] = detail.get('status', record['status'])
+            record["policy"] = summarize_guardrail_policy(detail)
+            record["live_policy_hash"] = compute_policy_hash(normalize_guardrail_policy(detail))
+            if record["arn"]:
+                record["tags"] = get_guardrail_tags(bedrock_client, record['arn'])
+        except Exception as e:
+            print(f"Error fetching details of guardrail {record['id']}: {str(e)}")
+        return record
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(hydrate, summaries))
+
+
+def index_inventory(snapshot):
+    """
+    Adds id, name, user and tag indexes to an inventory snapshot.
+
+    The user index follows the RoleName and UserId tags, so it also finds guardrails whose name
+    doesn't follow Guardrail-{role}-{user} (e.g., taken from the warm pool).
+
+    :param snapshot: Dictionary with 'fetched_at', 'region' and 'guardrails'
+    :return: The snapshot with 'by_id', 'by_name', 'by_user' (user_key(role, user) -> record)
+             and 'by_tag' (tag key -> value -> records) added
+    """
+    by_id, by_name, by_user, by_tag = {}, {}, {}, {}
+    for record in snapshot["guardrails"]:
+        by_id[record['id']] = record
+        by_name[record['name']] = record
+        tags = record.get('tags', {})
+        if 'RoleName' in tags and 'UserId' in tags:
+            key = user_key(tags['RoleName'], tags['UserId'])
+            # A guardrail being deleted never hides a live one of the same user
+            if key not in by_user or by_user[key].get('status') == 'DELETING':
+                by_user[key] = record
+        for key, value in tags.items():
+            by_tag.setdefault(key, {}).setdefault(value, []).append(record)
+
+    snapshot["by_id"] = by_id
+    snapshot["by_name"] = by_name
+    snapshot["by_user"] = by_user
+    snapshot["by_tag"] = by_tag
+    return snapshot
+
+
+def save_inventory(snapshot, inventory_file=INVENTORY_FILE):
+    """
+    Saves the guardrail records of a snapshot atomically (write to a temporary file, then rename).
+
+    :param snapshot: Inventory snapshot
+    :param inventory_file: Inventory file path
+    """
+    data = {key: snapshot[key] for key in ("fetched_at", "region", "guardrails")}
+    temp_file = f"{inventory_file}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_file, inventory_file)
+
+
+def _read_inventory_file(inventory_file):
+    try:
+        with open(inventory_file, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        if "fetched_at" in snapshot and "guardrails" in snapshot:
+            return snapshot
+    except FileNotFoundError:
+        pass
+    except json.JSONDecodeError:
+        print(f"Warning: Ignoring invalid inventory file '{inventory_file}'.")
+    return None
+
+
+def load_inventory(
+    ttl=INVENTORY_TTL,
+    refresh=False,
+    inventory_file=INVENTORY_FILE,
+    bedrock_client=None,
+    region=AWS_REGION,
+    max_workers=8,
+    fetch=True
+):
+    """
+    Returns the indexed guardrail inventory, fetching it from Bedrock only when the snapshot is stale.
+
+    The snapshot is kept in memory and on disk, so repeated lookups within the TTL
+    (also across separate runs) make no API calls.
+
+    :param ttl: Maximum snapshot age in seconds
+    :param refresh: Fetch a new snapshot regardless of its age
+    :param inventory_file: Inventory file path
+    :param bedrock_client: Existing Bedrock client to reuse
+    :param region: AWS region
+    :param max_workers: Maximum number of guardrails hydrated concurrently
+    :param fetch: Fetch a snapshot when there is no fresh one (False returns None instead)
+    :return: Snapshot dictionary (fetched_at, region, guardrails, by_id, by_name, by_user, by_tag)
+    """
+    with _inventory_lock:
+        snapshot = None if refresh else _inventory_cache.get(inventory_file)
+        if snapshot is None and not refresh:
+            snapshot = _read_inventory_file(inventory_file)
+            if snapshot is not None:
+                snapshot = index_inventory(snapshot)
+
+        if snapshot is None or snapshot.get("region") != region or time.time() - snapshot["fetched_at"] > ttl:
+            if not fetch:
+                return None
+            snapshot = index_inventory({
+                "fetched_at": time.time(),
+                "region": region,
+                "guardrails": fetch_guardrail_inventory(bedrock_client, region, max_workers)
+            })
+            save_inventory(snapshot, inventory_file)
+
+        _inventory_cache[inventory_file] = snapshot
+        return snapshot
+
+
+def invalidate_inventory(inventory_file=INVENTORY_FILE):
+    """
+    Discards the inventory snapshot so the next lookup fetches a fresh one.
+
+    Call after creating or deleting guardrails.
+
+    :param inventory_file: Inventory file path
+    """
+    with _inventory_lock:
+        _inventory_cache.pop(inventory_file, None)
+        try:
+            os.remove(inventory_file)
+        except FileNotFoundError:
+            pass
+
+
+def find_user_guardrail(snapshot, role_name, user_id):
+    """
+    Looks up the guardrail of a user in an inventory snapshot, by its tags first and then by name.
+
+    :param snapshot: Snapshot from load_inventory
+    :param role_name: Role name
+    :param user_id: User identifier
+    :return: Guardrail record (None if not found)
+    """
+    return (snapshot["by_user"].get(user_key(role_name, user_id))
+            or snapshot["by_name"].get(f"Guardrail-{role_name}-{user_id}"))
+
+
+def find_guardrail(guardrail_id=None, name=None, **kwargs):
+    """
+    Looks up a guardrail in the inventory by ID or name.
+
+    :param guardrail_id: Guardrail ID
+    :param name: Guardrail name (used when no ID is given)
+    :param kwargs: Arguments passed to load_inventory (fetch=False only searches a fresh cached snapshot)
+    :return: Guardrail record (None if not found)
+    """
+    snapshot = load_inventory(**kwargs)
+    if snapshot is None:
+        return None
+    if guardrail_id is not None:
+        return snapshot["by_id"].get(guardrail_id)
+    return snapshot["by_name"].get(name)
+
+
+def find_guardrails_by_tag(key, value=None, **kwargs):
+    """
+    Looks up the guardrails carrying a tag.
+
+    :param key: Tag key (e.g., RoleName)
+    :param value: Tag value (None matches any value)
+    :param kwargs: Arguments passed to load_inventory
+    :return: List of guardrail records
+    """
+    values = load_inventory(**kwargs)["by_tag"].get(key, {})
+    if value is not None:
+        return list(values.get(value, []))
+    return [record for records in values.values() for record in records]
+
+
+def print_inventory(records, fetched_at=None):
+    """
+    Prints guardrail records as a table.
+
+    :param records: List of guardrail records
+    :param fetched_at: Snapshot time (epoch seconds) shown in the header
+    """
+    if not records:
+        print("\nNo guardrails found.")
+        return
+
+    header = f"\nFound {len(records)} guardrails"
+    if fetched_at:
+        header += f" (snapshot from {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(fetched_at))})"
+    print(header + ":")
+    print(f"{'ID':<14} {'Name':<40} {'Status':<10} {'Role':<12} {'User'}")
+    print("-" * 90)
+    for record in sorted(records, key=lambda r: r.get('name') or ''):
+        tags = record.get('tags', {})
+        print(f"{record['id']:<14} {record['name']:<40} {record['status']:<10} "
+              f"{tags.get('RoleName', '-'):<12} {tags.get('UserId', '-')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached inventory of the account's guardrails")
+    parser.add_argument("--refresh", action="store_true", help="Fetch a new snapshot even if the cached one is fresh")
+    parser.add_argument("--ttl", type=int, default=INVENTORY_TTL,
+                        help=f"Maximum snapshot age in seconds (default: {INVENTORY_TTL})")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent detail requests (default: 8)")
+    parser.add_argument("--file", default=INVENTORY_FILE, help=f"Snapshot file (default: {INVENTORY_FILE})")
+    parser.add_argument("--tag", help="Only show guardrails with this tag (KEY or KEY=VALUE)")
+    parser.add_argument("--name", help="Only show the guardrail with this name")
+    args = parser.parse_args()
+
+    options = {"ttl": args.ttl, "inventory_file": args.file, "max_workers": args.workers}
+    snapshot = load_inventory(refresh=args.refresh, **options)
+
+    if args.name:
+        record = snapshot["by_name"].get(args.name)
+        records = [record] if record else []
+    elif args.tag:
+        key, _, value = args.tag.partition('=')
+        records = find_guardrails_by_tag(key, value or None, **options)
+    else:
+        records = snapshot["guardrails"]
+
+    print_inventory(records, snapshot["fetched_at"])
+
+
+if __name__ == "__main__":
+    main()
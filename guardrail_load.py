@@ -0,0 +1,257 @@
+import csv
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from botocore.config import Config
+from guardrails import AWS_REGION
+from guardrail_client import DEFAULT_MODEL_ID, GuardedClient, TextDelta
+from guardrail_metrics import record_result, request_started, result_status
+
+# Latency percentiles reported for each QPS step
+LOAD_PERCENTILES = (50, 90, 99, 99.9)
+
+
+def arrival_schedule(qps, duration, arrival="constant", seed=None):
+    """
+    Returns the intended send times of an open-loop load step.
+
+    :param qps: Target arrival rate in requests per second
+    :param duration: Step duration in seconds
+    :param arrival: 'constant' (evenly spaced) or 'poisson' (exponential gaps with the same mean rate)
+    :param seed: Random seed for Poisson arrivals
+    :return: List of send offsets in seconds from the start of the step
+    """
+    if arrival == "constant":
+        return [i / qps for i in range(int(qps * duration))]
+    if arrival != "poisson":
+        raise ValueError(f"Unknown arrival process '{arrival}'. Use 'constant' or 'poisson'.")
+
+    rng = random.Random(seed)
+    offsets = []
+    offset = rng.expovariate(qps)
+    while offset < duration:
+        offsets.append(offset)
+        offset += rng.expovariate(qps)
+    return offsets
+
+
+def percentile(sorted_values, q):
+    """
+    Returns the q-th percentile (nearest rank) of sorted values.
+
+    :param sorted_values: Values in ascending order
+    :param q: Percentile between 0 and 100
+    :return: Percentile value (None if there are no values)
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, int(-(-q * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def create_load_client(guardrail_id, guardrail_version="DRAFT", model_id=DEFAULT_MODEL_ID, region=AWS_REGION,
+                       api="invoke", stream_processing_mode="sync", max_in_flight=64):
+    """
+    Creates a GuardedClient for load testing.
+
+    The client gets its own bedrock-runtime client without retries: retries would hide
+    throttling and add their backoff to the measured latency.
+
+    :return: GuardedClient
+    """
+    client = GuardedClient(guardrail_id=guardrail_id, guardrail_version=guardrail_version, model_id=model_id,
+                           region=region, api=api, stream_processing_mode=stream_processing_mode)
+    config = Config(max_pool_connections=max_in_flight, retries={"mode": "standard", "max_attempts": 1})
+    client.runtime = boto3.client('bedrock-runtime', region_name=region, config=config)
+    return client
+
+
+def run_load_step(client, prompts, qps, duration, arrival="constant", max_in_flight=64, seed=None):
+    """
+    Sends prompts at a target arrival rate for a fixed duration (open loop).
+
+    Requests are sent on schedule whether or not earlier ones have finished. When more than
+    max_in_flight requests are outstanding, new ones queue locally. Latency is measured from
+    each request's intended send time, so time spent waiting behind slow requests counts
+    (coordinated omission correction). Service time, from the actual send, is reported separately.
+
+    :param client: GuardedClient (see create_load_client)
+    :param prompts: Test prompts (category, prompt); used in turn
+    :param qps: Target arrival rate in requests per second
+    :param duration: Step duration in seconds
+    :param arrival: 'constant' or 'poisson'
+    :param max_in_flight: Maximum concurrent requests
+    :param seed: Random seed for Poisson arrivals
+    :return: Dictionary of step statistics
+    """
+    schedule = arrival_schedule(qps, duration, arrival, seed)
+    samples = []
+    samples_lock = threading.Lock()
+
+    def send(test, intended_time):
+        request_started()
+        sent_time = time.perf_counter()
+        first_token_time = None
+        result = {"category": test['category'], "api": client.api, "guardrail_status": "passed"}
+        try:
+            for event in client.stream(test['prompt']):
+                if isinstance(event, TextDelta):
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter()
+                elif event.blocked:
+                    result["guardrail_status"] = "blocked"
+        except Exception as e:
+            result["guardrail_status"] = "error"
+            result["error"] = str(e)
+        end_time = time.perf_counter()
+
+        result["response_time"] = end_time - intended_time
+        if first_token_time is not None:
+            result["time_to_first_token"] = first_token_time - intended_time
+        record_result(client.guardrail_id, result)
+        with samples_lock:
+            samples.append({
+                "status": result_status(result),
+                "latency": end_time - intended_time,
+                "service_time": end_time - sent_time,
+                "ttft": first_token_time - intended_time if first_token_time is not None else None
+            })
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for i, offset in enumerate(schedule):
+            intended_time = start_time + offset
+            delay = intended_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, prompts[i % len(prompts)], intended_time)
+    elapsed = time.perf_counter() - start_time
+
+    return summarize_load_step(samples, qps, elapsed, arrival)
+
+
+def summarize_load_step(samples, qps, elapsed, arrival="constant"):
+    """
+    Computes the statistics of a load step.
+
+    :param samples: Per-request samples (status, latency, service_time, ttft)
+    :param qps: Target arrival rate
+    :param elapsed: Time from the first scheduled send until every request finished
+    :param arrival: Arrival process used
+    :return: Dictionary with counts, rates, achieved throughput and latency percentiles
+    """
+    total = len(samples)
+    counts = {status: sum(1 for s in samples if s["status"] == status)
+              for status in ("passed", "blocked", "error", "throttled")}
+    completed = [s for s in samples if s["status"] in ("passed", "blocked")]
+    latencies = sorted(s["latency"] for s in completed)
+    service_times = sorted(s["service_time"] for s in completed)
+    ttfts = sorted(s["ttft"] for s in completed if s["ttft"] is not None)
+
+    step = {
+        "target_qps": qps,
+        "arrival": arrival,
+        "requests": total,
+        "achieved_qps": len(completed) / elapsed if elapsed > 0 else 0.0,
+        "error_rate": counts["error"] / total if total else 0.0,
+        "throttle_rate": counts["throttled"] / total if total else 0.0,
+        **counts
+    }
+    for q in LOAD_PERCENTILES:
+        step[f"latency_p{q}"] = percentile(latencies, q)
+        step[f"service_time_p{q}"] = percentile(service_times, q)
+        step[f"ttft_p{q}"] = percentile(ttfts, q)
+    step["latency_max"] = latencies[-1] if latencies else None
+    return step
+
+
+def run_load_test(client, prompts, qps_steps, duration, arrival="constant", max_in_flight=64, seed=None,
+                  cooldown=5.0):
+    """
+    Runs one open-loop load step per target rate and prints each step's results.
+
+    :param client: GuardedClient (see create_load_client)
+    :param prompts: Test prompts
+    :param qps_steps: Target arrival rates, run in the given order
+    :param duration: Duration of each step in seconds
+    :param arrival: 'constant' or 'poisson'
+    :param max_in_flight: Maximum concurrent requests
+    :param seed: Random seed for Poisson arrivals
+    :param cooldown: Pause between steps in seconds
+    :return: List of step statistics (the capacity curve)
+    """
+    print(f"\n========== Load Test: {client.guardrail_id} ==========")
+    print(f"Model: {client.model_id}, API: {client.api}, arrivals: {arrival}, "
+          f"{duration}s per step, max in flight: {max_in_flight}\n")
+    print(f"{'Target QPS':>10} {'Achieved':>9} {'p50 (s)':>8} {'p99 (s)':>8} {'p99.9 (s)':>10} "
+          f"{'TTFT p50':>9} {'Errors':>7} {'Throttled':>10}")
+    print("-" * 80)
+
+    steps = []
+    for i, qps in enumerate(qps_steps):
+        if i and cooldown:
+            time.sleep(cooldown)
+        step = run_load_step(client, prompts, qps, duration, arrival, max_in_flight, seed)
+        steps.append(step)
+        print(f"{qps:>10g} {step['achieved_qps']:>9.2f} {_fmt(step['latency_p50']):>8} {_fmt(step['latency_p99']):>8} "
+              f"{_fmt(step['latency_p99.9']):>10} {_fmt(step['ttft_p50']):>9} {step['error_rate']:>7.1%} "
+              f"{step['throttle_rate']:>10.1%}")
+    return steps
+
+
+def _fmt(value):
+    return f"{value:.3f}" if value is not None else "-"
+
+
+def write_capacity_curve(steps, output_prefix):
+    """
+    Saves the capacity curve as JSON and CSV, and as a PNG chart when matplotlib is installed.
+
+    :param steps: Step statistics from run_load_test
+    :param output_prefix: Output file path without extension
+    :return: List of written file paths
+    """
+    files = [f"{output_prefix}.json", f"{output_prefix}.csv"]
+    with open(files[0], 'w', encoding='utf-8') as f:
+        json.dump(steps, f, ensure_ascii=False, indent=2)
+    with open(files[1], 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(steps[0].keys()))
+        writer.writeheader()
+        writer.writerows(steps)
+
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed. Skipping the capacity curve chart.")
+    else:
+        qps = [s["target_qps"] for s in steps]
+        fig, (latency_ax, rate_ax) = plt.subplots(2, 1, figsize=(8, 8), sharex=True)
+        for q in (50, 99, 99.9):
+            latency_ax.plot(qps, [s[f"latency_p{q}"] for s in steps], marker="o", label=f"p{q}")
+        latency_ax.set_ylabel("Latency (s, from intended send)")
+        latency_ax.set_title("Guardrail capacity curve")
+        latency_ax.legend()
+        latency_ax.grid(True, alpha=0.3)
+        rate_ax.plot(qps, [s["achieved_qps"] for s in steps], marker="o", label="achieved QPS")
+        rate_ax.plot(qps, qps, linestyle="--", color="gray", label="target QPS")
+        rate_ax.set_xlabel("Target QPS")
+        rate_ax.set_ylabel("QPS")
+        error_ax = rate_ax.twinx()
+        error_ax.plot(qps, [s["error_rate"] + s["throttle_rate"] for s in steps], marker="x", color="red",
+                      label="error + throttle rate")
+        error_ax.set_ylabel("Error rate")
+        rate_ax.legend(loc="upper left")
+        error_ax.legend(loc="lower right")
+        rate_ax.grid(True, alpha=0.3)
+        fig.tight_layout()
+        fig.savefig(f"{output_prefix}.png")
+        plt.close(fig)
+        files.append(f"{output_prefix}.png")
+
+    print(f"\nCapacity curve saved to {', '.join(files)}.")
+    return files
@@ -0,0 +1,164 @@
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Error messages that mean the request was throttled rather than failed (matched case-insensitively:
+# errors raised mid-stream by ConverseStream/InvokeModelWithResponseStream carry 'throttlingException')
+THROTTLING_MARKERS = ("ThrottlingException", "TooManyRequestsException", "Too many requests", "Rate exceeded")
+_THROTTLING_MARKERS_LOWER = tuple(marker.lower() for marker in THROTTLING_MARKERS)
+
+# Metrics are only collected after start_metrics_server is called
+_enabled = False
+_lock = threading.Lock()
+_results = {}
+_latency = {}
+_first_token = {}
+_in_flight = 0
+_started_at = time.time()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _observe(histograms, key, value):
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = {"buckets": [0] * len(LATENCY_BUCKETS), "count": 0, "sum": 0.0}
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if value <= bound:
+            histogram["buckets"][i] += 1
+    histogram["count"] += 1
+    histogram["sum"] += value
+
+
+def result_status(result):
+    """
+    Returns the metrics status of a test result: passed, blocked, throttled or error.
+
+    :param result: Result from test_guardrail
+    """
+    if result.get('guardrail_status') == 'error':
+        error = (result.get('error') or '').lower()
+        if any(marker in error for marker in _THROTTLING_MARKERS_LOWER):
+            return "throttled"
+    return result.get('guardrail_status', 'error')
+
+
+def request_started():
+    """
+    Counts a model request as in flight. Call record_result when it finishes.
+    """
+    global _in_flight
+    if not _enabled:
+        return
+    with _lock:
+        _in_flight += 1
+
+
+def record_result(guardrail_id, result):
+    """
+    Records a finished test request: result counter, latency histograms and in-flight gauge.
+
+    :param guardrail_id: Guardrail ID
+    :param result: Result from test_guardrail
+    """
+    global _in_flight
+    if not _enabled:
+        return
+    api = result.get('api', 'invoke')
+    with _lock:
+        _in_flight = max(0, _in_flight - 1)
+        key = (guardrail_id, result.get('category', ''), result_status(result))
+        _results[key] = _results.get(key, 0) + 1
+        if result.get('response_time') is not None:
+            _observe(_latency, (guardrail_id, api), result['response_time'])
+        if result.get('time_to_first_token') is not None:
+            _observe(_first_token, (guardrail_id, api), result['time_to_first_token'])
+
+
+def _render_histogram(lines, name, help_text, histograms, label_names):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, histogram in sorted(histograms.items()):
+        for bound, count in zip(LATENCY_BUCKETS, histogram["buckets"]):
+            le = f'le="{bound}"'
+            lines.append(f"{name}_bucket{_labels(label_names, key, le)} {count}")
+        le = 'le="+Inf"'
+        lines.append(f"{name}_bucket{_labels(label_names, key, le)} {histogram['count']}")
+        lines.append(f"{name}_sum{_labels(label_names, key)} {histogram['sum']}")
+        lines.append(f"{name}_count{_labels(label_names, key)} {histogram['count']}")
+
+
+def render_metrics():
+    """
+    Renders the collected metrics in the Prometheus text exposition format.
+
+    :return: Metrics text
+    """
+    with _lock:
+        lines = [
+            "# HELP guardrail_validation_results_total Test requests by guardrail, category and result",
+            "# TYPE guardrail_validation_results_total counter"
+        ]
+        for key, count in sorted(_results.items()):
+            lines.append(f"guardrail_validation_results_total"
+                         f"{_labels(('guardrail_id', 'category', 'status'), key)} {count}")
+
+        _render_histogram(lines, "guardrail_validation_request_duration_seconds",
+                          "Time from sending a test request to the end of its response", _latency,
+                          ('guardrail_id', 'api'))
+        _render_histogram(lines, "guardrail_validation_time_to_first_token_seconds",
+                          "Time from sending a test request to its first streamed token", _first_token,
+                          ('guardrail_id', 'api'))
+
+        lines.append("# HELP guardrail_validation_requests_in_flight Test requests waiting for a response")
+        lines.append("# TYPE guardrail_validation_requests_in_flight gauge")
+        lines.append(f"guardrail_validation_requests_in_flight {_in_flight}")
+        lines.append("# HELP guardrail_validation_start_time_seconds Time the validator started (epoch seconds)")
+        lines.append("# TYPE guardrail_validation_start_time_seconds gauge")
+        lines.append(f"guardrail_validation_start_time_seconds {_started_at}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=9108, host="0.0.0.0"):
+    """
+    Starts collecting metrics and serves them at http://host:port/metrics from a background thread.
+
+    :param port: Port to listen on
+    :param host: Address to bind
+    :return: HTTP server (call shutdown() to stop it)
+    """
+    global _enabled
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="guardrail-metrics", daemon=True).start()
+    _enabled = True
+    print(f"Serving metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
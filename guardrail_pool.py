@@ -0,0 +1,306 @@
+import uuid
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from guardrails import (
+    AWS_REGION,
+    GUARDRAIL_QUOTA,
+    compile_guardrail_params,
+    compute_policy_hash,
+    create_dynamic_guardrail,
+    get_available_roles,
+    list_all_guardrails
+)
+from guardrail_fleet import RateLimiter, create_fleet_client, wait_for_batch_ready
+from guardrail_registry import (
+    REGISTRY_FILE,
+    add_pool_guardrails,
+    assign_users,
+    pool_guardrail_count,
+    record_guardrail_use,
+    take_pool_guardrail
+)
+
+# Ready guardrails kept in stock per role
+POOL_SIZE = 3
+
+# Background refills, one at a time per role
+_refill_executor = None
+_refills = {}
+_refill_lock = threading.RLock()
+
+
+def fill_pool(
+    role_name,
+    size=POOL_SIZE,
+    config_file="guardrail_config.json",
+    registry_file=REGISTRY_FILE,
+    bedrock_client=None,
+    region=AWS_REGION,
+    max_workers=4,
+    rate=2.0,
+    max_wait_time=300,
+    quota=GUARDRAIL_QUOTA
+):
+    """
+    Tops up a role's warm pool to the given size with ready guardrails.
+
+    Pool guardrails use the role's default settings (harmful content filter and prompt attack
+    prevention on) and are tagged PoolStatus=AVAILABLE until a user takes them. They only enter
+    the pool once they are READY, so a guardrail taken from the pool can be used immediately.
+    The pool never grows past the account quota; guardrails are not evicted to make room for it.
+
+    :param role_name: Role name defined in the configuration file
+    :param size: Number of guardrails the pool should hold
+    :param config_file: Guardrail configuration file path
+    :param registry_file: Registry file holding the pool
+    :param bedrock_client: Existing Bedrock client to reuse
+    :param region: AWS region
+    :param max_workers: Maximum number of concurrent create calls
+    :param rate: Maximum create calls started per second
+    :param max_wait_time: Maximum time to wait for the new guardrails to become ready
+    :param quota: Account guardrail quota the pool must leave room under
+    :return: List of guardrail IDs added to the pool
+    """
+    missing = size - pool_guardrail_count(role_name, registry_file)
+    if missing <= 0:
+        return []
+
+    if bedrock_client is None:
+        bedrock_client = create_fleet_client(region, max_workers)
+
+    in_use = sum(1 for g in list_all_guardrails(bedrock_client) if g.get('status') != 'DELETING')
+    if in_use + missing > quota:
+        print(f"Warning: {in_use} of {quota} guardrails in use. "
+              f"Adding {max(quota - in_use, 0)} instead of {missing} guardrails to the {role_name} pool.")
+        missing = quota - in_use
+        if missing <= 0:
+            return []
+
+    compiled_params = compile_guardrail_params(role_name, config_file=config_file, verbose=False)
+    policy_hash = compute_policy_hash(compiled_params)
+    limiter = RateLimiter(rate)
+
+    def create(_):
+        limiter.acquire()
+        try:
+            return create_dynamic_guardrail(
+                role_name,
+                f"pool-{uuid.uuid4().hex[:12]}",
+                config_file=config_file,
+                bedrock_client=bedrock_client,
+                wait_until_ready=False,
+                verbose=False,
+                compiled_params=compiled_params,
+                extra_tags={"PoolStatus": "AVAILABLE"}
+            )
+        except Exception as e:
+            print(f"Error creating pool guardrail for {role_name}: {str(e)}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        created = [guardrail_id for guardrail_id in executor.map(create, range(missing)) if guardrail_id]
+    if not created:
+        return []
+
+    statuses = wait_for_batch_ready(bedrock_client, created, max_wait_time)
+    ready = {guardrail_id for guardrail_id, status in statuses.items() if status == 'READY'}
+    arns = {g['id']: g.get('arn') for g in list_all_guardrails(bedrock_client) if g.get('id') in ready}
+
+    add_pool_guardrails(role_name, [
+        {"guardrail_id": guardrail_id, "arn": arns.get(guardrail_id), "policy_hash": policy_hash,
+         "created_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        for guardrail_id in created if guardrail_id in ready
+    ], registry_file)
+
+    print(f"Added {len(ready)} guardrails to the {role_name} pool.")
+    return [guardrail_id for guardrail_id in created if guardrail_id in ready]
+
+
+def start_pool_refill(role_name, size=POOL_SIZE, **kwargs):
+    """
+    Refills a role's warm pool in a background thread.
+
+    A refill that is already running for the role is reused instead of starting another one.
+
+    :param role_name: Role name
+    :param size: Number of guardrails the pool should hold
+    :param kwargs: Other arguments passed to fill_pool
+    :return: Future resolving to the IDs added to the pool
+    """
+    with _refill_lock:
+        future = _refills.get(role_name)
+        if future is None or future.done():
+            future = _background_executor().submit(fill_pool, role_name, size, **kwargs)
+            _refills[role_name] = future
+        return future
+
+
+def _background_executor():
+    global _refill_executor
+    with _refill_lock:
+        if _refill_executor is None:
+            _refill_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="guardrail-pool")
+        return _refill_executor
+
+
+def take_from_pool(
+    role_name,
+    user_id,
+    pool_size=POOL_SIZE,
+    config_file="guardrail_config.json",
+    registry_file=REGISTRY_FILE,
+    bedrock_client=None,
+    region=AWS_REGION,
+    refill=True
+):
+    """
+    Assigns a pre-provisioned guardrail to a new user.
+
+    Taking a guardrail is a single tag_resource call (UserId and PoolStatus) plus a local
+    registry write. The guardrail keeps its pool name and stays READY; plans, prunes and
+    lookups find it through the registry assignment and its RoleName/UserId tags. A guardrail
+    whose tagging fails goes back to the pool. Pool guardrails built from an older configuration
+    are skipped and deleted in the background. When the pool is empty the guardrail is created
+    on the spot, which waits for readiness.
+
+    :param role_name: Role name defined in the configuration file
+    :param user_id: User identifier
+    :param pool_size: Number of guardrails the background refill restores
+    :param config_file: Guardrail configuration file path
+    :param registry_file: Registry file holding the pool and the assignments
+    :param bedrock_client: Existing Bedrock client to reuse
+    :param region: AWS region
+    :param refill: Refill the pool in the background afterwards
+    :return: Guardrail ID assigned to the user
+    """
+    if bedrock_client is None:
+        bedrock_client = create_fleet_client(region)
+
+    compiled_params = compile_guardrail_params(role_name, config_file=config_file, verbose=False)
+    policy_hash = compute_policy_hash(compiled_params)
+
+    guardrail_id = None
+    failed = []
+    while guardrail_id is None:
+        entry, stale = take_pool_guardrail(role_name, policy_hash, registry_file)
+        if stale:
+            print(f"Discarding {len(stale)} pool guardrails built from an older configuration.")
+            _background_executor().submit(_discard_pool_guardrails, bedrock_client,
+                                          [e["guardrail_id"] for e in stale])
+        if entry is None:
+            break
+        try:
+            bedrock_client.tag_resource(resourceARN=entry["arn"], tags=[
+                {"key": "UserId", "value": user_id},
+                {"key": "PoolStatus", "value": "ASSIGNED"}
+            ])
+            guardrail_id = entry["guardrail_id"]
+        except Exception as e:
+            print(f"Error assigning pool guardrail {entry['guardrail_id']}: {str(e)}")
+            failed.append(entry)
+
+    # Still tagged AVAILABLE, so nothing else would ever assign or delete them
+    if failed:
+        add_pool_guardrails(role_name, failed, registry_file)
+
+    if guardrail_id is None:
+        print(f"Warning: The {role_name} pool is empty. Creating a guardrail for '{user_id}' directly.")
+        guardrail_id = create_dynamic_guardrail(role_name, user_id, config_file=config_file,
+                                                bedrock_client=bedrock_client, verbose=False,
+                                                compiled_params=compiled_params)
+
+    assign_users([{"user_id": user_id, "role": role_name, "guardrail_id": guardrail_id, "policy_hash": policy_hash}],
+                 registry_file)
+    record_guardrail_use(guardrail_id, registry_file)
+
+    if refill:
+        start_pool_refill(role_name, pool_size, config_file=config_file, registry_file=registry_file,
+                          bedrock_client=bedrock_client, region=region)
+    return guardrail_id
+
+
+def _discard_pool_guardrails(bedrock_client, guardrail_ids):
+    for guardrail_id in guardrail_ids:
+        try:
+            bedrock_client.delete_guardrail(guardrailIdentifier=guardrail_id)
+        except Exception as e:
+            print(f"Error deleting guardrail {guardrail_id}: {str(e)}")
+
+
+def print_pool_status(roles, registry_file=REGISTRY_FILE):
+    """
+    Prints the number of ready guardrails in each role's pool.
+
+    :param roles: Role names
+    :param registry_file: Registry file holding the pool
+    """
+    print("\n=== Warm Pool ===")
+    for role_name in roles:
+        print(f"{role_name:<20} {pool_guardrail_count(role_name, registry_file)} ready")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm pool of pre-provisioned guardrails")
+    subparsers = parser.add_subparsers(dest="command", help="Command to run")
+
+    fill_parser = subparsers.add_parser("fill", help="Top up the pool of every role (or one role)")
+    fill_parser.add_argument("--role", help="Only fill the pool of this role")
+    fill_parser.add_argument("--size", type=int, default=POOL_SIZE, help=f"Guardrails per role (default: {POOL_SIZE})")
+    fill_parser.add_argument("--config", default="guardrail_config.json", help="Guardrail configuration file path")
+    fill_parser.add_argument("--registry", default=REGISTRY_FILE, help="Registry file holding the pool")
+    fill_parser.add_argument("--workers", type=int, default=4, help="Maximum number of concurrent create calls")
+    fill_parser.add_argument("--rate", type=float, default=2.0, help="Maximum create calls per second (default: 2)")
+
+    take_parser = subparsers.add_parser("take", help="Assign a pooled guardrail to a user")
+    take_parser.add_argument("role", help="Role of the user")
+    take_parser.add_argument("user_id", help="User identifier")
+    take_parser.add_argument("--config", default="guardrail_config.json", help="Guardrail configuration file path")
+    take_parser.add_argument("--registry", default=REGISTRY_FILE, help="Registry file holding the pool")
+    take_parser.add_argument("--no-refill", action="store_true", help="Do not refill the pool afterwards")
+
+    status_parser = subparsers.add_parser("status", help="Show the number of pooled guardrails per role")
+    status_parser.add_argument("--config", default="guardrail_config.json", help="Guardrail configuration file path")
+    status_parser.add_argument("--registry", default=REGISTRY_FILE, help="Registry file holding the pool")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "fill":
+            roles = [args.role] if args.role else get_available_roles(args.config)
+            bedrock_client = create_fleet_client(max_workers=args.workers)
+            for role in roles:
+                fill_pool(role, args.size, config_file=args.config, registry_file=args.registry,
+                          bedrock_client=bedrock_client, max_workers=args.workers, rate=args.rate)
+            print_pool_status(roles, args.registry)
+
+        elif args.command == "take":
+            start_time = time.time()
+            guardrail_id = take_from_pool(args.role, args.user_id, config_file=args.config,
+                                          registry_file=args.registry, refill=not args.no_refill)
+            print(f"User '{args.user_id}' ({args.role}) is assigned to guardrail {guardrail_id} "
+                  f"in {time.time() - start_time:.2f}s.")
+            if not args.no_refill:
+                print("Refilling the pool...")
+                with _refill_lock:
+                    refill = _refills.get(args.role)
+                if refill:
+                    refill.result()
+
+        elif args.command == "status":
+            print_pool_status(get_available_roles(args.config), args.registry)
+
+        else:
+            parser.print_help()
+            print("\n\nUsage Examples:")
+            print("  python guardrail_pool.py fill --size 5")
+            print("  python guardrail_pool.py take developer john123")
+            print("  python guardrail_pool.py status")
+
+    except KeyboardInterrupt:
+        print("\n\nExiting program.")
+    except Exception as e:
+        print(f"\nError occurred: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,525 @@
+import boto3
+import os
+import json
+import time
+import threading
+import contextlib
+from botocore.exceptions import ClientError
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from guardrails import (
+    AWS_REGION,
+    compile_guardrail_params,
+    compute_policy_hash,
+    create_dynamic_guardrail,
+    list_all_guardrails
+)
+
+# Local registry of shared guardrails (by policy hash) and user assignments
+REGISTRY_FILE = "guardrail_registry.json"
+# Frequent small updates (user assignments, guardrail use) are appended to {registry file}.log
+# and folded into the registry file once the log grows past this size
+JOURNAL_MAX_BYTES = 1024 * 1024
+
+# Serializes read-modify-write cycles on the registry file within the process
+_registry_lock = threading.RLock()
+# Registry file -> [open lock file, nesting depth] while this process holds the file lock
+_held_locks = {}
+# One lock per policy hash so concurrent onboarding never creates the same policy twice
+_policy_locks = {}
+# Seconds a shared guardrail found in the registry is trusted before it is checked with get_guardrail again
+SHARED_GUARDRAIL_CHECK_TTL = 300
+# (registry file, policy hash) -> (guardrail ID, monotonic time of the last check)
+_checked_policies = {}
+
+
+def user_key(role_name, user_id):
+    """
+    Returns the registry key of a user's assignment. The same user can hold one guardrail per role.
+    """
+    return f"{role_name}:{user_id}"
+
+
+@contextlib.contextmanager
+def registry_lock(registry_file=REGISTRY_FILE):
+    """
+    Holds the registry lock across threads and processes (a lock on {registry file}.lock).
+
+    The lock is reentrant within a thread, so functions holding it can call each other.
+
+    :param registry_file: Registry file path
+    """
+    with _registry_lock:
+        held = _held_locks.get(registry_file)
+        if held:
+            held[1] += 1
+        else:
+            lock_file = open(f"{registry_file}.lock", 'a+')
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            held = _held_locks[registry_file] = [lock_file, 1]
+        try:
+            yield
+        finally:
+            held[1] -= 1
+            if not held[1]:
+                del _held_locks[registry_file]
+                if fcntl:
+                    fcntl.flock(held[0].fileno(), fcntl.LOCK_UN)
+                else:
+                    held[0].seek(0)
+                    msvcrt.locking(held[0].fileno(), msvcrt.LK_UNLCK, 1)
+                held[0].close()
+
+
+def _apply_journal_entry(registry, entry):
+    if entry["op"] == "assign":
+        registry["users"][entry["key"]] = entry["assignment"]
+    elif entry["op"] == "use":
+        registry["last_used"][entry["guardrail_id"]] = entry["at"]
+    elif entry["op"] == "generation":
+        registry["generations"][entry["key"]] = entry["record"]
+
+
+def load_registry(registry_file=REGISTRY_FILE):
+    """
+    Loads the guardrail registry file and replays the updates appended to its log since it was last saved.
+
+    :param registry_file: Registry file path
+    :return: Registry dictionary with 'policies' (hash -> guardrail), 'users' (user_key(role, user) -> assignment)
+             'last_used' (guardrail ID -> time of last use), 'pool' (role -> ready unassigned guardrails)
+             and 'generations' (user_key(role, user) -> generation and ID of the last per-user guardrail created)
+    """
+    with registry_lock(registry_file):
+        try:
+            with open(registry_file, 'r', encoding='utf-8') as f:
+                registry = json.load(f)
+        except FileNotFoundError:
+            registry = {}
+        except json.JSONDecodeError:
+            print(f"Error: Invalid JSON format in registry file '{registry_file}'. Starting with an empty registry.")
+            registry = {}
+
+        registry.setdefault("policies", {})
+        registry.setdefault("users", {})
+        registry.setdefault("last_used", {})
+        registry.setdefault("pool", {})
+        registry.setdefault("generations", {})
+
+        # Assignments from older registries are keyed by user ID alone
+        for key, assignment in list(registry["users"].items()):
+            if "user_id" not in assignment:
+                del registry["users"][key]
+                registry["users"][user_key(assignment["role"], key)] = {"user_id": key, **assignment}
+
+        try:
+            with open(f"{registry_file}.log", 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        _apply_journal_entry(registry, json.loads(line))
+                    except (json.JSONDecodeError, KeyError):
+                        # A partly written last line from an interrupted process
+                        continue
+        except FileNotFoundError:
+            pass
+    return registry
+
+
+def save_registry(registry, registry_file=REGISTRY_FILE):
+    """
+    Saves the guardrail registry atomically (write to a temporary file, then rename) and clears its log.
+
+    Call it while holding registry_lock since the matching load_registry, so no logged update is lost.
+
+    :param registry: Registry dictionary
+    :param registry_file: Registry file path
+    """
+    with registry_lock(registry_file):
+        temp_file = f"{registry_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(registry, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, registry_file)
+        if os.path.exists(f"{registry_file}.log"):
+            os.remove(f"{registry_file}.log")
+
+
+def append_registry_entries(entries, registry_file=REGISTRY_FILE):
+    """
+    Appends updates to the registry log without rewriting the registry file.
+
+    The log is folded into the registry file once it grows past JOURNAL_MAX_BYTES.
+
+    :param entries: Log entries ({"op": "assign", "key", "assignment"}, {"op": "use", "guardrail_id", "at"}
+                    or {"op": "generation", "key", "record"})
+    :param registry_file: Registry file path
+    """
+    with registry_lock(registry_file):
+        journal_file = f"{registry_file}.log"
+        with open(journal_file, 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+        if os.path.getsize(journal_file) > JOURNAL_MAX_BYTES:
+            save_registry(load_registry(registry_file), registry_file)
+
+
+def shared_guardrail_user_id(policy_hash):
+    """
+    Returns the user ID part of a shared guardrail's name (Guardrail-{role}-shared-{hash prefix}).
+    """
+    return f"shared-{policy_hash[:12]}"
+
+
+def find_shared_guardrail(bedrock_client, role_name, policy_hash):
+    """
+    Looks for a shared guardrail with the given policy hash in the account.
+
+    Used when the local registry does not know the policy yet (e.g., it was created from another machine).
+
+    :param bedrock_client: Bedrock client
+    :param role_name: Role name
+    :param policy_hash: Policy hash from compute_policy_hash
+    :return: Guardrail summary or None
+    """
+    name = f"Guardrail-{role_name}-{shared_guardrail_user_id(policy_hash)}"
+    for guardrail in list_all_guardrails(bedrock_client):
+        if guardrail.get('name') == name and guardrail.get('status') != 'FAILED':
+            return guardrail
+    return None
+
+
+def _policy_lock(policy_hash):
+    with _registry_lock:
+        return _policy_locks.setdefault(policy_hash, threading.Lock())
+
+
+def ensure_shared_guardrail(
+    role_name,
+    compiled_params,
+    check_harmful_content=True,
+    check_prompt_attacks=True,
+    registry_file=REGISTRY_FILE,
+    bedrock_client=None,
+    region=AWS_REGION,
+    verbose=True,
+    config_file="guardrail_config.json"
+):
+    """
+    Returns the shared guardrail enforcing the compiled policy, creating it only if none exists yet.
+
+    A guardrail found in the registry is checked with get_guardrail at most once per
+    SHARED_GUARDRAIL_CHECK_TTL seconds and recreated if it no longer exists.
+
+    :param role_name: Role name
+    :param compiled_params: Parameters from compile_guardrail_params
+    :param check_harmful_content: Harmful content flag the parameters were compiled with (for tags)
+    :param check_prompt_attacks: Prompt attack flag the parameters were compiled with (for tags)
+    :param registry_file: Registry file path
+    :param bedrock_client: Existing Bedrock client to reuse
+    :param region: AWS region
+    :param verbose: Print progress
+    :param config_file: Configuration file the parameters were compiled from (tells role policies from custom ones)
+    :return: (guardrail ID, policy hash)
+    """
+    policy_hash = compute_policy_hash(compiled_params)
+    cache_key = (registry_file, policy_hash)
+
+    with _policy_lock(policy_hash):
+        # Onboarding onto a recently checked policy needs neither the registry file nor an API call
+        checked = _checked_policies.get(cache_key)
+        if checked and time.monotonic() - checked[1] < SHARED_GUARDRAIL_CHECK_TTL:
+            return checked[0], policy_hash
+
+        registry = load_registry(registry_file)
+        policy = registry["policies"].get(policy_hash)
+        if bedrock_client is None:
+            bedrock_client = boto3.client('bedrock', region_name=region)
+
+        # A registry hit may point at a guardrail deleted outside this registry
+        if policy:
+            try:
+                bedrock_client.get_guardrail(guardrailIdentifier=policy["guardrail_id"])
+                _checked_policies[cache_key] = (policy["guardrail_id"], time.monotonic())
+                return policy["guardrail_id"], policy_hash
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') != 'ResourceNotFoundException':
+                    raise
+            if verbose:
+                print(f"Shared guardrail {policy['guardrail_id']} for policy {policy_hash[:12]} no longer exists.")
+            forget_guardrails([policy["guardrail_id"]], registry_file)
+
+        # Each shared guardrail created for the policy gets the next generation (kept when it is deleted),
+        # so a recreate never reuses the token the deleted guardrail was created with
+        shared_key = user_key(role_name, shared_guardrail_user_id(policy_hash))
+        previous = registry["generations"].get(shared_key)
+        generation = previous["generation"] + 1 if previous else 1
+
+        found = find_shared_guardrail(bedrock_client, role_name, policy_hash)
+        created = not found
+        if found:
+            guardrail_id = found['id']
+            if verbose:
+                print(f"Found existing shared guardrail {guardrail_id} for policy {policy_hash[:12]}.")
+        else:
+            if verbose:
+                print(f"No guardrail enforces policy {policy_hash[:12]} yet. Creating a shared guardrail...")
+            guardrail_id = create_dynamic_guardrail(
+                role_name,
+                shared_guardrail_user_id(policy_hash),
+                check_harmful_content=check_harmful_content,
+                check_prompt_attacks=check_prompt_attacks,
+                config_file=config_file,
+                bedrock_client=bedrock_client,
+                client_request_token=f"shared-{policy_hash[:40]}-{generation}",
+                verbose=verbose,
+                compiled_params=compiled_params
+            )
+
+        with registry_lock(registry_file):
+            registry = load_registry(registry_file)
+            registry["policies"][policy_hash] = {
+                "guardrail_id": guardrail_id,
+                "role": role_name,
+                "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+            if created:
+                registry["generations"][shared_key] = {"generation": generation, "guardrail_id": guardrail_id}
+            save_registry(registry, registry_file)
+        _checked_policies[cache_key] = (guardrail_id, time.monotonic())
+
+    return guardrail_id, policy_hash
+
+
+def rekey_policy(old_hash, new_hash, registry_file=REGISTRY_FILE):
+    """
+    Moves a shared guardrail to a new policy hash after its policy was updated in place.
+
+    :param old_hash: Policy hash the guardrail was registered under
+    :param new_hash: Policy hash of the updated guardrail
+    :param registry_file: Registry file path
+    """
+    if old_hash == new_hash:
+        return
+    _checked_policies.pop((registry_file, old_hash), None)
+    with registry_lock(registry_file):
+        registry = load_registry(registry_file)
+        policy = registry["policies"].pop(old_hash, None)
+        if policy is None:
+            return
+        registry["policies"][new_hash] = policy
+        for assignment in registry["users"].values():
+            if assignment.get("policy_hash") == old_hash:
+                assignment["policy_hash"] = new_hash
+        save_registry(registry, registry_file)
+
+
+def assign_users(assignments, registry_file=REGISTRY_FILE):
+    """
+    Records (role, user) -> guardrail assignments by appending them to the registry log.
+
+    :param assignments: List of dictionaries with user_id, role, guardrail_id and policy_hash
+    :param registry_file: Registry file path
+    """
+    assigned_at = time.strftime("%Y-%m-%d %H:%M:%S")
+    append_registry_entries([{
+        "op": "assign",
+        "key": user_key(assignment["role"], assignment["user_id"]),
+        "assignment": {
+            "user_id": assignment["user_id"],
+            "role": assignment["role"],
+            "guardrail_id": assignment["guardrail_id"],
+            "policy_hash": assignment["policy_hash"],
+            "assigned_at": assigned_at
+        }
+    } for assignment in assignments], registry_file)
+
+
+def assign_user_guardrail(
+    role_name,
+    user_id,
+    check_harmful_content=True,
+    check_prompt_attacks=True,
+    custom_denied_topics=None,
+    config_file="guardrail_config.json",
+    registry_file=REGISTRY_FILE,
+    bedrock_client=None,
+    region=AWS_REGION,
+    verbose=True
+):
+    """
+    Gives a user the guardrail matching their effective policy, sharing it with every other
+    user whose policy is identical.
+
+    When a guardrail for the policy already exists this is only a local registry write.
+
+    :param role_name: Role name defined in the configuration file
+    :param user_id: User identifier
+    :param check_harmful_content: Whether to enable harmful content filter
+    :param check_prompt_attacks: Whether to enable prompt attack prevention
+    :param custom_denied_topics: Additional list of denied topics (added to default settings)
+    :param config_file: Guardrail configuration file path
+    :param registry_file: Registry file path
+    :param bedrock_client: Existing Bedrock client to reuse
+    :param region: AWS region
+    :param verbose: Print progress
+    :return: Guardrail ID assigned to the user
+    """
+    compiled_params = compile_guardrail_params(
+        role_name,
+        check_harmful_content=check_harmful_content,
+        check_prompt_attacks=check_prompt_attacks,
+        custom_denied_topics=custom_denied_topics,
+        config_file=config_file,
+        verbose=False
+    )
+
+    guardrail_id, policy_hash = ensure_shared_guardrail(
+        role_name,
+        compiled_params,
+        check_harmful_content=check_harmful_content,
+        check_prompt_attacks=check_prompt_attacks,
+        registry_file=registry_file,
+        bedrock_client=bedrock_client,
+        region=region,
+        verbose=verbose,
+        config_file=config_file
+    )
+
+    assign_users([{"user_id": user_id, "role": role_name, "guardrail_id": guardrail_id, "policy_hash": policy_hash}],
+                 registry_file)
+
+    if verbose:
+        print(f"User '{user_id}' ({role_name}) is assigned to guardrail {guardrail_id}.")
+    return guardrail_id
+
+
+def resolve_user_guardrail(role_name, user_id, registry_file=REGISTRY_FILE):
+    """
+    Looks up the guardrail assigned to a user in a role.
+
+    :param role_name: Role name
+    :param user_id: User identifier
+    :param registry_file: Registry file path
+    :return: Guardrail ID (None if the user has no assignment in the role)
+    """
+    assignment = load_registry(registry_file)["users"].get(user_key(role_name, user_id))
+    return assignment["guardrail_id"] if assignment else None
+
+
+def record_guardrail_use(guardrail_id, registry_file=REGISTRY_FILE):
+    """
+    Records that a guardrail was just used, for least-recently-used eviction.
+
+    :param guardrail_id: Guardrail ID
+    :param registry_file: Registry file path
+    """
+    append_registry_entries([{"op": "use", "guardrail_id": guardrail_id, "at": time.strftime("%Y-%m-%d %H:%M:%S")}],
+                            registry_file)
+
+
+def record_guardrail_generations(created, registry_file=REGISTRY_FILE):
+    """
+    Records the generation of newly created per-user guardrails, so the next guardrail created
+    for the same user (after this one is deleted) gets a new idempotency token.
+
+    :param created: List of dictionaries with role, user_id, guardrail_id and generation
+    :param registry_file: Registry file path
+    """
+    if not created:
+        return
+    append_registry_entries([{
+        "op": "generation",
+        "key": user_key(c["role"], c["user_id"]),
+        "record": {"generation": c["generation"], "guardrail_id": c["guardrail_id"]}
+    } for c in created], registry_file)
+
+
+def forget_guardrails(guardrail_ids, registry_file=REGISTRY_FILE):
+    """
+    Removes every registry reference to deleted guardrails: usage records, user assignments,
+    shared policies and warm pool entries.
+
+    Users assigned to a deleted guardrail are left without one, so the next lookup doesn't
+    hand out a guardrail that no longer exists.
+
+    :param guardrail_ids: IDs of deleted guardrails
+    :param registry_file: Registry file path
+    :return: Number of user assignments removed
+    """
+    deleted = set(guardrail_ids)
+    if not deleted:
+        return 0
+    for key, (guardrail_id, _) in list(_checked_policies.items()):
+        if guardrail_id in deleted:
+            _checked_policies.pop(key, None)
+    with registry_lock(registry_file):
+        registry = load_registry(registry_file)
+        for guardrail_id in deleted:
+            registry["last_used"].pop(guardrail_id, None)
+        orphaned = [key for key, a in registry["users"].items() if a["guardrail_id"] in deleted]
+        for key in orphaned:
+            del registry["users"][key]
+        for policy_hash in [h for h, p in registry["policies"].items() if p["guardrail_id"] in deleted]:
+            del registry["policies"][policy_hash]
+        for role_name, pool in registry["pool"].items():
+            registry["pool"][role_name] = [entry for entry in pool if entry["guardrail_id"] not in deleted]
+        save_registry(registry, registry_file)
+    return len(orphaned)
+
+
+def add_pool_guardrails(role_name, entries, registry_file=REGISTRY_FILE):
+    """
+    Adds ready, unassigned guardrails to a role's warm pool.
+
+    :param role_name: Role name
+    :param entries: List of dictionaries with guardrail_id, arn and policy_hash
+    :param registry_file: Registry file path
+    """
+    with registry_lock(registry_file):
+        registry = load_registry(registry_file)
+        registry["pool"].setdefault(role_name, []).extend(entries)
+        save_registry(registry, registry_file)
+
+
+def take_pool_guardrail(role_name, policy_hash=None, registry_file=REGISTRY_FILE):
+    """
+    Removes the oldest guardrail from a role's warm pool.
+
+    The pool is read and rewritten under the registry file lock, so two processes never take
+    the same guardrail. With policy_hash, entries built from another policy are removed as well
+    and returned for deletion instead of being handed out.
+
+    :param role_name: Role name
+    :param policy_hash: Policy hash the taken guardrail must enforce (None accepts any)
+    :param registry_file: Registry file path
+    :return: (pool entry or None if the pool has no matching guardrail, list of stale entries removed)
+    """
+    with registry_lock(registry_file):
+        registry = load_registry(registry_file)
+        pool = registry["pool"].get(role_name)
+        if not pool:
+            return None, []
+        stale = []
+        entry = None
+        while pool and entry is None:
+            candidate = pool.pop(0)
+            if policy_hash is None or candidate["policy_hash"] == policy_hash:
+                entry = candidate
+            else:
+                stale.append(candidate)
+        save_registry(registry, registry_file)
+        return entry, stale
+
+
+def pool_guardrail_count(role_name, registry_file=REGISTRY_FILE):
+    """
+    Returns the number of guardrails in a role's warm pool.
+
+    :param role_name: Role name
+    :param registry_file: Registry file path
+    """
+    return len(load_registry(registry_file)["pool"].get(role_name, []))
@@ -0,0 +1,355 @@
+import json
+import math
+import hashlib
+import argparse
+from array import array
+from collections.abc import Mapping
+
+# How response text is kept: the whole text, a prefix plus its hash, or only the hash
+TEXT_MODES = ("full", "prefix", "hash")
+DEFAULT_PREFIX_LENGTH = 200
+
+# Fixed result fields and how each is stored (in the validator's key order).
+# Values that don't fit their column (e.g. a non-numeric test_id) are kept in the row's extras instead.
+COLUMNS = (
+    ("test_id", "int"),
+    ("category", "enum"),
+    ("is_harmful", "bool"),
+    ("guardrail_version", "enum"),
+    ("request", "text"),
+    ("response", "response"),
+    ("error", "text"),
+    ("response_time", "float"),
+    ("time_to_first_token", "float"),
+    ("guardrail_check_time", "float"),
+    ("result", "enum"),
+    ("guardrail_status", "enum"),
+    ("api", "enum"),
+    ("stream_processing_mode", "enum"),
+    ("blocked_source", "enum"),
+)
+_COLUMN_INDEX = {name: i for i, (name, _) in enumerate(COLUMNS)}
+_TYPECODES = {"int": "q", "float": "d", "bool": "b", "enum": "I", "text": "i", "response": "i"}
+_MISSING = object()
+
+
+class StringTable:
+    """
+    Content-addressed string table: each distinct text is stored once and referred to by an integer ID.
+
+    Texts are addressed by their SHA-256 digest, so the table can keep only a prefix of each
+    text (or nothing but the digest) and still tell distinct texts apart.
+    """
+
+    __slots__ = ("prefix_length", "_ids", "_digests", "_values")
+
+    def __init__(self, prefix_length=None):
+        """
+        :param prefix_length: Characters of each text to keep (None keeps the whole text, 0 keeps only the hash)
+        """
+        self.prefix_length = prefix_length
+        self._ids = {}
+        self._digests = []
+        self._values = []
+
+    def add(self, text):
+        """
+        Adds a text if it isn't in the table yet.
+
+        :param text: Text to add
+        :return: ID of the text
+        """
+        digest = hashlib.sha256(text.encode('utf-8')).digest()
+        text_id = self._ids.get(digest)
+        if text_id is None:
+            text_id = self._ids[digest] = len(self._digests)
+            self._digests.append(digest)
+            if self.prefix_length is None:
+                self._values.append(text)
+            elif self.prefix_length:
+                self._values.append(text[:self.prefix_length])
+        return text_id
+
+    def text(self, text_id):
+        """Returns the stored text (or prefix) of an ID; None when only the hash is kept."""
+        return self._values[text_id] if self.prefix_length != 0 else None
+
+    def hexdigest(self, text_id):
+        """Returns the SHA-256 hex digest of the full text of an ID."""
+        return self._digests[text_id].hex()
+
+    def __len__(self):
+        return len(self._digests)
+
+
+class _Interned:
+    """Maps repeated values (categories, statuses, versions) to small integer codes."""
+
+    __slots__ = ("codes", "values")
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ResultRecord(Mapping):
+    """
+    Read-only view of one row of a ResultStore.
+
+    Behaves like the result dictionary the row was built from (get, items, 'key in record', ...).
+    """
+
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    def __getitem__(self, key):
+        value = self._store._get(self._index, key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return iter(self._store._keys(self._index))
+
+    def __len__(self):
+        return len(self._store._keys(self._index))
+
+    def __repr__(self):
+        return f"ResultRecord({dict(self)!r})"
+
+
+class ResultStore:
+    """
+    Column-oriented container for test results, for runs too large to keep as a list of dictionaries.
+
+    Numbers are kept in typed arrays, categories, statuses and versions as interned codes, and
+    request, response and error texts in content-addressed string tables, so a refusal message
+    repeated for every blocked prompt is stored once. Fields outside the fixed columns (such as
+    guardrail_trace) are kept per row as given.
+
+    Supports append, len, iteration and indexing like the list it replaces; rows are returned as
+    ResultRecord views that read like the original dictionaries.
+
+    With text_mode 'prefix', a row's response is cut to prefix_length characters and a
+    response_sha256 field holds the hash of the full text; with 'hash' only response_sha256 is kept.
+    """
+
+    def __init__(self, text_mode="full", prefix_length=DEFAULT_PREFIX_LENGTH):
+        """
+        :param text_mode: 'full', 'prefix' or 'hash' (see TEXT_MODES)
+        :param prefix_length: Characters of each response to keep with text_mode 'prefix'
+        """
+        if text_mode not in TEXT_MODES:
+            raise ValueError(f"Unknown text mode '{text_mode}'. Use one of: {', '.join(TEXT_MODES)}.")
+        self.text_mode = text_mode
+        self.prefix_length = prefix_length
+        self.texts = StringTable()
+        if text_mode == "full":
+            self.responses = self.texts
+        else:
+            self.responses = StringTable(prefix_length if text_mode == "prefix" else 0)
+        self._columns = [array(_TYPECODES[kind]) for _, kind in COLUMNS]
+        self._interned = [_Interned() if kind == "enum" else None for _, kind in COLUMNS]
+        self._present = array('I')
+        self._extras = {}
+
+    @classmethod
+    def from_results(cls, results, text_mode="full", prefix_length=DEFAULT_PREFIX_LENGTH):
+        """
+        Builds a store from result dictionaries.
+
+        :param results: Iterable of results
+        :param text_mode: 'full', 'prefix' or 'hash'
+        :param prefix_length: Characters of each response to keep with text_mode 'prefix'
+        :return: ResultStore
+        """
+        store = cls(text_mode, prefix_length)
+        store.extend(results)
+        return store
+
+    def _encode(self, i, kind, value):
+        """Returns the column value for a field, or _MISSING if it doesn't fit the column."""
+        if kind == "enum":
+            return self._interned[i].code(value) if value is None or isinstance(value, str) else _MISSING
+        if kind in ("text", "response"):
+            if value is None:
+                return -1
+            if not isinstance(value, str):
+                return _MISSING
+            return (self.responses if kind == "response" else self.texts).add(value)
+        if kind == "float":
+            if value is None:
+                return math.nan
+            return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else _MISSING
+        if kind == "bool":
+            return int(value) if isinstance(value, bool) else _MISSING
+        return value if isinstance(value, int) and not isinstance(value, bool) else _MISSING
+
+    def append(self, result):
+        """
+        Adds a result. The dictionary isn't kept, so later changes to it are not seen.
+
+        :param result: Result dictionary
+        """
+        index = len(self._present)
+        present = 0
+        extras = {}
+        for i, (name, kind) in enumerate(COLUMNS):
+            value = result.get(name, _MISSING)
+            encoded = _MISSING if value is _MISSING else self._encode(i, kind, value)
+            if encoded is _MISSING:
+                self._columns[i].append(0)
+                if value is not _MISSING:
+                    extras[name] = value
+            else:
+                self._columns[i].append(encoded)
+                present |= 1 << i
+        for key, value in result.items():
+            if key not in _COLUMN_INDEX:
+                extras[key] = value
+        self._present.append(present)
+        if extras:
+            self._extras[index] = extras
+
+    def extend(self, results):
+        for result in results:
+            self.append(result)
+
+    def _decode(self, i, index):
+        name, kind = COLUMNS[i]
+        value = self._columns[i][index]
+        if kind == "enum":
+            return self._interned[i].values[value]
+        if kind == "text":
+            return self.texts.text(value) if value >= 0 else None
+        if kind == "response":
+            return self.responses.text(value) if value >= 0 else None
+        if kind == "float":
+            return None if math.isnan(value) else value
+        if kind == "bool":
+            return bool(value)
+        return value
+
+    def _keys(self, index):
+        present = self._present[index]
+        keys = []
+        for i, (name, _) in enumerate(COLUMNS):
+            if present >> i & 1:
+                if name == "response" and self.text_mode != "full":
+                    if self.text_mode == "prefix":
+                        keys.append(name)
+                    keys.append("response_sha256")
+                else:
+                    keys.append(name)
+        keys.extend(self._extras.get(index, ()))
+        return keys
+
+    def _get(self, index, key):
+        extras = self._extras.get(index)
+        if extras and key in extras:
+            return extras[key]
+        present = self._present[index]
+        if key == "response_sha256" and self.text_mode != "full":
+            i = _COLUMN_INDEX["response"]
+            value = self._columns[i][index]
+            return self.responses.hexdigest(value) if present >> i & 1 and value >= 0 else _MISSING
+        i = _COLUMN_INDEX.get(key)
+        if i is None or not present >> i & 1 or (key == "response" and self.text_mode == "hash"):
+            return _MISSING
+        return self._decode(i, index)
+
+    def __len__(self):
+        return len(self._present)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [ResultRecord(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("result index out of range")
+        return ResultRecord(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield ResultRecord(self, index)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def nbytes(self):
+        """
+        Approximate memory held by the columns and the string tables, in bytes.
+
+        :return: Dictionary of byte counts (columns, texts, responses, total)
+        """
+        columns = sum(column.itemsize * len(column) for column in self._columns)
+        columns += self._present.itemsize * len(self._present)
+        texts = sum(len(text.encode('utf-8')) for text in self.texts._values) + 32 * len(self.texts)
+        responses = 0
+        if self.responses is not self.texts:
+            responses = sum(len(text.encode('utf-8')) for text in self.responses._values) + 32 * len(self.responses)
+        return {"columns": columns, "texts": texts, "responses": responses, "total": columns + texts + responses}
+
+
+def write_results_json(results, f, exclude=("status",)):
+    """
+    Writes results as a JSON array one row at a time, in the same layout as json.dump(..., indent=2).
+
+    Unlike json.dump, this never builds the whole list of dictionaries in memory.
+
+    :param results: List of results or ResultStore
+    :param f: Text file to write to
+    :param exclude: Keys to leave out of each result
+    """
+    f.write("[")
+    separator = "\n  "
+    for result in results:
+        clean_result = {k: v for k, v in result.items() if k not in exclude}
+        f.write(separator + json.dumps(clean_result, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+        separator = ",\n  "
+    f.write("]" if separator == "\n  " else "\n]")
+
+
+def load_results(filename, text_mode="full", prefix_length=DEFAULT_PREFIX_LENGTH):
+    """
+    Loads an exported results file into a ResultStore.
+
+    :param filename: Results JSON file
+    :param text_mode: 'full', 'prefix' or 'hash'
+    :param prefix_length: Characters of each response to keep with text_mode 'prefix'
+    :return: ResultStore
+    """
+    with open(filename, 'r', encoding='utf-8') as f:
+        return ResultStore.from_results(json.load(f), text_mode, prefix_length)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact or inspect exported guardrail test results")
+    parser.add_argument("results_file", help="Exported test results JSON file")
+    parser.add_argument("--text-mode", choices=TEXT_MODES, default="full",
+                        help="How to keep response text: whole, prefix plus hash, or hash only (default: full)")
+    parser.add_argument("--prefix-length", type=int, default=DEFAULT_PREFIX_LENGTH,
+                        help=f"Response characters to keep with --text-mode prefix (default: {DEFAULT_PREFIX_LENGTH})")
+    parser.add_argument("--output", help="File to write the compacted results to")
+    args = parser.parse_args()
+
+    store = load_results(args.results_file, args.text_mode, args.prefix_length)
+    sizes = store.nbytes()
+    print(f"{len(store)} results, {len(store.texts)} distinct request/error texts, "
+          f"{len(store.responses)} distinct responses")
+    print(f"Columns: {sizes['columns'] / 1024:.1f} KiB, texts: {(sizes['texts'] + sizes['responses']) / 1024:.1f} KiB")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            write_results_json(store, f)
+        print(f"Compacted results saved to '{args.output}'.")
@@ -0,0 +1,318 @@
+import boto3
+import json
+import time
+import argparse
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
+from guardrails import AWS_REGION, CONTENT_FILTER_TYPES, FILTER_STRENGTHS, create_dynamic_guardrail
+from guardrail_validator import load_test_prompts, test_guardrail
+
+
+def build_sweep_variants(levels, filter_sets=None):
+    """
+    Builds the list of guardrail variants to sweep (every level crossed with every filter set).
+
+    :param levels: Filter strengths to sweep (e.g., ["LOW", "MEDIUM", "HIGH"])
+    :param filter_sets: List of filter type combinations (None uses all content filters + PROMPT_ATTACK)
+    :return: List of variant dictionaries
+    """
+    variants = []
+    for level in levels:
+        for filter_set in (filter_sets or [None]):
+            if filter_set is None:
+                filter_types = None
+                check_prompt_attacks = True
+                label = f"{level}/ALL"
+            else:
+                filter_types = [f for f in filter_set if f != "PROMPT_ATTACK"]
+                check_prompt_attacks = "PROMPT_ATTACK" in filter_set
+                label = f"{level}/{'+'.join(filter_set)}"
+
+            variants.append({
+                "label": label,
+                "level": level,
+                "filter_types": filter_types,
+                "check_harmful_content": filter_types is None or len(filter_types) > 0,
+                "check_prompt_attacks": check_prompt_attacks
+            })
+    return variants
+
+
+def provision_sweep_variants(role_name, variants, config_file="guardrail_config.json", bedrock_client=None, max_workers=4):
+    """
+    Creates one guardrail per sweep variant in parallel.
+
+    :param role_name: Role whose configuration the variants are based on
+    :param variants: Variants from build_sweep_variants (guardrail_id is filled in)
+    :param config_file: Guardrail configuration file path
+    :param bedrock_client: Bedrock client shared by all worker threads
+    :param max_workers: Maximum number of concurrent creations
+    :return: Variants that were created successfully
+    """
+    run_id = time.strftime("%H%M%S")
+
+    def create(index_variant):
+        index, variant = index_variant
+        try:
+            variant["guardrail_id"] = create_dynamic_guardrail(
+                role_name,
+                f"sweep{index}-{variant['level']}-{run_id}",
+                check_harmful_content=variant["check_harmful_content"],
+                check_prompt_attacks=variant["check_prompt_attacks"],
+                config_file=config_file,
+                content_filter_level=variant["level"],
+                filter_types=variant["filter_types"],
+                bedrock_client=bedrock_client,
+                verbose=False
+            )
+            print(f"Created variant {variant['label']}: {variant['guardrail_id']}")
+        except Exception as e:
+            print(f"Failed to create variant {variant['label']}: {str(e)}")
+            variant["guardrail_id"] = None
+        return variant
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        created = list(executor.map(create, enumerate(variants)))
+
+    return [v for v in created if v["guardrail_id"]]
+
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None for an empty list)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize_variant(variant, results):
+    """
+    Computes accuracy and latency statistics for one variant's test results.
+
+    Accuracy needs the 'is_harmful' label on the prompts; without labels only the block rate is reported.
+
+    :param variant: Sweep variant
+    :param results: Results returned by test_guardrail
+    :return: Summary row for the frontier table
+    """
+    latencies = [r['response_time'] for r in results if r.get('guardrail_status') != 'error']
+    labeled = [r for r in results if 'is_harmful' in r and r.get('guardrail_status') != 'error']
+
+    correct = sum(1 for r in labeled
+                  if (r['is_harmful'] and r['guardrail_status'] == 'blocked') or
+                     (not r['is_harmful'] and r['guardrail_status'] == 'passed'))
+    harmful = [r for r in labeled if r['is_harmful']]
+    harmless = [r for r in labeled if not r['is_harmful']]
+
+    return {
+        "label": variant["label"],
+        "guardrail_id": variant["guardrail_id"],
+        "tests": len(results),
+        "errors": sum(1 for r in results if r.get('guardrail_status') == 'error'),
+        "block_rate": sum(1 for r in results if r.get('guardrail_status') == 'blocked') / len(results) if results else 0,
+        "accuracy": correct / len(labeled) if labeled else None,
+        "block_accuracy": sum(1 for r in harmful if r['guardrail_status'] == 'blocked') / len(harmful) if harmful else None,
+        "pass_accuracy": sum(1 for r in harmless if r['guardrail_status'] == 'passed') / len(harmless) if harmless else None,
+        "mean_latency": sum(latencies) / len(latencies) if latencies else None,
+        "p50_latency": _percentile(latencies, 50),
+        "p95_latency": _percentile(latencies, 95)
+    }
+
+
+def mark_frontier(rows, metric="accuracy", latency="p95_latency"):
+    """
+    Marks the rows on the accuracy-vs-latency Pareto frontier.
+
+    A row is on the frontier when no other row is at least as accurate and at least as fast,
+    and strictly better in one of the two. Without 'is_harmful' labels no row is marked.
+
+    :param rows: Summary rows from summarize_variant
+    :param metric: Quality metric to maximize
+    :param latency: Latency statistic to minimize
+    :return: The same rows, sorted by latency, with a 'frontier' flag
+    """
+    for row in rows:
+        row["frontier"] = row[metric] is not None and row[latency] is not None and not any(
+            other is not row and other[metric] is not None and other[latency] is not None and
+            other[metric] >= row[metric] and other[latency] <= row[latency] and
+            (other[metric] > row[metric] or other[latency] < row[latency])
+            for other in rows
+        )
+
+    return sorted(rows, key=lambda r: (r[latency] is None, r[latency] or 0))
+
+
+def print_frontier_table(rows):
+    """
+    Prints the accuracy-vs-latency frontier table.
+
+    :param rows: Rows returned by mark_frontier
+    """
+    def fmt_ratio(value):
+        return f"{value:.1%}" if value is not None else "-"
+
+    def fmt_seconds(value):
+        return f"{value:.2f}s" if value is not None else "-"
+
+    print("\n=== Filter Strength Sweep: Accuracy vs. Latency ===")
+    header = f"{'Variant':<40} {'Accuracy':>9} {'Block':>7} {'Pass':>7} {'BlockRate':>10} {'Mean':>7} {'p50':>7} {'p95':>7} {'Errors':>7}  Frontier"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['label']:<40} {fmt_ratio(row['accuracy']):>9} {fmt_ratio(row['block_accuracy']):>7} "
+              f"{fmt_ratio(row['pass_accuracy']):>7} {fmt_ratio(row['block_rate']):>10} "
+              f"{fmt_seconds(row['mean_latency']):>7} {fmt_seconds(row['p50_latency']):>7} "
+              f"{fmt_seconds(row['p95_latency']):>7} {row['errors']:>7}  {'★' if row['frontier'] else ''}")
+
+
+def teardown_sweep_variants(variants, bedrock_client, max_workers=4):
+    """
+    Deletes the guardrails created for the sweep.
+
+    :param variants: Variants with a guardrail_id
+    :param bedrock_client: Bedrock client
+    :param max_workers: Maximum number of concurrent deletions
+    """
+    def delete(variant):
+        try:
+            bedrock_client.delete_guardrail(guardrailIdentifier=variant["guardrail_id"])
+            print(f"Deleted sweep guardrail {variant['guardrail_id']} ({variant['label']}).")
+        except Exception as e:
+            print(f"Error deleting guardrail {variant['guardrail_id']}: {str(e)}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(delete, variants))
+
+
+def run_filter_sweep(
+    role_name,
+    levels=("LOW", "MEDIUM", "HIGH"),
+    filter_sets=None,
+    prompt_file=None,
+    model_id="anthropic.claude-3-sonnet-20240229-v1:0",
+    config_file="guardrail_config.json",
+    region=AWS_REGION,
+    max_workers=4,
+    keep=False
+):
+    """
+    Provisions one guardrail per variant, tests them all in parallel on the same prompts,
+    and tears them down again.
+
+    :param role_name: Role whose configuration the variants are based on
+    :param levels: Filter strengths to sweep
+    :param filter_sets: Filter type combinations to sweep (None uses all filters)
+    :param prompt_file: Test prompts file path
+    :param model_id: Model ID to use
+    :param config_file: Guardrail configuration file path
+    :param region: AWS region
+    :param max_workers: Maximum number of variants provisioned/tested at the same time
+    :param keep: Keep the variant guardrails instead of deleting them
+    :return: (frontier rows, {variant label: results})
+    """
+    # Clients are thread-safe; share them with a connection pool sized for the workers
+    client_config = Config(max_pool_connections=max(10, max_workers))
+    bedrock_client = boto3.client('bedrock', region_name=region, config=client_config)
+    bedrock_runtime = boto3.client('bedrock-runtime', region_name=region, config=client_config)
+
+    test_prompts = load_test_prompts(prompt_file or "test_prompts.json")
+    variants = build_sweep_variants(levels, filter_sets)
+
+    print(f"\nProvisioning {len(variants)} guardrail variants for role '{role_name}'...")
+    created = provision_sweep_variants(role_name, variants, config_file, bedrock_client, max_workers)
+
+    try:
+        print(f"\nTesting {len(created)} variants in parallel with {len(test_prompts)} prompts each...")
+
+        def evaluate(variant):
+            results = test_guardrail(variant["guardrail_id"], test_prompts=test_prompts, model_id=model_id,
+                                     bedrock_runtime=bedrock_runtime, bedrock=bedrock_client, verbose=False)
+            print(f"Finished variant {variant['label']} ({variant['guardrail_id']}).")
+            return variant, results
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            evaluated = list(executor.map(evaluate, created))
+
+        rows = mark_frontier([summarize_variant(v, results) for v, results in evaluated])
+        print_frontier_table(rows)
+        return rows, {v["label"]: results for v, results in evaluated}
+
+    finally:
+        if keep:
+            print("\nKeeping sweep guardrails: " + ", ".join(v["guardrail_id"] for v in created))
+        else:
+            print("\nTearing down sweep guardrails...")
+            teardown_sweep_variants(created, bedrock_client, max_workers)
+
+
+def export_sweep(rows, variant_results, role_name, filename=None):
+    """
+    Exports the frontier table and raw results of a sweep to a JSON file.
+
+    :param rows: Frontier rows
+    :param variant_results: Results per variant label
+    :param role_name: Swept role
+    :param filename: Filename to save as (auto-generated if None)
+    """
+    if filename is None:
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"guardrail_sweep_{role_name}_{timestamp}.json"
+
+    try:
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump({"frontier": rows, "results": variant_results}, f, ensure_ascii=False, indent=2)
+        print(f"\nSweep results saved to '{filename}'.")
+        return True
+    except Exception as e:
+        print(f"Error saving sweep results: {str(e)}")
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep guardrail filter strengths and compare accuracy vs. latency")
+    parser.add_argument("role", help="Role from the configuration file to base the variants on")
+    parser.add_argument("--levels", nargs="+", default=["LOW", "MEDIUM", "HIGH"], choices=FILTER_STRENGTHS,
+                        help="Filter strengths to sweep (default: LOW MEDIUM HIGH)")
+    parser.add_argument("--filter-sets", nargs="+",
+                        help="Filter type combinations to sweep, comma separated "
+                             f"(e.g., HATE,INSULTS SEXUAL,VIOLENCE,PROMPT_ATTACK). Types: {', '.join(CONTENT_FILTER_TYPES)}, PROMPT_ATTACK")
+    parser.add_argument("--prompts", help="Path to JSON file with test prompts (use 'is_harmful' labels for accuracy)")
+    parser.add_argument("--model", default="anthropic.claude-3-sonnet-20240229-v1:0",
+                        help="Model ID to use (default: Claude 3 Sonnet)")
+    parser.add_argument("--config", default="guardrail_config.json", help="Guardrail configuration file path")
+    parser.add_argument("--workers", type=int, default=4, help="Maximum number of variants handled in parallel")
+    parser.add_argument("--keep", action="store_true", help="Keep the variant guardrails after the sweep")
+    parser.add_argument("--export", action="store_true", help="Export the frontier table and results to JSON file")
+    args = parser.parse_args()
+
+    filter_sets = None
+    if args.filter_sets:
+        filter_sets = [[f.strip().upper() for f in s.split(",") if f.strip()] for s in args.filter_sets]
+        valid_types = set(CONTENT_FILTER_TYPES) | {"PROMPT_ATTACK"}
+        invalid = sorted({f for s in filter_sets for f in s if f not in valid_types})
+        if invalid:
+            print(f"Error: Unknown filter types: {', '.join(invalid)}")
+            return
+
+    rows, variant_results = run_filter_sweep(
+        args.role,
+        levels=args.levels,
+        filter_sets=filter_sets,
+        prompt_file=args.prompts,
+        model_id=args.model,
+        config_file=args.config,
+        max_workers=args.workers,
+        keep=args.keep
+    )
+
+    if args.export:
+        export_sweep(rows, variant_results, args.role)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\nProgram terminated.")
@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import atexit
+import argparse
+import secrets
+import threading
+import functools
+import contextvars
+
+# Setting this environment variable to a file path turns tracing on for any of the tools
+TRACE_FILE_ENV = "GUARDRAIL_TRACE_FILE"
+DEFAULT_TRACE_FILE = "guardrail_trace.json"
+
+# Active tracer (None when tracing is off)
+_tracer = None
+# Span the current thread or task is inside of
+_current_span = contextvars.ContextVar("guardrail_current_span", default=None)
+
+
+class Span:
+    """
+    A timed operation with OpenTelemetry span fields (trace and span IDs, parent, attributes, status).
+
+    Use as a context manager; the span ends and is recorded when the block exits. An exception
+    leaving the block sets the status to ERROR.
+    """
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_span_id", "attributes",
+                 "start_ns", "end_ns", "status", "thread_id", "_token")
+
+    def __init__(self, tracer, name, attributes, parent):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start_ns = None
+        self.end_ns = None
+        self.status = "OK"
+        self.thread_id = None
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.thread_id = threading.get_ident()
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.status = "ERROR"
+            self.attributes["exception.type"] = exc_type.__name__
+            self.attributes["exception.message"] = str(exc_value)
+        self.tracer.record(self)
+        return False
+
+
+class _NoopSpan:
+    """Span returned while tracing is off; every operation does nothing."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """
+    Collects finished spans in memory and writes them to a trace file.
+    """
+
+    def __init__(self, trace_file=DEFAULT_TRACE_FILE, service_name="guardrails"):
+        """
+        :param trace_file: Trace file path (files ending in .otlp.json are written as OTLP JSON,
+                           others in the Chrome trace event format)
+        :param service_name: service.name resource attribute
+        """
+        self.trace_file = trace_file
+        self.service_name = service_name
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def start_span(self, name, attributes):
+        return Span(self, name, attributes, _current_span.get())
+
+    def record(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def write(self, trace_file=None):
+        """
+        Writes the spans recorded so far.
+
+        The default format is the Chrome trace event format, which Perfetto (ui.perfetto.dev),
+        speedscope and chrome://tracing open as a flame graph. Each event carries its OpenTelemetry
+        IDs, status and attributes in 'args'.
+
+        :param trace_file: Trace file path (default: the tracer's file)
+        :return: Trace file path
+        """
+        trace_file = trace_file or self.trace_file
+        with self._lock:
+            spans = list(self.spans)
+
+        if trace_file.endswith(".otlp.json"):
+            data = _to_otlp(spans, self.service_name)
+        else:
+            data = _to_chrome_trace(spans, self.service_name)
+
+        temp_file = f"{trace_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(temp_file, trace_file)
+        return trace_file
+
+
+def _to_chrome_trace(spans, service_name):
+    pid = os.getpid()
+    events = []
+    for span in spans:
+        args = {"trace_id": span.trace_id, "span_id": span.span_id, "status": span.status}
+        if span.parent_span_id:
+            args["parent_span_id"] = span.parent_span_id
+        args.update(span.attributes)
+        events.append({
+            "name": span.name,
+            "cat": span.name.split('.', 1)[0],
+            "ph": "X",
+            "ts": span.start_ns / 1000,
+            "dur": (span.end_ns - span.start_ns) / 1000,
+            "pid": pid,
+            "tid": span.thread_id,
+            "args": args
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"service.name": service_name}}
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _to_otlp(spans, service_name):
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{
+            "scope": {"name": "guardrail_tracing"},
+            "spans": [{
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent_span_id or "",
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+                "status": {"code": 2 if span.status == "ERROR" else 1}
+            } for span in spans]
+        }]
+    }]}
+
+
+def span(name, **attributes):
+    """
+    Starts a span around a block of code.
+
+    While tracing is off this returns a shared no-op object, so instrumented code costs
+    one global lookup per span.
+
+    Example:
+        with span("guardrail.create", role=role_name) as s:
+            response = bedrock_client.create_guardrail(**params)
+            s.set_attribute("guardrail_id", response['guardrailId'])
+
+    :param name: Span name (the part before the first dot is used as the category)
+    :param attributes: Span attributes
+    :return: Span context manager
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP_SPAN
+    return tracer.start_span(name, attributes)
+
+
+def traced(name):
+    """
+    Decorator that runs a function inside a span.
+
+    :param name: Span name
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return func(*args, **kwargs)
+            with tracer.start_span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable_tracing(trace_file=DEFAULT_TRACE_FILE, service_name="guardrails"):
+    """
+    Turns tracing on. The trace file is written when the process exits (or by write_trace).
+
+    :param trace_file: Trace file path
+    :param service_name: service.name resource attribute
+    :return: Tracer
+    """
+    global _tracer
+    if _tracer is None:
+        atexit.register(write_trace)
+    _tracer = Tracer(trace_file, service_name)
+    return _tracer
+
+
+def disable_tracing():
+    """
+    Writes the trace file and turns tracing off.
+    """
+    global _tracer
+    write_trace()
+    _tracer = None
+
+
+def write_trace(trace_file=None):
+    """
+    Writes the spans recorded so far, if tracing is on.
+
+    :param trace_file: Trace file path (default: the file passed to enable_tracing)
+    :return: Trace file path (None if tracing is off)
+    """
+    tracer = _tracer
+    if tracer is None or not tracer.spans:
+        return None
+    return tracer.write(trace_file)
+
+
+def summarize_trace(trace_file):
+    """
+    Prints the total and self time of each span name in a Chrome-format trace file.
+
+    :param trace_file: Trace file path
+    """
+    with open(trace_file, 'r', encoding='utf-8') as f:
+        events = json.load(f)["traceEvents"]
+
+    child_time = {}
+    for event in events:
+        parent = event["args"].get("parent_span_id")
+        if parent:
+            child_time[parent] = child_time.get(parent, 0) + event["dur"]
+
+    totals = {}
+    for event in events:
+        entry = totals.setdefault(event["name"], {"count": 0, "total": 0.0, "self": 0.0})
+        entry["count"] += 1
+        entry["total"] += event["dur"]
+        entry["self"] += max(0.0, event["dur"] - child_time.get(event["args"]["span_id"], 0))
+
+    print(f"\n{'Span':<32} {'Count':>7} {'Total (s)':>11} {'Self (s)':>10} {'Mean (ms)':>10}")
+    print("-" * 74)
+    for name, entry in sorted(totals.items(), key=lambda item: -item[1]["self"]):
+        print(f"{name:<32} {entry['count']:>7} {entry['total'] / 1e6:>11.3f} {entry['self'] / 1e6:>10.3f} "
+              f"{entry['total'] / entry['count'] / 1e3:>10.2f}")
+
+
+if os.environ.get(TRACE_FILE_ENV):
+    enable_tracing(os.environ[TRACE_FILE_ENV])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a guardrail trace file")
+    parser.add_argument("trace_file", help="Trace file written with GUARDRAIL_TRACE_FILE set")
+    args = parser.parse_args()
+    summarize_trace(args.trace_file)
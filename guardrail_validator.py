@@ -1,12 +1,42 @@
 import boto3
 import json
 import time
+import random
+import statistics
 import argparse
 import datetime
 from guardrails import AWS_REGION  # Import AWS_REGION from guard.py
+from guardrail_inventory import find_guardrail, load_inventory, summarize_guardrail_policy
+from guardrail_registry import record_guardrail_use
+from guardrail_batch import BATCH_MAX_RECORDS, LocalBatchBackend, S3BatchBackend, recheck_output_verdicts, run_batch_test
+from guardrail_tracing import span, traced
+from guardrail_load import create_load_client, run_load_test, write_capacity_curve
+from guardrail_metrics import record_result, request_started, start_metrics_server
+from guardrail_results import TEXT_MODES, ResultStore, write_results_json
+from guardrail_client import (
+    TextDelta,
+    build_request_body,
+    converse_stream,
+    guardrail_blocked_source,
+    is_blocked,
+    parse_guardrail_trace,
+    parse_stream_chunk
+)
 
 
 
+# Metadata of published (immutable) guardrail versions, keyed by (guardrail ID, version)
+_guardrail_metadata_cache = {}
+
+# Foundation model catalog cached on disk, refreshed after MODEL_CATALOG_TTL seconds
+MODEL_CATALOG_FILE = "model_catalog.json"
+MODEL_CATALOG_TTL = 24 * 60 * 60
+_model_catalog_cache = {}
+
+# Prefixes of cross-region inference profile IDs (e.g., us.anthropic.claude-3-5-sonnet-...)
+INFERENCE_PROFILE_PREFIXES = ("us", "eu", "apac", "us-gov", "global")
+
+
 def load_test_prompts(filename="test_prompts.json"):
     """
     Loads test prompts from a file.
@@ -59,7 +89,10 @@ def load_test_prompts(filename="test_prompts.json"):
         return default_prompts  # Same default test prompts as above
 
 
-def test_guardrail(guardrail_id, test_prompts=None, prompt_file=None, model_id="anthropic.claude-3-sonnet-20240229-v1:0", region=AWS_REGION):
+@traced("guardrail.test")
+def test_guardrail(guardrail_id, test_prompts=None, prompt_file=None, model_id="anthropic.claude-3-sonnet-20240229-v1:0", region=AWS_REGION,
+                   bedrock_runtime=None, bedrock=None, verbose=True, guardrail_version="DRAFT", api="invoke",
+                   stream_processing_mode="sync", results=None):
     """
     Tests guardrail with various prompts
     
@@ -68,177 +101,289 @@ def test_guardrail(guardrail_id, test_prompts=None, prompt_file=None, model_id="
     :param prompt_file: File path to load test prompts from
     :param model_id: Model ID to use
     :param region: AWS region
+    :param bedrock_runtime: Existing Bedrock runtime client to reuse (created from region if None)
+    :param bedrock: Existing Bedrock client to reuse (created from region if None)
+    :param verbose: Print each test and the summary (disable when running several tests in parallel)
+    :param guardrail_version: Guardrail version to test ('DRAFT' or a published version number)
+    :param api: 'invoke' (InvokeModelWithResponseStream) or 'converse-stream' (ConverseStream)
+    :param stream_processing_mode: Guardrail stream processing with ConverseStream: 'sync', 'async' or 'both'
+                                   ('both' runs every prompt in each mode and records one result per mode)
+    :param results: Container to append the results to (a new list if None; pass a ResultStore for large runs)
     """
-    bedrock_runtime = boto3.client('bedrock-runtime', region_name=region)
-    bedrock = boto3.client('bedrock', region_name=region)
+    log = print if verbose else (lambda *args, **kwargs: None)
+    
+    if bedrock_runtime is None:
+        with span("client.create", service="bedrock-runtime"):
+            bedrock_runtime = boto3.client('bedrock-runtime', region_name=region)
+    if bedrock is None:
+        with span("client.create", service="bedrock"):
+            bedrock = boto3.client('bedrock', region_name=region)
+    
+    if api == "converse-stream":
+        stream_modes = ["sync", "async"] if stream_processing_mode == "both" else [stream_processing_mode]
+    else:
+        stream_modes = [None]
     
     # Get guardrail information
-    try:
-        guardrail_info = bedrock.get_guardrail(guardrailIdentifier=guardrail_id)
-        guardrail_name = guardrail_info.get('name', 'Unknown')
-    except Exception as e:
-        print(f"Failed to get guardrail information: {str(e)}")
-        guardrail_name = "Unknown"
+    guardrail_info = get_guardrail_metadata(guardrail_id, guardrail_version, region, bedrock)
+    guardrail_name = guardrail_info['name'] if guardrail_info else "Unknown"
     
     # Load test prompts
     if test_prompts is None:
         test_prompts = load_test_prompts(prompt_file or "test_prompts.json")
     
-    print(f"\n========== Guardrail Test: {guardrail_id} ({guardrail_name}) ==========\n")
-    print(f"Model: {model_id}")
-    print(f"Test start time: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    log(f"\n========== Guardrail Test: {guardrail_id} ({guardrail_name}) ==========\n")
+    log(f"Model: {model_id}")
+    log(f"Guardrail version: {guardrail_version}")
+    log(f"API: {api}" + (f" (streamProcessingMode: {stream_processing_mode})" if api == "converse-stream" else ""))
+    log(f"Test start time: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
     
-    results = []
+    if results is None:
+        results = []
     
     for i, test in enumerate(test_prompts):
-        print(f"Test {i+1}: {test['category']}")
-        print(f"Prompt: {test['prompt']}\n")
-        
-        start_time = time.time()
+        log(f"Test {i+1}: {test['category']}")
+        log(f"Prompt: {test['prompt']}\n")
         
-        # Prepare request body based on model
-        if 'claude' in model_id.lower():
-            request_body = {
-                'anthropic_version': 'bedrock-2023-05-31',
-                'max_tokens': 1000,
-                'messages': [
-                    {
-                        'role': 'user',
-                        'content': test['prompt']
-                    }
-                ]
-            }
-        else:
-            # Request format for other models (Titan, Llama, etc.)
-            request_body = {
-                'prompt': test['prompt'],
-                'max_tokens': 1000,
-                'temperature': 0.7
-            }
-        
-        try:
-            # Call model with guardrail
-            response = bedrock_runtime.invoke_model_with_response_stream(
-                modelId=model_id,
-                contentType='application/json',
-                accept='application/json',
-                body=json.dumps(request_body),
-                guardrailIdentifier=guardrail_id,
-                guardrailVersion='DRAFT'
-            )
+        for mode in stream_modes:
+            if mode:
+                log(f"[streamProcessingMode: {mode}]")
+            start_time = time.time()
+            first_token_time = None
+            request_started()
             
-            # Process response (streaming)
-            stream = response.get('body')
-            if stream:
-                response_content = ""
-                for event in stream:
-                    if 'chunk' in event:
-                        chunk = event['chunk']['bytes'].decode('utf-8')
-                        chunk_data = json.loads(chunk)
-                        
-                        # Process response structure by model
-                        if 'claude' in model_id.lower():
-                            if chunk_data.get('type') == 'content_block_delta':
-                                response_content += chunk_data.get('delta', {}).get('text', '')
-                        elif 'completion' in chunk_data:
-                            response_content += chunk_data['completion']
+            try:
+                if api == "converse-stream":
+                    # ConverseStream builds the request itself and reports the verdict as the stop reason
+                    response_content = ""
+                    guardrail_blocked = False
+                    guardrail_trace = None
+                    with span("model.stream", api=api, test_id=i+1, stream_processing_mode=mode):
+                        for event in converse_stream(bedrock_runtime, model_id, test['prompt'], guardrail_id,
+                                                     guardrail_version, mode):
+                            if isinstance(event, TextDelta):
+                                if first_token_time is None:
+                                    first_token_time = time.time()
+                                response_content += event.text
+                            else:
+                                guardrail_blocked = event.blocked
+                                guardrail_trace = event.trace
+                else:
+                    # Prepare request body based on model
+                    request_body = build_request_body(model_id, test['prompt'])
+                    
+                    # Call model with guardrail - enable guardrail trace
+                    with span("model.invoke", api=api, model=model_id, test_id=i+1):
+                        response = bedrock_runtime.invoke_model_with_response_stream(
+                            modelId=model_id,
+                            contentType='application/json',
+                            accept='application/json',
+                            body=json.dumps(request_body),
+                            guardrailIdentifier=guardrail_id,
+                            guardrailVersion=guardrail_version,
+                            trace='ENABLED'
+                        )
+                    
+                    # Process response (streaming)
+                    response_content = ""
+                    guardrail_blocked = False
+                    guardrail_trace = None
+                    with span("model.stream", api=api, test_id=i+1):
+                        for event in response.get('body') or []:
+                            if 'chunk' in event:
+                                with span("stream.parse"):
+                                    chunk_data = json.loads(event['chunk']['bytes'].decode('utf-8'))
+                                    text, action_reason = parse_stream_chunk(model_id, chunk_data)
+                                    # Keep the assessment details (policies, latency, text units) of the trace
+                                    if 'amazon-bedrock-trace' in chunk_data:
+                                        guardrail_trace = parse_guardrail_trace(
+                                            chunk_data['amazon-bedrock-trace'].get('guardrail'), guardrail_trace)
+                                if text and first_token_time is None:
+                                    first_token_time = time.time()
+                                response_content += text
+                                
+                                # Check whether the guardrail trace reports a block
+                                if is_blocked(action_reason):
+                                    guardrail_blocked = True
                 
                 # Display response (truncate if too long)
                 if len(response_content) > 300:
                     display_content = f"{response_content[:300]}..."
                 else:
                     display_content = response_content
-                    
-                print(f"Response:\n{display_content}")
-                print(f"Response time: {time.time() - start_time:.2f} seconds")                
                 
-                results.append({
+                ttft = first_token_time - start_time if first_token_time is not None else None
+                log(f"Response:\n{display_content}")
+                log(f"Response time: {time.time() - start_time:.2f} seconds")
+                if ttft is not None:
+                    log(f"Time to first token: {ttft:.2f} seconds")
+                log(f"Guardrail status: {'🚫 Blocked' if guardrail_blocked else '✅ Passed'}")
+                
+                result = {
                     "test_id": i+1,
                     "category": test['category'],
+                    "guardrail_version": guardrail_version,
                     "request": test['prompt'],  # Add request prompt
                     "response": response_content,
-                    "response_time": time.time() - start_time
-                })
-            
-        except Exception as e:
-            error_message = str(e)
-            print(f"Error: {error_message}")
-            print(f"Response time: {time.time() - start_time:.2f} seconds")
-            
-            if "exception by guardrail" in error_message.lower():
-                print(f"Result: 🚫 Blocked (blocked by guardrail)")
-                status_result = "exception"
-            else:
-                print(f"Result: ❌ Error occurred")
-                status_result = "error"
+                    "response_time": time.time() - start_time,
+                    "time_to_first_token": ttft,
+                    "guardrail_status": "blocked" if guardrail_blocked else "passed"
+                }
+                if guardrail_trace:
+                    result["guardrail_trace"] = guardrail_trace
+                # Which side was blocked decides whether the response can be re-checked later
+                blocked_source = guardrail_blocked_source(guardrail_trace) if guardrail_blocked else None
+                if blocked_source:
+                    result["blocked_source"] = blocked_source
+                
+            except Exception as e:
+                error_message = str(e)
+                log(f"Error: {error_message}")
+                log(f"Response time: {time.time() - start_time:.2f} seconds")
+                
+                if "exception by guardrail" in error_message.lower():
+                    log(f"Result: 🚫 Blocked (blocked by guardrail)")
+                    status_result = "exception"
+                else:
+                    log(f"Result: ❌ Error occurred")
+                    status_result = "error"
+                
+                result = {
+                    "test_id": i+1,
+                    "category": test['category'],
+                    "guardrail_version": guardrail_version,
+                    "request": test['prompt'],  # Add request prompt
+                    "error": error_message,
+                    "response_time": time.time() - start_time,
+                    "result": status_result,  # Save error result
+                    "guardrail_status": "blocked" if status_result == "exception" else "error"
+                }
             
-            results.append({
-                "test_id": i+1,
-                "category": test['category'],
-                "request": test['prompt'],  # Add request prompt
-                "error": error_message,
-                "response_time": time.time() - start_time,
-                "result": status_result  # Save error result
-            })
+            if mode:
+                result["api"] = api
+                result["stream_processing_mode"] = mode
+            if 'is_harmful' in test:
+                result["is_harmful"] = test['is_harmful']
+            record_result(guardrail_id, result)
+            results.append(result)
             
-        print("-" * 50)
+        log("-" * 50)
+    
+    # Keep the guardrail from being evicted as idle
+    try:
+        record_guardrail_use(guardrail_id)
+    except Exception as e:
+        log(f"Failed to record guardrail use: {str(e)}")
     
     # Display summary results
-    print("\n=== Test Summary Results ===")
-    success_count = sum(1 for r in results if 'error' not in r)
-    exception_count = sum(1 for r in results if 'error' in r and r.get('result') == 'exception')
-    error_count = sum(1 for r in results if 'error' in r and r.get('result') == 'error')
+    log("\n=== Test Summary Results ===")
+    success_count = sum(1 for r in results if r.get('guardrail_status') == 'passed')
+    blocked_count = sum(1 for r in results if r.get('guardrail_status') == 'blocked')
+    error_count = sum(1 for r in results if r.get('guardrail_status') == 'error')
+    
+    log(f"Total tests: {len(results)}")
+    log(f"Passed: {success_count}")
+    log(f"Blocked: {blocked_count}")
+    log(f"Errors: {error_count}")
     
-    print(f"Total tests: {len(results)}")
-    print(f"Success: {success_count}")
-    print(f"Blocked: {exception_count}")
-    print(f"Errors: {error_count}")
+    # Compare time to first token between the stream processing modes
+    if api == "converse-stream":
+        for mode in stream_modes:
+            ttfts = sorted(r['time_to_first_token'] for r in results
+                           if r.get('stream_processing_mode') == mode and r.get('time_to_first_token') is not None)
+            if ttfts:
+                log(f"Median time to first token ({mode}): {ttfts[len(ttfts) // 2]:.3f} seconds")
     
     return results
 
 
-def get_guardrail_name(guardrail_id, region=AWS_REGION):
+def get_guardrail_metadata(guardrail_id, guardrail_version="DRAFT", region=AWS_REGION, bedrock=None):
     """
-    Looks up guardrail name using guardrail ID.
+    Gets the name and a policy summary of a guardrail version.
+    
+    Published versions are immutable, so their metadata is cached per (ID, version) for the
+    lifetime of the process. The working draft can change at any time and is never cached.
     
     :param guardrail_id: Guardrail ID to look up
+    :param guardrail_version: 'DRAFT' or a published version number
     :param region: AWS region
-    :return: Guardrail name (None if not found)
+    :param bedrock: Existing Bedrock client to reuse (created from region if None)
+    :return: Metadata dictionary (None if the guardrail could not be read)
     """
-    bedrock_client = boto3.client('bedrock', region_name=region)
+    cache_key = (guardrail_id, str(guardrail_version))
+    cached = _guardrail_metadata_cache.get(cache_key)
+    if cached:
+        return cached
+    
+    if bedrock is None:
+        bedrock = boto3.client('bedrock', region_name=region)
+    
+    params = {"guardrailIdentifier": guardrail_id}
+    if guardrail_version and guardrail_version != "DRAFT":
+        params["guardrailVersion"] = str(guardrail_version)
     
     try:
-        response = bedrock_client.get_guardrail(guardrailIdentifier=guardrail_id)
-        return response.get('name')
-    except Exception:
-        # Try finding in guardrail list
-        guardrails = get_guardrails_info(region)
-        
-        for guardrail in guardrails:
-            if guardrail['id'] == guardrail_id:
-                return guardrail['name']
-                
+        response = bedrock.get_guardrail(**params)
+    except Exception as e:
+        print(f"Failed to get guardrail information: {str(e)}")
         return None
+    
+    metadata = {
+        "id": guardrail_id,
+        "name": response.get('name'),
+        "version": response.get('version', guardrail_version),
+        "status": response.get('status'),
+        "policy": summarize_guardrail_policy(response)
+    }
+    
+    if metadata["version"] != "DRAFT":
+        _guardrail_metadata_cache[cache_key] = metadata
+    
+    return metadata
+
+
+def get_guardrail_name(guardrail_id, region=AWS_REGION, guardrail_version="DRAFT"):
+    """
+    Looks up guardrail name using guardrail ID.
+    
+    :param guardrail_id: Guardrail ID to look up
+    :param region: AWS region
+    :param guardrail_version: 'DRAFT' or a published version number
+    :return: Guardrail name (None if not found)
+    """
+    # Only a snapshot that is already cached is searched; fetching the whole inventory
+    # costs far more calls than the single get_guardrail below
+    try:
+        record = find_guardrail(guardrail_id, region=region, fetch=False)
+        if record:
+            return record['name']
+    except Exception as e:
+        print(f"Failed to load guardrail inventory: {str(e)}")
+    
+    # No fresh snapshot, or not in it (e.g., created after it was taken)
+    metadata = get_guardrail_metadata(guardrail_id, guardrail_version, region)
+    return metadata['name'] if metadata else None
 
 
-def test_all_guardrails(guardrail_mapping, model_id="anthropic.claude-3-sonnet-20240229-v1:0"):
+def test_all_guardrails(guardrail_mapping, model_id="anthropic.claude-3-sonnet-20240229-v1:0", guardrail_version="DRAFT"):
     """
     Tests all guardrails for multiple users
     
     :param guardrail_mapping: Mapping of user IDs to guardrail IDs
     :param model_id: Model ID to use
+    :param guardrail_version: Guardrail version to test ('DRAFT' or a published version number)
     """
     comparison_results = {}
     
     # Test all guardrails with the same test set
     for user_id, guardrail_id in guardrail_mapping.items():
-        gd_name = get_guardrail_name(guardrail_id, AWS_REGION) or f"Unknown-{guardrail_id}"
+        gd_name = get_guardrail_name(guardrail_id, AWS_REGION, guardrail_version) or f"Unknown-{guardrail_id}"
         print(f"\n\n============================================")
         print(f"Testing guardrail for user {user_id}")
         print(f"Guardrail name: {gd_name}")
         print(f"============================================")
         
-        results = test_guardrail(guardrail_id, model_id=model_id)
+        results = test_guardrail(guardrail_id, model_id=model_id, guardrail_version=guardrail_version)
         comparison_results[user_id] = {
             "guardrail_id": guardrail_id,
             "guardrail_name": gd_name,
@@ -272,14 +417,15 @@ def test_all_guardrails(guardrail_mapping, model_id="anthropic.claude-3-sonnet-2
     return comparison_results
 
 
-def test_custom_prompts(guardrail_id, model_id="anthropic.claude-3-sonnet-20240229-v1:0"):
+def test_custom_prompts(guardrail_id, model_id="anthropic.claude-3-sonnet-20240229-v1:0", guardrail_version="DRAFT"):
     """
     Tests guardrail with user-input prompts.
     
     :param guardrail_id: ID of guardrail to test
     :param model_id: Model ID to use
+    :param guardrail_version: Guardrail version to test ('DRAFT' or a published version number)
     """
-    guardrail_name = get_guardrail_name(guardrail_id) or f"Unknown-{guardrail_id}"
+    guardrail_name = get_guardrail_name(guardrail_id, guardrail_version=guardrail_version) or f"Unknown-{guardrail_id}"
     
     print(f"\n=========== Test Guardrail with Custom Prompts ===========")
     print(f"Guardrail: {guardrail_name} (ID: {guardrail_id})")
@@ -298,7 +444,7 @@ def test_custom_prompts(guardrail_id, model_id="anthropic.claude-3-sonnet-202402
             print(f"\n[Test {test_count} - {current_time}]")
                 
             test_prompts = [{"category": f"User Input #{test_count}", "prompt": user_input}]
-            test_guardrail(guardrail_id, test_prompts=test_prompts, model_id=model_id)
+            test_guardrail(guardrail_id, test_prompts=test_prompts, model_id=model_id, guardrail_version=guardrail_version)
         except KeyboardInterrupt:
             print("\n\nExiting test.")
             break
@@ -306,34 +452,222 @@ def test_custom_prompts(guardrail_id, model_id="anthropic.claude-3-sonnet-202402
             print(f"Error occurred: {str(e)}")
 
 
-def get_guardrails_info(region=AWS_REGION):
+def timed_stream_request(bedrock_runtime, model_id, prompt, guardrail_id=None, guardrail_version="DRAFT", max_tokens=200):
+    """
+    Sends one streaming request, with or without a guardrail, and times it.
+    
+    :param bedrock_runtime: Bedrock runtime client
+    :param model_id: Model ID to use
+    :param prompt: Prompt to send
+    :param guardrail_id: Guardrail ID (None sends the request without a guardrail)
+    :param guardrail_version: Guardrail version
+    :param max_tokens: Maximum number of tokens to generate
+    :return: Dictionary with latency, time_to_first_token (seconds) and blocked
+    """
+    params = {
+        "modelId": model_id,
+        "contentType": 'application/json',
+        "accept": 'application/json',
+        "body": json.dumps(build_request_body(model_id, prompt, max_tokens))
+    }
+    if guardrail_id:
+        params.update(guardrailIdentifier=guardrail_id, guardrailVersion=str(guardrail_version), trace='ENABLED')
+    
+    start_time = time.perf_counter()
+    first_token_time = None
+    blocked = False
+    response = bedrock_runtime.invoke_model_with_response_stream(**params)
+    for event in response.get('body') or []:
+        if 'chunk' in event:
+            text, action_reason = parse_stream_chunk(model_id, json.loads(event['chunk']['bytes']))
+            if text and first_token_time is None:
+                first_token_time = time.perf_counter()
+            blocked = blocked or is_blocked(action_reason)
+    end_time = time.perf_counter()
+    
+    return {
+        "latency": end_time - start_time,
+        "time_to_first_token": first_token_time - start_time if first_token_time is not None else None,
+        "blocked": blocked
+    }
+
+
+def bootstrap_mean_ci(values, confidence=0.95, n_resamples=2000, seed=None):
+    """
+    Computes a percentile bootstrap confidence interval for the mean.
+    
+    :param values: Sample values
+    :param confidence: Confidence level
+    :param n_resamples: Number of bootstrap resamples
+    :param seed: Random seed
+    :return: (lower, upper), or (None, None) with fewer than two values
+    """
+    if len(values) < 2:
+        return None, None
+    rng = random.Random(seed)
+    n = len(values)
+    means = sorted(sum(rng.choices(values, k=n)) / n for _ in range(n_resamples))
+    alpha = (1 - confidence) / 2
+    return means[int(alpha * (n_resamples - 1))], means[int((1 - alpha) * (n_resamples - 1))]
+
+
+def summarize_paired_differences(pairs, confidence=0.95, seed=None):
+    """
+    Summarizes paired latency differences overall and per category.
+    
+    :param pairs: List of dictionaries with category, latency and time_to_first_token differences (seconds)
+    :param confidence: Confidence level of the intervals
+    :param seed: Random seed for the bootstrap
+    :return: Dictionary of category ('All' for every pair) to n, mean, median and CI of both differences
+    """
+    groups = {"All": pairs}
+    for pair in pairs:
+        groups.setdefault(pair['category'], []).append(pair)
+    
+    summary = {}
+    for category, group in groups.items():
+        entry = {"n": len(group)}
+        for metric in ("latency", "time_to_first_token"):
+            values = [p[metric] for p in group if p[metric] is not None]
+            lower, upper = bootstrap_mean_ci(values, confidence, seed=seed)
+            entry[metric] = {
+                "n": len(values),
+                "mean": statistics.mean(values) if values else None,
+                "median": statistics.median(values) if values else None,
+                "ci_lower": lower,
+                "ci_upper": upper
+            }
+        summary[category] = entry
+    return summary
+
+
+@traced("guardrail.overhead")
+def measure_guardrail_overhead(guardrail_id, test_prompts, model_id="anthropic.claude-3-sonnet-20240229-v1:0",
+                               guardrail_version="DRAFT", compare_version=None, repeats=3, max_tokens=200,
+                               confidence=0.95, seed=None, region=AWS_REGION, bedrock_runtime=None):
+    """
+    Measures the latency a guardrail adds by sending each prompt with and without it.
+    
+    Every prompt is sent once per arm (no guardrail, the guardrail version and optionally a second
+    version) back to back, so each group of requests sees the same network and model conditions.
+    Trials run in random order and the arm order is shuffled within each trial, which cancels out
+    drift over time. Pairs where the guardrail blocked are left out of the differences, because
+    a blocked response is shorter than the model's answer.
+    
+    :param guardrail_id: Guardrail ID
+    :param test_prompts: List of prompts (category, prompt)
+    :param model_id: Model ID to use
+    :param guardrail_version: Guardrail version to measure
+    :param compare_version: Second guardrail version to compare against guardrail_version (optional)
+    :param repeats: Number of trials per prompt
+    :param max_tokens: Maximum number of tokens to generate (small values reduce length variance)
+    :param confidence: Confidence level of the intervals
+    :param seed: Random seed for the trial order and the bootstrap
+    :param region: AWS region
+    :param bedrock_runtime: Existing Bedrock runtime client to reuse
+    :return: Dictionary with the raw trials and a summary per comparison
+    """
+    if bedrock_runtime is None:
+        bedrock_runtime = boto3.client('bedrock-runtime', region_name=region)
+    
+    base, compare = f"version {guardrail_version}", f"version {compare_version}"
+    arms = {"no guardrail": None, base: guardrail_version}
+    comparisons = [(base, "no guardrail")]
+    if compare_version is not None:
+        arms[compare] = compare_version
+        comparisons += [(compare, "no guardrail"), (compare, base)]
+    
+    rng = random.Random(seed)
+    trials = [(test, repeat) for test in test_prompts for repeat in range(repeats)]
+    rng.shuffle(trials)
+    
+    print(f"\n========== Guardrail Overhead: {guardrail_id} ==========")
+    print(f"Model: {model_id}, arms: {', '.join(arms)}, {len(trials)} trials\n")
+    
+    records = []
+    for k, (test, repeat) in enumerate(trials, 1):
+        order = list(arms)
+        rng.shuffle(order)
+        record = {"category": test['category'], "prompt": test['prompt'], "repeat": repeat, "order": order, "arms": {}}
+        for arm in order:
+            version = arms[arm]
+            try:
+                record["arms"][arm] = timed_stream_request(bedrock_runtime, model_id, test['prompt'],
+                                                           guardrail_id if version is not None else None,
+                                                           version, max_tokens)
+            except Exception as e:
+                record["arms"][arm] = {"error": str(e)}
+        records.append(record)
+        print(f"[{k}/{len(trials)}] {test['category']}: " +
+              ", ".join(f"{arm} {r['latency']:.2f}s" if 'latency' in r else f"{arm} error"
+                        for arm, r in record["arms"].items()))
+    
+    summaries = {}
+    for arm, baseline in comparisons:
+        pairs = []
+        for record in records:
+            a, b = record["arms"].get(arm, {}), record["arms"].get(baseline, {})
+            if 'latency' not in a or 'latency' not in b or a['blocked'] or b.get('blocked'):
+                continue
+            ttft_a, ttft_b = a['time_to_first_token'], b['time_to_first_token']
+            pairs.append({
+                "category": record['category'],
+                "latency": a['latency'] - b['latency'],
+                "time_to_first_token": ttft_a - ttft_b if ttft_a is not None and ttft_b is not None else None
+            })
+        summaries[f"{arm} - {baseline}"] = summarize_paired_differences(pairs, confidence, seed)
+    
+    return {"guardrail_id": guardrail_id, "model_id": model_id, "confidence": confidence,
+            "trials": records, "summaries": summaries}
+
+
+def print_overhead_summary(overhead):
+    """
+    Prints the paired latency differences of measure_guardrail_overhead per category.
+    
+    :param overhead: Result of measure_guardrail_overhead
+    """
+    level = f"{overhead['confidence']:.0%}"
+    for comparison, summary in overhead["summaries"].items():
+        print(f"\n=== Paired difference: {comparison} (mean [{level} CI], ms) ===")
+        print(f"{'Category':<28} {'Pairs':>5}  {'Total latency':<30} {'Time to first token':<30}")
+        print("-" * 96)
+        for category, entry in sorted(summary.items(), key=lambda item: (item[0] != "All", item[0])):
+            cells = []
+            for metric in ("latency", "time_to_first_token"):
+                stats = entry[metric]
+                if stats["mean"] is None:
+                    cells.append("-")
+                elif stats["ci_lower"] is None:
+                    cells.append(f"{stats['mean'] * 1000:+.0f}")
+                else:
+                    cells.append(f"{stats['mean'] * 1000:+.0f} [{stats['ci_lower'] * 1000:+.0f}, "
+                                 f"{stats['ci_upper'] * 1000:+.0f}]")
+            print(f"{category[:28]:<28} {entry['n']:>5}  {cells[0]:<30} {cells[1]:<30}")
+
+
+def get_guardrails_info(region=AWS_REGION, refresh=False):
     """
     Gets information about all guardrails in the current account.
     
+    Reads the cached inventory snapshot (see guardrail_inventory.py), which covers every
+    list_guardrails page and is fetched again once it is older than its TTL.
+    
     :param region: AWS region
+    :param refresh: Fetch a new snapshot even if the cached one is fresh
     :return: List containing guardrail IDs and names
     """
-    bedrock_client = boto3.client('bedrock', region_name=region)
-    
     try:
-        response = bedrock_client.list_guardrails()
-        guardrails = response.get('guardrails', [])
-        
-        result = []
-        for guardrail in guardrails:
-            result.append({
-                'id': guardrail.get('id'),
-                'name': guardrail.get('name'),
-                'status': guardrail.get('status')
-            })
-        
-        return result
+        snapshot = load_inventory(refresh=refresh, region=region)
+        return [{'id': g['id'], 'name': g['name'], 'status': g['status'], 'tags': g.get('tags', {})}
+                for g in snapshot['guardrails']]
     
     except Exception as e:
         print(f"Failed to get guardrail list: {str(e)}")
         return []
 
 
+@traced("results.export")
 def export_results(results, guardrail_id, filename=None):        
     """
     Exports test results to a JSON file.
@@ -345,16 +679,10 @@ def export_results(results, guardrail_id, filename=None):
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"guardrail_test_results_{guardrail_id}_{timestamp}.json"
     
-    # Remove status key and process results
-    clean_results = []
-    for result in results:
-        # Create new dictionary without status key
-        clean_result = {k: v for k, v in result.items() if k != 'status'}
-        clean_results.append(clean_result)
-    
     try:
         with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(clean_results, f, ensure_ascii=False, indent=2)
+            # Written one result at a time without the status key, so large runs aren't copied in memory
+            write_results_json(results, f, exclude=("status",))
         print(f"\nTest results saved to '{filename}'.")
         return True
     except Exception as e:
@@ -362,84 +690,201 @@ def export_results(results, guardrail_id, filename=None):
         return False
     
 
-def list_available_models(region=AWS_REGION):
+# Lifecycle statuses of models that can still be invoked (LEGACY models are deprecated but work until end of life)
+INVOKABLE_LIFECYCLE_STATUSES = ('ACTIVE', 'LEGACY')
+
+
+def _is_guardrail_compatible(model):
+    """
+    Whether test_guardrail can run a model: invokable (active or legacy), text output and streaming,
+    with an Anthropic Messages request body, invoked on demand or through an inference profile.
+    """
+    return (
+        model.get('providerName') == 'Anthropic'
+        and 'TEXT' in model.get('outputModalities', [])
+        and bool({'ON_DEMAND', 'INFERENCE_PROFILE'} & set(model.get('inferenceTypesSupported', [])))
+        and model.get('responseStreamingSupported', False)
+        and model.get('modelLifecycle', {}).get('status', 'ACTIVE') in INVOKABLE_LIFECYCLE_STATUSES
+    )
+
+
+def index_model_catalog(catalog):
+    """
+    Adds id, provider, modality and guardrail compatibility indexes to a model catalog.
+    
+    :param catalog: Dictionary with 'fetched_at', 'region' and 'models'
+    :return: The catalog with 'by_id', 'by_provider', 'by_modality' and 'guardrail_compatible' added
+    """
+    by_id, by_provider, by_modality = {}, {}, {}
+    for model in catalog['models']:
+        by_id[model['id']] = model
+        by_provider.setdefault(model['provider'], []).append(model)
+        for modality in set(model['input_modalities'] + model['output_modalities']):
+            by_modality.setdefault(modality, []).append(model)
+    
+    catalog['by_id'] = by_id
+    catalog['by_provider'] = by_provider
+    catalog['by_modality'] = by_modality
+    catalog['guardrail_compatible'] = {m['id'] for m in catalog['models'] if m['guardrail_compatible']}
+    return catalog
+
+
+def load_model_catalog(ttl=MODEL_CATALOG_TTL, refresh=False, catalog_file=MODEL_CATALOG_FILE, region=AWS_REGION):
     """
-    Gets list of available Bedrock models.
+    Returns the indexed foundation model catalog, calling list_foundation_models only when the
+    cached copy on disk is missing, stale or from another region.
     
+    :param ttl: Maximum catalog age in seconds
+    :param refresh: Fetch the catalog regardless of its age
+    :param catalog_file: Catalog cache file path
     :param region: AWS region
-    :return: List of available models
+    :return: Indexed catalog (empty dictionary if it could not be fetched)
     """
-    bedrock_client = boto3.client('bedrock', region_name=region)
+    cached = _model_catalog_cache.get(catalog_file)
+    if cached is None and not refresh:
+        try:
+            with open(catalog_file, 'r', encoding='utf-8') as f:
+                cached = index_model_catalog(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            cached = None
+    
+    if not refresh and cached and cached.get('region') == region and time.time() - cached['fetched_at'] <= ttl:
+        _model_catalog_cache[catalog_file] = cached
+        return cached
     
     try:
-        # Query available models
+        bedrock_client = boto3.client('bedrock', region_name=region)
         response = bedrock_client.list_foundation_models()
-        models = response.get('modelSummaries', [])
-        
-        # Group models by provider
-        providers = {}
-        for model in models:
-            provider_name = model.get('providerName', 'Unknown')
-            model_id = model.get('modelId', '')
-            model_name = model.get('modelName', '')
-            
-            if provider_name not in providers:
-                providers[provider_name] = []
-            
-            providers[provider_name].append({
-                'id': model_id,
-                'name': model_name,
-                'input_modalities': model.get('inputModalities', []),
-                'output_modalities': model.get('outputModalities', [])
-            })
-        
-        return providers
-    
     except Exception as e:
         print(f"Failed to get model list: {str(e)}")
-        return {}
+        return cached or {}
+    
+    catalog = {
+        'fetched_at': time.time(),
+        'region': region,
+        'models': [{
+            'id': model.get('modelId', ''),
+            'name': model.get('modelName', ''),
+            'provider': model.get('providerName', 'Unknown'),
+            'input_modalities': model.get('inputModalities', []),
+            'output_modalities': model.get('outputModalities', []),
+            'inference_types': model.get('inferenceTypesSupported', []),
+            'streaming': model.get('responseStreamingSupported', False),
+            'lifecycle': model.get('modelLifecycle', {}).get('status', 'ACTIVE'),
+            'guardrail_compatible': _is_guardrail_compatible(model)
+        } for model in response.get('modelSummaries', [])]
+    }
+    
+    try:
+        with open(catalog_file, 'w', encoding='utf-8') as f:
+            json.dump(catalog, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        print(f"Failed to cache model list: {str(e)}")
+    
+    catalog = index_model_catalog(catalog)
+    _model_catalog_cache[catalog_file] = catalog
+    return catalog
+
+
+def list_available_models(region=AWS_REGION, refresh=False):
+    """
+    Gets list of available Bedrock models.
+    
+    :param region: AWS region
+    :param refresh: Fetch the model catalog instead of using the cached copy
+    :return: Dictionary of provider name to list of models
+    """
+    return load_model_catalog(refresh=refresh, region=region).get('by_provider', {})
+
+
+def check_model(model_id, region=AWS_REGION, api="invoke"):
+    """
+    Checks a model ID against the cached model catalog before any test runs.
+    
+    Cross-region inference profile IDs (e.g., us.anthropic...) are checked by their base model
+    ID, and ARNs are accepted without checking. If the catalog is unavailable the check passes.
+    
+    :param model_id: Model ID given with --model
+    :param region: AWS region
+    :param api: Runtime API the test will call (ConverseStream accepts any streaming text model)
+    :return: Whether the model can be used with test_guardrail
+    """
+    if model_id.startswith('arn:'):
+        return True
+    
+    catalog = load_model_catalog(region=region)
+    if not catalog:
+        return True
+    
+    prefix, _, base_id = model_id.partition('.')
+    via_profile = False
+    if model_id not in catalog['by_id'] and prefix in INFERENCE_PROFILE_PREFIXES:
+        model_id, via_profile = base_id, True
+    
+    model = catalog['by_id'].get(model_id)
+    if model is None:
+        print(f"Error: Model '{model_id}' is not available in {region}.")
+        print("Use 'python guardrail_validator.py models --filter guardrail' to see the models you can use.")
+        return False
+    lifecycle = model.get('lifecycle', 'ACTIVE')
+    if lifecycle not in INVOKABLE_LIFECYCLE_STATUSES:
+        print(f"Error: Model '{model_id}' is not available (lifecycle status: {lifecycle}).")
+        return False
+    if api == "converse-stream":
+        if 'TEXT' not in model['output_modalities'] or not model.get('streaming', True):
+            print(f"Error: Model '{model_id}' cannot stream text with ConverseStream.")
+            return False
+    elif model_id not in catalog['guardrail_compatible']:
+        print(f"Error: Model '{model_id}' cannot be used for guardrail tests "
+              "(needs an Anthropic text model with streaming).")
+        return False
+    if lifecycle == 'LEGACY':
+        print(f"Warning: Model '{model_id}' is a legacy model and will reach end of life. "
+              "Consider moving to a newer model.")
+    if not via_profile and 'ON_DEMAND' not in model.get('inference_types', ['ON_DEMAND']):
+        print(f"Error: Model '{model_id}' is only available through an inference profile (e.g., us.{model_id}).")
+        return False
+    return True
 
 
-def display_models(filter_text=None):
+def display_models(filter_text=None, refresh=False):
     """
     Displays available models and optionally filters only guardrail-compatible models.
     
     :param filter_text: Text to filter by (None displays all models)
+    :param refresh: Fetch the model catalog instead of using the cached copy
     """
-    providers = list_available_models()
+    catalog = load_model_catalog(refresh=refresh)
     
-    if not providers:
+    if not catalog or not catalog['models']:
         print("\nNo available models or failed to retrieve model list.")
         return
     
     print("\n=== Available Bedrock Models ===")
     
     # Message when displaying only guardrail-compatible models
-    if filter_text and filter_text.lower() == 'guardrail':
+    guardrail_only = filter_text and filter_text.lower() == 'guardrail'
+    if guardrail_only:
         print("(Showing guardrail-compatible models only)")
         
     # Display models by provider
-    for provider, models in providers.items():
-        print(f"\n## {provider}")
-        
-        compatible_models = []
+    for provider, models in catalog['by_provider'].items():
+        if guardrail_only:
+            compatible_models = [m for m in models if m['id'] in catalog['guardrail_compatible']]
+        elif filter_text:
+            compatible_models = [m for m in models
+                                 if filter_text.lower() in m['id'].lower() or filter_text.lower() in m['name'].lower()]
+        else:
+            compatible_models = models
         
-        for idx, model in enumerate(models):
-            # Display only guardrail-compatible models
-            if filter_text and filter_text.lower() == 'guardrail':
-                # Claude models are compatible with guardrails
-                if 'claude' in model['id'].lower():
-                    compatible_models.append(model)
-            # Filter by text search term
-            elif filter_text and filter_text.lower() not in model['id'].lower() and filter_text.lower() not in model['name'].lower():
-                continue
-            else:
-                compatible_models.append(model)
+        if not compatible_models:
+            continue
+        print(f"\n## {provider}")
         
         # Display compatible models
         for idx, model in enumerate(compatible_models):
-            input_modalities = ', '.join(model.get('input_modalities', ['Unknown']))
-            output_modalities = ', '.join(model.get('output_modalities', ['Unknown']))
+            input_modalities = ', '.join(model.get('input_modalities') or ['Unknown'])
+            output_modalities = ', '.join(model.get('output_modalities') or ['Unknown'])
             
             print(f"{idx+1}. ID: {model['id']}")
             print(f"   Name: {model['name']}")
@@ -454,15 +899,20 @@ def display_models(filter_text=None):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Amazon Bedrock Guardrails Testing Tool")
     
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve Prometheus metrics at http://0.0.0.0:PORT/metrics while the command runs")
+    
     # Set up subparsers
     subparsers = parser.add_subparsers(dest="command", help="Command to run")
     
     # Guardrail list command
     list_parser = subparsers.add_parser("list", help="List guardrails")
+    list_parser.add_argument("--refresh", action="store_true", help="Fetch a new inventory snapshot instead of the cached one")
     
     # Add model list command
     models_parser = subparsers.add_parser("models", help="List available Bedrock models")
     models_parser.add_argument("--filter", help="Filter by model ID or name (special value: 'guardrail' shows only guardrail-compatible models)")
+    models_parser.add_argument("--refresh", action="store_true", help="Fetch the model catalog instead of using the cached copy")
     
     # Single guardrail test command
     test_parser = subparsers.add_parser("test", help="Test specific guardrail")
@@ -471,12 +921,23 @@ if __name__ == "__main__":
                         help="Model ID to use (default: Claude 3 Sonnet)")
     test_parser.add_argument("--export", action="store_true", help="Export test results to JSON file")
     test_parser.add_argument("--prompts", help="Path to JSON file with test prompts")
+    test_parser.add_argument("--guardrail-version", default="DRAFT",
+                        help="Guardrail version to test (default: DRAFT, or a published version number)")
+    test_parser.add_argument("--api", choices=["invoke", "converse-stream"], default="invoke",
+                        help="Runtime API to call (default: invoke)")
+    test_parser.add_argument("--stream-mode", choices=["sync", "async", "both"], default="sync",
+                        help="Guardrail streamProcessingMode with --api converse-stream (default: sync)")
+    test_parser.add_argument("--compact-results", choices=TEXT_MODES,
+                        help="Keep results in a compact column store; response text is kept whole, as a prefix "
+                             "plus hash, or as a hash only (for very large prompt sets)")
     
     # Interactive test command
     interactive_parser = subparsers.add_parser("interactive", help="Interactive custom prompt testing")
     interactive_parser.add_argument("guardrail_id", help="Guardrail ID to test")
     interactive_parser.add_argument("--model", default="anthropic.claude-3-sonnet-20240229-v1:0", 
                                   help="Model ID to use (default: Claude 3 Sonnet)")
+    interactive_parser.add_argument("--guardrail-version", default="DRAFT",
+                                  help="Guardrail version to test (default: DRAFT, or a published version number)")
     
     # Test all guardrails command
     test_all_parser = subparsers.add_parser("test-all", help="Compare test multiple guardrails")
@@ -485,14 +946,90 @@ if __name__ == "__main__":
     test_all_parser.add_argument("--model", default="anthropic.claude-3-sonnet-20240229-v1:0",
                                help="Model ID to use (default: Claude 3 Sonnet)")
     test_all_parser.add_argument("--export", action="store_true", help="Export test results to JSON file")
+    test_all_parser.add_argument("--guardrail-version", default="DRAFT",
+                               help="Guardrail version to test for every guardrail (default: DRAFT)")
+    
+    # Batch inference test command
+    batch_parser = subparsers.add_parser("batch", help="Test a guardrail on a large prompt set with batch inference")
+    batch_parser.add_argument("guardrail_id", help="Guardrail ID to test")
+    batch_parser.add_argument("--prompts", required=True, help="Path to JSON file with test prompts")
+    batch_parser.add_argument("--model", default="anthropic.claude-3-sonnet-20240229-v1:0",
+                              help="Model ID to use (default: Claude 3 Sonnet)")
+    batch_parser.add_argument("--guardrail-version", default="DRAFT",
+                              help="Guardrail version to test (default: DRAFT, or a published version number)")
+    batch_parser.add_argument("--s3-uri", help="S3 prefix for batch inputs and outputs (s3://bucket/prefix)")
+    batch_parser.add_argument("--role-arn", help="IAM service role Bedrock uses to access the S3 prefix")
+    batch_parser.add_argument("--local", metavar="DIR",
+                              help="Run the batch locally with invoke_model calls, writing files to DIR (no S3 needed)")
+    batch_parser.add_argument("--max-records", type=int, default=BATCH_MAX_RECORDS,
+                              help=f"Maximum records per batch job (default: {BATCH_MAX_RECORDS})")
+    batch_parser.add_argument("--workers", type=int, default=8, help="Maximum number of concurrent guardrail checks")
+    batch_parser.add_argument("--export", action="store_true", help="Export test results to JSON file")
+    batch_parser.add_argument("--compact-results", choices=TEXT_MODES,
+                              help="Keep results in a compact column store; response text is kept whole, as a prefix "
+                                   "plus hash, or as a hash only (for very large prompt sets)")
+    
+    # Output-side re-check command
+    recheck_parser = subparsers.add_parser("recheck", help="Re-check recorded responses with the guardrail's output policy")
+    recheck_parser.add_argument("results_file", help="Exported test results JSON file")
+    recheck_parser.add_argument("guardrail_id", help="Guardrail ID to check the responses with")
+    recheck_parser.add_argument("--guardrail-version", default="DRAFT",
+                                help="Guardrail version to check with (default: DRAFT, or a published version number)")
+    recheck_parser.add_argument("--workers", type=int, default=8, help="Maximum number of concurrent guardrail checks")
+    recheck_parser.add_argument("--output", help="File to save the updated results to (default: new timestamped file)")
+    
+    # Open-loop load test command
+    load_parser = subparsers.add_parser("load-test", help="Measure guardrail latency at fixed request rates (open loop)")
+    load_parser.add_argument("guardrail_id", help="Guardrail ID to test")
+    load_parser.add_argument("--qps", default="1,2,5,10",
+                             help="Comma-separated target request rates, one step each (default: 1,2,5,10)")
+    load_parser.add_argument("--duration", type=float, default=60, help="Seconds per step (default: 60)")
+    load_parser.add_argument("--arrival", choices=["constant", "poisson"], default="constant",
+                             help="Arrival process: evenly spaced or Poisson (default: constant)")
+    load_parser.add_argument("--max-in-flight", type=int, default=64,
+                             help="Maximum concurrent requests; later ones queue and the wait counts as latency")
+    load_parser.add_argument("--prompts", help="Path to JSON file with test prompts (sent in turn)")
+    load_parser.add_argument("--model", default="anthropic.claude-3-sonnet-20240229-v1:0",
+                             help="Model ID to use (default: Claude 3 Sonnet)")
+    load_parser.add_argument("--guardrail-version", default="DRAFT",
+                             help="Guardrail version to test (default: DRAFT, or a published version number)")
+    load_parser.add_argument("--api", choices=["invoke", "converse-stream"], default="invoke",
+                             help="Streaming API to call (default: invoke)")
+    load_parser.add_argument("--stream-mode", choices=["sync", "async"], default="sync",
+                             help="Guardrail stream processing mode with --api converse-stream (default: sync)")
+    load_parser.add_argument("--seed", type=int, help="Random seed for Poisson arrivals")
+    load_parser.add_argument("--output", help="Capacity curve file prefix (default: load_test_{ID}_{timestamp})")
+    
+    # Paired with/without guardrail overhead command
+    overhead_parser = subparsers.add_parser("overhead", help="Measure the latency the guardrail adds (paired requests)")
+    overhead_parser.add_argument("guardrail_id", help="Guardrail ID to measure")
+    overhead_parser.add_argument("--prompts", help="Path to JSON file with test prompts")
+    overhead_parser.add_argument("--model", default="anthropic.claude-3-sonnet-20240229-v1:0",
+                                 help="Model ID to use (default: Claude 3 Sonnet)")
+    overhead_parser.add_argument("--guardrail-version", default="DRAFT",
+                                 help="Guardrail version to measure (default: DRAFT, or a published version number)")
+    overhead_parser.add_argument("--compare-version", help="Second guardrail version to compare with")
+    overhead_parser.add_argument("--repeats", type=int, default=3, help="Trials per prompt (default: 3)")
+    overhead_parser.add_argument("--max-tokens", type=int, default=200,
+                                 help="Maximum tokens per answer; short answers reduce noise (default: 200)")
+    overhead_parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level (default: 0.95)")
+    overhead_parser.add_argument("--seed", type=int, help="Random seed for the trial order and the bootstrap")
+    overhead_parser.add_argument("--export", action="store_true", help="Save the trials and summaries to a JSON file")
     
     # Parse arguments
     args = parser.parse_args()
     
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+    
     try:
+        # Reject unknown or incompatible models before any guardrail call
+        if args.command in ("test", "interactive", "test-all", "batch", "load-test", "overhead") and not check_model(args.model, api=getattr(args, "api", "invoke")):
+            raise SystemExit(1)
+        
         # Run command
         if args.command == "list":
-            guardrails = get_guardrails_info()
+            guardrails = get_guardrails_info(refresh=args.refresh)
             if guardrails:
                 print("\nGuardrails in the current account:")
                 for i, g in enumerate(guardrails):
@@ -502,15 +1039,18 @@ if __name__ == "__main__":
         
         elif args.command == "models":
             # Display model list (option: filter)
-            display_models(args.filter)
+            display_models(args.filter, refresh=args.refresh)
         
         elif args.command == "test":
-            results = test_guardrail(args.guardrail_id, prompt_file=args.prompts, model_id=args.model)
+            results = test_guardrail(args.guardrail_id, prompt_file=args.prompts, model_id=args.model,
+                                     guardrail_version=args.guardrail_version, api=args.api,
+                                     stream_processing_mode=args.stream_mode,
+                                     results=ResultStore(args.compact_results) if args.compact_results else None)
             if args.export and results:
                 export_results(results, args.guardrail_id)
         
         elif args.command == "interactive":
-            test_custom_prompts(args.guardrail_id, model_id=args.model)
+            test_custom_prompts(args.guardrail_id, model_id=args.model, guardrail_version=args.guardrail_version)
         
         elif args.command == "test-all":
             guardrail_mapping = {}
@@ -521,12 +1061,66 @@ if __name__ == "__main__":
                     guardrail_mapping[role] = guardrail_id
             
             if guardrail_mapping:
-                results = test_all_guardrails(guardrail_mapping, model_id=args.model)
+                results = test_all_guardrails(guardrail_mapping, model_id=args.model,
+                                              guardrail_version=args.guardrail_version)
                 if args.export and results:
                     export_results(results)
             else:
                 print("Please provide guardrail IDs in the proper format. (e.g., admin:guardrail_id)")
         
+        elif args.command == "batch":
+            if args.local:
+                backend = LocalBatchBackend(args.local, max_workers=args.workers)
+            elif args.s3_uri and args.role_arn:
+                backend = S3BatchBackend(args.s3_uri, args.role_arn)
+            else:
+                backend = None
+                print("Please provide --s3-uri and --role-arn, or --local DIR.")
+            
+            if backend:
+                results = run_batch_test(args.guardrail_id, load_test_prompts(args.prompts), backend,
+                                         model_id=args.model, guardrail_version=args.guardrail_version,
+                                         max_records=args.max_records, max_workers=args.workers,
+                                         results=ResultStore(args.compact_results) if args.compact_results else None)
+                blocked = sum(1 for r in results if r['guardrail_status'] == 'blocked')
+                errors = sum(1 for r in results if r['guardrail_status'] == 'error')
+                print(f"\nTotal tests: {len(results)}, Blocked: {blocked}, Errors: {errors}")
+                if args.export and results:
+                    export_results(results, args.guardrail_id)
+        
+        elif args.command == "load-test":
+            client = create_load_client(args.guardrail_id, args.guardrail_version, args.model, api=args.api,
+                                        stream_processing_mode=args.stream_mode, max_in_flight=args.max_in_flight)
+            steps = run_load_test(client, load_test_prompts(args.prompts or "test_prompts.json"),
+                                  [float(qps) for qps in args.qps.split(',')], args.duration, args.arrival,
+                                  args.max_in_flight, args.seed)
+            output_prefix = args.output or f"load_test_{args.guardrail_id}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            write_capacity_curve(steps, output_prefix)
+        
+        elif args.command == "overhead":
+            overhead = measure_guardrail_overhead(args.guardrail_id, load_test_prompts(args.prompts or "test_prompts.json"),
+                                                  model_id=args.model, guardrail_version=args.guardrail_version,
+                                                  compare_version=args.compare_version, repeats=args.repeats,
+                                                  max_tokens=args.max_tokens, confidence=args.confidence, seed=args.seed)
+            print_overhead_summary(overhead)
+            if args.export:
+                filename = f"guardrail_overhead_{args.guardrail_id}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+                with open(filename, 'w', encoding='utf-8') as f:
+                    json.dump(overhead, f, ensure_ascii=False, indent=2)
+                print(f"\nOverhead measurements saved to '{filename}'.")
+        
+        elif args.command == "recheck":
+            with open(args.results_file, 'r', encoding='utf-8') as f:
+                recorded = json.load(f)
+            results, counts = recheck_output_verdicts(recorded, args.guardrail_id, args.guardrail_version,
+                                                      max_workers=args.workers)
+            print(f"\nRe-checked {counts['rechecked']} responses ({counts['flipped']} changed verdict), "
+                  f"kept {counts['kept']} input-blocked, output-blocked or failed results.")
+            if counts['failed']:
+                print(f"Warning: {counts['failed']} re-checks failed and kept their verdict "
+                      "(see output_recheck_error in the exported results).")
+            export_results(results, args.guardrail_id, args.output)
+        
         else:
             # Show help if no command given
             parser.print_help()
@@ -536,6 +1130,13 @@ if __name__ == "__main__":
             print("  python guardrail_validator.py models --filter guardrail")
             print("  python guardrail_validator.py test 1abc2def3ghi")
             print("  python guardrail_validator.py test 1abc2def3ghi --export")
+            print("  python guardrail_validator.py test 1abc2def3ghi --guardrail-version 1")
+            print("  python guardrail_validator.py test 1abc2def3ghi --api converse-stream --stream-mode both")
+            print("  python guardrail_validator.py test 1abc2def3ghi --prompts large_prompts.json --compact-results prefix --export")
+            print("  python guardrail_validator.py overhead 1abc2def3ghi --repeats 5 --compare-version 2")
+            print("  python guardrail_validator.py load-test 1abc2def3ghi --qps 1,2,5,10 --duration 60 --arrival poisson")
+            print("  python guardrail_validator.py recheck guardrail_test_results_1abc2def3ghi_20250101_120000.json 1abc2def3ghi")
+            print("  python guardrail_validator.py batch 1abc2def3ghi --prompts prompts.json --s3-uri s3://bucket/batch --role-arn arn:aws:iam::123456789012:role/BedrockBatch")
             print("  python guardrail_validator.py interactive 1abc2def3ghi --model anthropic.claude-3-sonnet-20240229-v1:0")
             print("  python guardrail_validator.py test-all --ids admin:1abc2def3 developer:4ghi5jkl6")
     
@@ -4,6 +4,8 @@ import time
 import argparse
 import datetime
 from guardrails_KOR import AWS_REGION  # guard.py에서 AWS_REGION 임포트
+from guardrail_client import guardrail_blocked_source, parse_guardrail_trace
+from guardrail_results import TEXT_MODES, ResultStore, write_results_json
 
 
 
@@ -58,7 +60,8 @@ def load_test_prompts(filename="test_prompts_KOR.json"):
         # 기본 테스트 프롬프트 반환(위와 동일)
         return default_prompts  # 위의 기본 테스트 프롬프트와 동일
 
-def test_guardrail(guardrail_id, test_prompts=None, prompt_file=None, model_id="anthropic.claude-3-sonnet-20240229-v1:0", region=AWS_REGION):
+def test_guardrail(guardrail_id, test_prompts=None, prompt_file=None, model_id="anthropic.claude-3-sonnet-20240229-v1:0", region=AWS_REGION,
+                   results=None):
     """
     가드레일을 다양한 프롬프트로 테스트합니다
     
@@ -67,6 +70,7 @@ def test_guardrail(guardrail_id, test_prompts=None, prompt_file=None, model_id="
     :param prompt_file: 테스트 프롬프트를 로드할 파일 경로
     :param model_id: 사용할 모델 ID
     :param region: AWS 리전
+    :param results: 결과를 추가할 컨테이너 (None이면 새 리스트, 대규모 실행에는 ResultStore 전달)
     """
     bedrock_runtime = boto3.client('bedrock-runtime', region_name=region)
     bedrock = boto3.client('bedrock', region_name=region)
@@ -87,7 +91,8 @@ def test_guardrail(guardrail_id, test_prompts=None, prompt_file=None, model_id="
     print(f"사용 모델: {model_id}")
     print(f"테스트 시작 시간: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
     test_start_time=time.time()
-    results = []
+    if results is None:
+        results = []
     
     for i, test in enumerate(test_prompts):
         print(f"테스트 {i+1}: {test['category']}")
@@ -134,6 +139,7 @@ def test_guardrail(guardrail_id, test_prompts=None, prompt_file=None, model_id="
                 guardrail_blocked = False
                 guardrail_status = "✅ 통과됨"
                 blocked_reason = []
+                guardrail_trace = None
                 
                 for event in stream:
                     # 청크 데이터 처리
@@ -148,6 +154,11 @@ def test_guardrail(guardrail_id, test_prompts=None, prompt_file=None, model_id="
                         elif 'completion' in chunk_data:
                             response_content += chunk_data['completion']                                 
 
+                        # trace 전체를 파싱해 정책별 탐지 내용, 처리 지연 시간, 텍스트 유닛을 기록
+                        if 'amazon-bedrock-trace' in chunk_data:
+                            guardrail_trace = parse_guardrail_trace(
+                                chunk_data['amazon-bedrock-trace'].get('guardrail'), guardrail_trace)
+
                         # Guardrail trace 차단 여부 확인 및 출력 추가
                         if 'amazon-bedrock-guardrailAction' in chunk_data:
                             if chunk_data['amazon-bedrock-guardrailAction'] == 'NONE':                                
@@ -173,9 +184,15 @@ def test_guardrail(guardrail_id, test_prompts=None, prompt_file=None, model_id="
                 print(f"응답:\n{display_content}")
                 print(f"응답 시간: {time.time() - start_time:.2f}초")
                 print(f"가드레일 상태: {guardrail_status}")
+                if guardrail_trace:
+                    for assessment in guardrail_trace['assessments']:
+                        units = sum(assessment['units'].values())
+                        findings = ", ".join(f"{f['policy']}:{f['entity']}({f['action']})" for f in assessment['findings'])
+                        print(f"가드레일 {assessment['source']} 평가: {assessment['latency_ms']}ms, "
+                              f"텍스트 유닛 {units}" + (f", 탐지: {findings}" if findings else ""))
                 
 
-                results.append({
+                result = {
                     "test_id": i+1,
                     "category": test['category'],
                     "is_harmful": test['is_harmful'],
@@ -183,7 +200,14 @@ def test_guardrail(guardrail_id, test_prompts=None, prompt_file=None, model_id="
                     "response": response_content,
                     "response_time": time.time() - start_time,                    
                     "guardrail_status": "blocked" if guardrail_blocked else "passed"                    
-                })
+                }
+                if guardrail_trace:
+                    result["guardrail_trace"] = guardrail_trace
+                # 입력/출력 중 어느 쪽이 차단되었는지 기록 (출력 재검사 시 사용)
+                blocked_source = guardrail_blocked_source(guardrail_trace) if guardrail_blocked else None
+                if blocked_source:
+                    result["blocked_source"] = blocked_source
+                results.append(result)
             
         except Exception as e:            
             error_message = str(e)
@@ -362,16 +386,10 @@ def export_results(results, guardrail_id, elapsed_time=None, filename=None):
         
         filename = f"guardrail_test_results_{guardrail_id}_making-{timestamp}_elapsed-{time_suffix}.json"
     
-    # status 키 제거 및 결과 처리
-    clean_results = []
-    for result in results:
-        # 결과에서 status 키 제거한 새로운 딕셔너리 생성
-        clean_result = {k: v for k, v in result.items() if k != 'status'}        
-        clean_results.append(clean_result)
-    
     try:
         with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(clean_results, f, ensure_ascii=False, indent=2)
+            # status 키를 제외하고 결과를 하나씩 기록 (대규모 결과를 메모리에 복사하지 않음)
+            write_results_json(results, f, exclude=("status",))
         print(f"\n테스트 결과를 '{filename}' 파일로 저장했습니다.")
         return True
     except Exception as e:
@@ -488,6 +506,8 @@ if __name__ == "__main__":
                         help="사용할 모델 ID (기본: Claude 3 Sonnet)")
     test_parser.add_argument("--export", action="store_true", help="테스트 결과를 JSON 파일로 저장")
     test_parser.add_argument("--prompts", help="테스트 프롬프트가 저장된 JSON 파일 경로")
+    test_parser.add_argument("--compact-results", choices=TEXT_MODES,
+                        help="결과를 압축 컬럼 저장소에 보관. 응답 텍스트를 전체, 앞부분과 해시, 해시만 중 하나로 보관 (대규모 프롬프트 세트용)")
     
     # 대화형 테스트 명령
     interactive_parser = subparsers.add_parser("interactive", help="대화형 커스텀 프롬프트 테스트")
@@ -522,7 +542,8 @@ if __name__ == "__main__":
             display_models(args.filter)
         
         elif args.command == "test":
-            results, elapsed_time = test_guardrail(args.guardrail_id, prompt_file=args.prompts, model_id=args.model)
+            results, elapsed_time = test_guardrail(args.guardrail_id, prompt_file=args.prompts, model_id=args.model,
+                                                   results=ResultStore(args.compact_results) if args.compact_results else None)
             if args.export and results:
                 export_results(results, args.guardrail_id, elapsed_time)
         
@@ -553,6 +574,7 @@ if __name__ == "__main__":
             print("  python guardrail_validator.py models --filter guardrail")
             print("  python guardrail_validator.py test 1abc2def3ghi")
             print("  python guardrail_validator.py test 1abc2def3ghi --export")
+            print("  python guardrail_validator.py test 1abc2def3ghi --compact-results prefix --export")
             print("  python guardrail_validator.py interactive 1abc2def3ghi --model anthropic.claude-3-sonnet-20240229-v1:0")
             print("  python guardrail_validator.py test-all --ids 관리자:1abc2def3 개발자:4ghi5jkl6")
     
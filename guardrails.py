@@ -1,59 +1,311 @@
 import boto3
 import json
+import argparse
 import time
 import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from guardrail_tracing import span, traced
 
 # AWS Region Setting
 AWS_REGION = "us-east-1"  # Change to the region you want to use (e.g., us-east-1, ap-northeast-2, etc.)
 
+# Guardrails allowed per account in the region (Bedrock default quota; raise it if yours was increased)
+GUARDRAIL_QUOTA = 100
+
+# Harmful content filter types and the strengths they accept
+CONTENT_FILTER_TYPES = ["SEXUAL", "VIOLENCE", "HATE", "INSULTS", "MISCONDUCT"]
+FILTER_STRENGTHS = ["NONE", "LOW", "MEDIUM", "HIGH"]
+
+# Guardrail statuses after which polling is pointless
+TERMINAL_STATUSES = ["READY", "FAILED"]
+
+# Background threads for non-blocking readiness waits
+_wait_executor = None
+_wait_executor_lock = threading.Lock()
+
+
+# Messages printed by wait_for_guardrail_ready (pass a dictionary with the same keys to translate them)
+WAIT_MESSAGES = {
+    "error": "Error checking guardrail status: {error}",
+    "status": "Current status: {status}",
+    "ready": "Guardrail is now {status} and ready to use.",
+    "timeout": "Warning: Maximum wait time exceeded. Proceeding with current status."
+}
+
+
+def backoff_delays(initial_delay=0.25, max_delay=5.0, factor=2.0):
+    """
+    Yields exponentially growing wait intervals, capped at max_delay.
+    
+    :param initial_delay: First interval in seconds
+    :param max_delay: Largest interval in seconds
+    :param factor: Growth factor between intervals
+    """
+    delay = initial_delay
+    while True:
+        yield delay
+        delay = min(max_delay, delay * factor)
+
+
+@traced("guardrail.wait_ready")
+def wait_for_guardrail_ready(
+    guardrail_id,
+    bedrock_client=None,
+    max_wait_time=60,
+    initial_delay=0.25,
+    max_delay=5.0,
+    region=AWS_REGION,
+    verbose=True,
+    guardrail_version=None,
+    messages=None
+):
+    """
+    Polls a guardrail with exponential backoff until it reaches a terminal status or the deadline passes.
+    
+    :param guardrail_id: Guardrail ID to wait for
+    :param bedrock_client: Existing Bedrock client to reuse (created from region if None)
+    :param max_wait_time: Deadline in seconds
+    :param initial_delay: First polling interval in seconds
+    :param max_delay: Largest polling interval in seconds
+    :param region: AWS region
+    :param verbose: Print status changes
+    :param guardrail_version: Version to wait for (None waits for the working draft)
+    :param messages: Progress and error messages (None uses WAIT_MESSAGES)
+    :return: Last seen status ('READY', 'FAILED', a non-terminal status on timeout, or None if it could not be read)
+    """
+    if bedrock_client is None:
+        with span("client.create", service="bedrock"):
+            bedrock_client = boto3.client('bedrock', region_name=region)
+    
+    messages = messages or WAIT_MESSAGES
+    deadline = time.monotonic() + max_wait_time
+    status = None
+    last_logged = None
+    
+    for delay in backoff_delays(initial_delay, max_delay):
+        try:
+            params = {"guardrailIdentifier": guardrail_id}
+            if guardrail_version:
+                params["guardrailVersion"] = guardrail_version
+            status = bedrock_client.get_guardrail(**params).get('status')
+        except Exception as e:
+            print(messages["error"].format(error=str(e)))
+        
+        if verbose and status != last_logged:
+            print(messages["status"].format(status=status))
+            last_logged = status
+        
+        if status in TERMINAL_STATUSES:
+            if verbose and status == 'READY':
+                print(messages["ready"].format(status=status))
+            return status
+        
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print(messages["timeout"])
+            return status
+        time.sleep(min(delay, remaining))
+
+
+def start_guardrail_wait(guardrail_id, bedrock_client=None, max_wait_time=60, **kwargs):
+    """
+    Starts waiting for a guardrail in the background and returns immediately.
+    
+    :param guardrail_id: Guardrail ID to wait for
+    :param bedrock_client: Existing Bedrock client to reuse
+    :param max_wait_time: Deadline in seconds
+    :param kwargs: Other wait_for_guardrail_ready arguments
+    :return: concurrent.futures.Future resolving to the final status
+    """
+    global _wait_executor
+    with _wait_executor_lock:
+        if _wait_executor is None:
+            _wait_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="guardrail-wait")
+    kwargs.setdefault('verbose', False)
+    return _wait_executor.submit(wait_for_guardrail_ready, guardrail_id, bedrock_client, max_wait_time, **kwargs)
+
+
+# Parsed configuration files by absolute path: (file version, configuration)
+_config_cache = {}
+# Compiled create_guardrail parameters by (file path, file version, compile arguments)
+_compiled_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _config_version(config_file):
+    """
+    Returns a cheap version stamp of a file (modification time and size), or None if it does not exist.
+    """
+    try:
+        stat = os.stat(config_file)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
 # Load Configuration File
 def load_guardrail_config(config_file="guardrail_config.json"):
     """
     Loads the guardrail configuration file.
     
+    The parsed configuration is cached and re-read only when the file's modification time or size
+    changes. The returned dictionary is shared between callers and must not be modified.
+    
     :param config_file: Configuration file path
     :return: Configuration dictionary
     """
+    path = os.path.abspath(config_file)
+    version = _config_version(path)
+    
+    with _cache_lock:
+        cached = _config_cache.get(path)
+    if cached and version is not None and cached[0] == version:
+        return cached[1]
+    
     try:
-        with open(config_file, 'r', encoding='utf-8') as f:
+        with open(path, 'r', encoding='utf-8') as f:
             config = json.load(f)
         print(f"Successfully loaded guardrail configuration file '{config_file}'.")
-        return config
     except FileNotFoundError:
         print(f"Error: Configuration file '{config_file}' not found.")
-        return {}
+        config = None
     except json.JSONDecodeError:
         print(f"Error: Invalid JSON format in configuration file '{config_file}'.")
-        return {}
+        config = None
+    
+    with _cache_lock:
+        # Compiled policies of an older version of this file are stale now
+        for key in [k for k in _compiled_cache if k[0] == path]:
+            del _compiled_cache[key]
+        if config is None:
+            _config_cache.pop(path, None)
+        else:
+            _config_cache[path] = (version, config)
+    
+    return config if config is not None else {}
 
-def create_dynamic_guardrail(
-    role_name, 
-    user_id, 
-    check_harmful_content=True, 
-    check_prompt_attacks=True, 
+
+def compile_guardrail_params(
+    role_name,
+    check_harmful_content=True,
+    check_prompt_attacks=True,
     custom_denied_topics=None,
     config_file="guardrail_config.json",
-    region=AWS_REGION
+    content_filter_level=None,
+    filter_types=None,
+    verbose=True
 ):
     """
-    Dynamically creates a guardrail based on role settings in the configuration file
+    Builds the policy part of the create_guardrail request from role settings in the configuration file
+    
+    The result contains everything that defines the guardrail's behavior (messages, topic, content
+    and word policies) but no per-user fields (name, tags, clientRequestToken). Results are cached
+    per configuration file version and arguments, so repeated calls cost a single stat() call.
+    The returned dictionary is shared between callers and must not be modified.
     
     :param role_name: Role name defined in the configuration file
-    :param user_id: User identifier
     :param check_harmful_content: Whether to enable harmful content filter
     :param check_prompt_attacks: Whether to enable prompt attack prevention
     :param custom_denied_topics: Additional list of denied topics (added to default settings)
     :param config_file: Guardrail configuration file path
-    :param region: AWS region
-    :return: Created guardrail ID
+    :param content_filter_level: Filter strength overriding the role setting (NONE/LOW/MEDIUM/HIGH)
+    :param filter_types: Harmful content filter types to enable (None enables all of CONTENT_FILTER_TYPES)
+    :param verbose: Print the resolved configuration
+    :return: Dictionary of create_guardrail parameters
     """
-    # Create Bedrock client
-    bedrock_client = boto3.client('bedrock', region_name=region)
+    path = os.path.abspath(config_file)
+    cache_key = (
+        path,
+        _config_version(path),
+        role_name,
+        bool(check_harmful_content),
+        bool(check_prompt_attacks),
+        json.dumps(custom_denied_topics, sort_keys=True, ensure_ascii=False) if custom_denied_topics else None,
+        content_filter_level,
+        tuple(filter_types) if filter_types else None
+    )
+    
+    with _cache_lock:
+        params = _compiled_cache.get(cache_key)
+    
+    if params is None:
+        params = _compile_guardrail_params(
+            role_name,
+            check_harmful_content=check_harmful_content,
+            check_prompt_attacks=check_prompt_attacks,
+            custom_denied_topics=custom_denied_topics,
+            config_file=config_file,
+            content_filter_level=content_filter_level,
+            filter_types=filter_types
+        )
+        with _cache_lock:
+            # The file may have changed while compiling; only cache if the version still matches
+            if _config_version(path) == cache_key[1]:
+                _compiled_cache[cache_key] = params
     
+    if verbose:
+        print_guardrail_policy(role_name, params)
+    
+    return params
+
+
+def print_guardrail_policy(role_name, params):
+    """
+    Prints a summary of compiled guardrail parameters.
+    
+    :param role_name: Role name
+    :param params: Parameters returned by compile_guardrail_params
+    """
+    filters = params.get("contentPolicyConfig", {}).get("filtersConfig", [])
+    content_filters = [f for f in filters if f["type"] != "PROMPT_ATTACK"]
+    topics = params.get("topicPolicyConfig", {}).get("topicsConfig", [])
+    words = params.get("wordPolicyConfig", {}).get("wordsConfig", [])
+    managed_word_lists = params.get("wordPolicyConfig", {}).get("managedWordListsConfig", [])
+    
+    # Log filter status
+    print(f"\n=== Configuration for {role_name} ===")
+    print(f"- Content filter level: {filters[0]['inputStrength'] if filters else 'NONE'}")
+    print(f"- Harmful content filter: {'Enabled' if content_filters else 'Disabled'}")
+    print(f"- Prompt attack prevention: {'Enabled' if len(content_filters) < len(filters) else 'Disabled'}")
+    print(f"- Profanity filter: {'Enabled' if managed_word_lists else 'Disabled'}")
+    
+    # Log topic policy
+    if topics:
+        print(f"- Blocked topics: {len(topics)}")
+        for topic in topics:
+            print(f"  • {topic['name']}: {topic['definition']}")
+    else:
+        print("- No blocked topics")
+    
+    # Log custom words
+    if words:
+        print(f"- Denied words: {len(words)}")
+        for word in (w['text'] for w in words):
+            masked_word = word[0] + '*' * (len(word) - 2) + word[-1] if len(word) > 2 else word
+            print(f"  • {masked_word}")
+    else:
+        print("- No denied words")
+
+
+def _compile_guardrail_params(
+    role_name,
+    check_harmful_content=True,
+    check_prompt_attacks=True,
+    custom_denied_topics=None,
+    config_file="guardrail_config.json",
+    content_filter_level=None,
+    filter_types=None
+):
+    """
+    Builds the create_guardrail policy parameters from the configuration file (uncached, see compile_guardrail_params).
+    """
     # Load configuration file
     config = load_guardrail_config(config_file)
     
     # Initialize default settings
+    level_override = content_filter_level
     content_filter_level = "MEDIUM"
     blocked_topics = []
     block_message = f"Access is restricted with {role_name} permissions."
@@ -65,16 +317,18 @@ def create_dynamic_guardrail(
     if config and role_name in config:
         role_config = config[role_name]
         content_filter_level = role_config.get('content_filter_level', content_filter_level)
-        blocked_topics = role_config.get('blocked_topics', blocked_topics)
+        blocked_topics = list(role_config.get('blocked_topics', blocked_topics))
         block_message = role_config.get('block_message', block_message)
         blocked_input_message = role_config.get('blocked_input_message', blocked_input_message)
         enable_profanity_filter = role_config.get('enable_profanity_filter', enable_profanity_filter)
         custom_denied_words = role_config.get('denied_words', custom_denied_words)
-        
-        print(f"Loaded '{role_name}' role settings from configuration file.")
     else:
         print(f"Warning: Could not find settings for '{role_name}' role. Using default settings.")
     
+    # Filter strength given by the caller takes precedence over the role setting
+    if level_override:
+        content_filter_level = level_override
+    
     # Handle additional denied topics
     if custom_denied_topics:
         for topic in custom_denied_topics:
@@ -89,32 +343,6 @@ def create_dynamic_guardrail(
                 if not existing:
                     blocked_topics.append(topic)
     
-    # Log filter status
-    print(f"\n=== Configuration for {role_name} ===")
-    print(f"- Content filter level: {content_filter_level}")
-    print(f"- Harmful content filter: {'Enabled' if check_harmful_content else 'Disabled'}")
-    print(f"- Prompt attack prevention: {'Enabled' if check_prompt_attacks else 'Disabled'}")
-    print(f"- Profanity filter: {'Enabled' if enable_profanity_filter else 'Disabled'}")
-    
-    # Log topic policy
-    if blocked_topics:
-        print(f"- Blocked topics: {len(blocked_topics)}")
-        for topic in blocked_topics:
-            name = topic['name'] if isinstance(topic, dict) else topic
-            definition = topic.get('definition', 'No definition') if isinstance(topic, dict) else f"Topics related to {topic}"
-            print(f"  • {name}: {definition}")
-    else:
-        print("- No blocked topics")
-    
-    # Log custom words
-    if custom_denied_words:
-        print(f"- Denied words: {len(custom_denied_words)}")
-        for word in custom_denied_words:
-            masked_word = word[0] + '*' * (len(word) - 2) + word[-1] if len(word) > 2 else word
-            print(f"  • {masked_word}")
-    else:
-        print("- No denied words")
-    
     # Configure topic policy - standardize topic format
     topics_config = []
     for topic in blocked_topics:
@@ -134,33 +362,12 @@ def create_dynamic_guardrail(
     # Configure content policy filters
     filters_config = []
     if check_harmful_content:
-        filters_config.extend([
-            {
-                "type": "SEXUAL", 
-                "inputStrength": content_filter_level,
-                "outputStrength": content_filter_level
-            },
-            {
-                "type": "VIOLENCE", 
+        for filter_type in (filter_types or CONTENT_FILTER_TYPES):
+            filters_config.append({
+                "type": filter_type, 
                 "inputStrength": content_filter_level,
                 "outputStrength": content_filter_level
-            },
-            {
-                "type": "HATE", 
-                "inputStrength": content_filter_level,
-                "outputStrength": content_filter_level
-            },
-            {
-                "type": "INSULTS", 
-                "inputStrength": content_filter_level,
-                "outputStrength": content_filter_level
-            },
-            {
-                "type": "MISCONDUCT", 
-                "inputStrength": content_filter_level,
-                "outputStrength": content_filter_level
-            }
-        ])
+            })
     
     # Configure prompt attack prevention settings
     if check_prompt_attacks:
@@ -184,87 +391,163 @@ def create_dynamic_guardrail(
             "type": "PROFANITY"
         })
     
+    params = {
+        "description": f"Dynamically generated guardrail for {role_name}",
+        "blockedInputMessaging": blocked_input_message,
+        "blockedOutputsMessaging": block_message
+    }
+    
+    # Add topic policy only if topics are configured
+    if topics_config:
+        params["topicPolicyConfig"] = {
+            "topicsConfig": topics_config
+        }
+    
+    # Add content filters only if filters are configured
+    if filters_config:
+        params["contentPolicyConfig"] = {
+            "filtersConfig": filters_config
+        }
+    
+    # Add word policy configuration
+    word_policy = {}
+    if words_config:
+        word_policy["wordsConfig"] = words_config
+    
+    if managed_word_lists_config:
+        word_policy["managedWordListsConfig"] = managed_word_lists_config
+    
+    if word_policy:
+        params["wordPolicyConfig"] = word_policy
+    
+    return params
+
+
+def compute_policy_hash(params):
+    """
+    Computes a content hash of compiled guardrail parameters.
+    
+    Guardrails whose compiled parameters are identical enforce the same policy and get the same hash.
+    
+    :param params: Parameters returned by compile_guardrail_params
+    :return: SHA-256 hex digest
+    """
+    canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+@traced("guardrail.provision")
+def create_dynamic_guardrail(
+    role_name, 
+    user_id, 
+    check_harmful_content=True, 
+    check_prompt_attacks=True, 
+    custom_denied_topics=None,
+    config_file="guardrail_config.json",
+    region=AWS_REGION,
+    content_filter_level=None,
+    filter_types=None,
+    bedrock_client=None,
+    client_request_token=None,
+    wait_until_ready=True,
+    max_wait_time=60,
+    verbose=True,
+    compiled_params=None,
+    extra_tags=None
+):
+    """
+    Dynamically creates a guardrail based on role settings in the configuration file
+    
+    :param role_name: Role name defined in the configuration file
+    :param user_id: User identifier
+    :param check_harmful_content: Whether to enable harmful content filter
+    :param check_prompt_attacks: Whether to enable prompt attack prevention
+    :param custom_denied_topics: Additional list of denied topics (added to default settings)
+    :param config_file: Guardrail configuration file path
+    :param region: AWS region
+    :param content_filter_level: Filter strength overriding the role setting (NONE/LOW/MEDIUM/HIGH)
+    :param filter_types: Harmful content filter types to enable (None enables all of CONTENT_FILTER_TYPES)
+    :param bedrock_client: Existing Bedrock client to reuse (created from region if None)
+    :param client_request_token: Idempotency token (a time-based token is generated if None)
+    :param wait_until_ready: Wait for the guardrail to become ready before returning
+    :param max_wait_time: Maximum seconds to wait for readiness
+    :param verbose: Print the resolved configuration and progress (errors are always printed)
+    :param compiled_params: Already compiled parameters from compile_guardrail_params (skips compilation)
+    :param extra_tags: Additional tags as a dictionary of key to value
+    :return: Created guardrail ID
+    """
+    log = print if verbose else (lambda *args, **kwargs: None)
+    
+    # Create Bedrock client
+    if bedrock_client is None:
+        with span("client.create", service="bedrock"):
+            bedrock_client = boto3.client('bedrock', region_name=region)
+    
+    # Build the policy from the configuration file
+    if compiled_params is None:
+        compiled_params = compile_guardrail_params(
+            role_name,
+            check_harmful_content=check_harmful_content,
+            check_prompt_attacks=check_prompt_attacks,
+            custom_denied_topics=custom_denied_topics,
+            config_file=config_file,
+            content_filter_level=content_filter_level,
+            filter_types=filter_types,
+            verbose=verbose
+        )
+    
+    managed_word_lists = compiled_params.get("wordPolicyConfig", {}).get("managedWordListsConfig", [])
+    policy_hash = compute_policy_hash(compiled_params)
+    
+    # 'role' if the policy is exactly the role's configuration, 'custom' if topics or filters were changed
+    # (the fleet reconciler only updates 'role' guardrails, so customizations are never overwritten)
+    role_params = compile_guardrail_params(role_name, check_harmful_content, check_prompt_attacks,
+                                           config_file=config_file, verbose=False)
+    policy_source = "role" if compute_policy_hash(role_params) == policy_hash else "custom"
+    
     # Change tag format (convert dictionary to list)
     tags_list = [
         {"key": "RoleName", "value": role_name},
         {"key": "UserId", "value": user_id},
         {"key": "HarmfulContentFilter", "value": str(check_harmful_content)},
         {"key": "PromptAttackPrevention", "value": str(check_prompt_attacks)},
-        {"key": "ProfanityFilter", "value": str(enable_profanity_filter)},
-        {"key": "BlockedTopics", "value": str(len(topics_config))},
-        {"key": "DeniedWords", "value": str(len(words_config))},
+        {"key": "ProfanityFilter", "value": str(any(m.get("type") == "PROFANITY" for m in managed_word_lists))},
+        {"key": "BlockedTopics", "value": str(len(compiled_params.get("topicPolicyConfig", {}).get("topicsConfig", [])))},
+        {"key": "DeniedWords", "value": str(len(compiled_params.get("wordPolicyConfig", {}).get("wordsConfig", [])))},
+        {"key": "PolicyHash", "value": policy_hash},
+        {"key": "PolicySource", "value": policy_source},
         {"key": "CreatedAt", "value": time.strftime("%Y-%m-%d %H:%M:%S")}
     ]
+    tags_list.extend({"key": key, "value": value} for key, value in (extra_tags or {}).items())
     
     # Create guardrail (adjusted for new API structure)
     try:
         create_params = {
             "name": f"Guardrail-{role_name}-{user_id}",
-            "description": f"Dynamically generated guardrail for {role_name}",
-            "blockedInputMessaging": blocked_input_message,
-            "blockedOutputsMessaging": block_message,
+            **compiled_params,
             "tags": tags_list,
-            "clientRequestToken": f"{role_name}-{user_id}-{int(time.time())}"
+            "clientRequestToken": client_request_token or f"{role_name}-{user_id}-{int(time.time())}"
         }
         
-        # Add topic policy only if topics are configured
-        if topics_config:
-            create_params["topicPolicyConfig"] = {
-                "topicsConfig": topics_config
-            }
-        
-        # Add content filters only if filters are configured
-        if filters_config:
-            create_params["contentPolicyConfig"] = {
-                "filtersConfig": filters_config
-            }
-        
-        # Add word policy configuration
-        word_policy = {}
-        if words_config:
-            word_policy["wordsConfig"] = words_config
-        
-        if managed_word_lists_config:
-            word_policy["managedWordListsConfig"] = managed_word_lists_config
-        
-        if word_policy:
-            create_params["wordPolicyConfig"] = word_policy
-        
         # Call guardrail creation API
-        response = bedrock_client.create_guardrail(**create_params)
+        with span("guardrail.create", role=role_name, user=user_id) as create_span:
+            response = bedrock_client.create_guardrail(**create_params)
+            create_span.set_attribute("guardrail_id", response.get('guardrailId', ''))
         
         guardrail_id = response.get('guardrailId', '')
         guardrail_arn = response.get('guardrailArn', '')
         
-        print(f"Guardrail created for {role_name}: {guardrail_id}")
+        log(f"Guardrail created for {role_name}: {guardrail_id}")
         
-        # Wait for guardrail to be created and activated
-        print(f"Waiting for guardrail to become active...")
-        time.sleep(5)  # Minimum wait time
+        if not wait_until_ready:
+            return guardrail_id
         
-        try:
-            max_wait_time = 60  # Wait maximum 60 seconds
-            start_time = time.time()
-            while time.time() - start_time < max_wait_time:
-                status_response = bedrock_client.get_guardrail(
-                    guardrailIdentifier=guardrail_id
-                )
-                status = status_response.get('status')
-                print(f"Current status: {status}")
-    
-                # Proceed if status is ACTIVE or READY
-                if status in ['ACTIVE', 'READY']:
-                    print(f"Guardrail is now {status} and ready to use.")
-                    break
-        
-                time.sleep(5)  # Check status every 5 seconds
-
-            # If maximum wait time is exceeded
-            if time.time() - start_time >= max_wait_time:
-                print("Warning: Maximum wait time exceeded. Proceeding with current status.")
-        except Exception as status_error:
-            print(f"Error checking guardrail status: {str(status_error)}")
-            # Return ID even if status check fails
+        # Wait for guardrail to become ready (exponential backoff, stops on READY/FAILED)
+        log(f"Waiting for guardrail to become ready...")
+        status = wait_for_guardrail_ready(guardrail_id, bedrock_client=bedrock_client,
+                                          max_wait_time=max_wait_time, verbose=verbose)
+        if status == 'FAILED':
+            print(f"Warning: Guardrail {guardrail_id} creation FAILED.")
         
         return guardrail_id
     
@@ -276,6 +559,69 @@ def create_dynamic_guardrail(
         raise e
 
 
+def create_guardrail_version(
+    guardrail_id,
+    description=None,
+    bedrock_client=None,
+    region=AWS_REGION,
+    wait_until_ready=True,
+    max_wait_time=60,
+    verbose=True
+):
+    """
+    Publishes the current draft of a guardrail as an immutable numbered version.
+    
+    :param guardrail_id: Guardrail ID
+    :param description: Version description
+    :param bedrock_client: Existing Bedrock client to reuse (created from region if None)
+    :param region: AWS region
+    :param wait_until_ready: Wait for the version to become ready before returning
+    :param max_wait_time: Maximum seconds to wait for readiness
+    :param verbose: Print progress
+    :return: Version number (string, e.g. '1')
+    """
+    if bedrock_client is None:
+        bedrock_client = boto3.client('bedrock', region_name=region)
+    
+    params = {"guardrailIdentifier": guardrail_id}
+    if description:
+        params["description"] = description
+    
+    try:
+        response = bedrock_client.create_guardrail_version(**params)
+    except Exception as e:
+        print(f"Error creating guardrail version: {str(e)}")
+        raise e
+    
+    version = response.get('version')
+    if verbose:
+        print(f"Published version {version} of guardrail {guardrail_id}.")
+    
+    if wait_until_ready:
+        wait_for_guardrail_ready(guardrail_id, bedrock_client=bedrock_client, max_wait_time=max_wait_time,
+                                 verbose=verbose, guardrail_version=version)
+    
+    return version
+
+
+def list_all_guardrails(bedrock_client):
+    """
+    Lists every guardrail in the account, following nextToken across pages.
+    
+    :param bedrock_client: Bedrock client
+    :return: List of guardrail summaries (id, name, status, ...)
+    """
+    guardrails = []
+    params = {"maxResults": 1000}
+    while True:
+        response = bedrock_client.list_guardrails(**params)
+        guardrails.extend(response.get('guardrails', []))
+        next_token = response.get('nextToken')
+        if not next_token:
+            return guardrails
+        params["nextToken"] = next_token
+
+
 # Get list of available roles
 def get_available_roles(config_file="guardrail_config.json"):
     """
@@ -405,31 +751,50 @@ def main():
                     
                     print(f"Topic '{topic_name}' has been added.")
             
-            # Create guardrail
-            guardrail_id = create_dynamic_guardrail(
-                role_name, 
-                user_id,
-                check_harmful_content=check_harmful,
-                check_prompt_attacks=check_prompt_attacks,
-                custom_denied_topics=custom_topics
-            )
+            # Reuse a guardrail with the same effective policy instead of creating one per user
+            share = ask_yes_no_question("Do you want to share a guardrail with users who have the same policy?", True)
             
-            print(f"\nGuardrail has been successfully created. ID: {guardrail_id}")
+            if share:
+                from guardrail_registry import assign_user_guardrail
+                guardrail_id = assign_user_guardrail(
+                    role_name,
+                    user_id,
+                    check_harmful_content=check_harmful,
+                    check_prompt_attacks=check_prompt_attacks,
+                    custom_denied_topics=custom_topics
+                )
+                print(f"\nGuardrail has been successfully assigned. ID: {guardrail_id}")
+            else:
+                # At the quota, offer to evict least recently used per-user guardrails (asks before deleting)
+                from guardrail_fleet import ensure_guardrail_capacity
+                ensure_guardrail_capacity(1, confirm=True)
+                
+                # Create guardrail
+                guardrail_id = create_dynamic_guardrail(
+                    role_name, 
+                    user_id,
+                    check_harmful_content=check_harmful,
+                    check_prompt_attacks=check_prompt_attacks,
+                    custom_denied_topics=custom_topics
+                )
+                
+                print(f"\nGuardrail has been successfully created. ID: {guardrail_id}")
+                from guardrail_inventory import invalidate_inventory
+                invalidate_inventory()
+                
+                # Publish an immutable version so test results can be pinned to it
+                if ask_yes_no_question("Do you want to publish a numbered version of this guardrail?", False):
+                    version = create_guardrail_version(guardrail_id, description=f"Initial version for {role_name}")
+                    print(f"Use '--guardrail-version {version}' with guardrail_validator.py to test this version.")
             input("\nPress Enter to continue...")
             
         elif choice == '2':
             # View guardrail list
-            bedrock_client = boto3.client('bedrock', region_name=AWS_REGION)
+            from guardrail_inventory import load_inventory, print_inventory
+            refresh = ask_yes_no_question("Do you want to refresh the cached guardrail list?", False)
             try:
-                response = bedrock_client.list_guardrails()
-                guardrails = response.get('guardrails', [])
-                
-                if not guardrails:
-                    print("\nNo guardrails found.")
-                else:
-                    print(f"\nFound {len(guardrails)} guardrails:")
-                    for i, guardrail in enumerate(guardrails):
-                        print(f"{i+1}. ID: {guardrail.get('id')}, Name: {guardrail.get('name')}, Status: {guardrail.get('status')}")
+                snapshot = load_inventory(refresh=refresh)
+                print_inventory(snapshot["guardrails"], snapshot["fetched_at"])
             except Exception as e:
                 print(f"Error fetching guardrails: {str(e)}")
             
@@ -445,6 +810,8 @@ def main():
                 try:
                     bedrock_client.delete_guardrail(guardrailIdentifier=guardrail_id)
                     print(f"Guardrail {guardrail_id} has been deleted.")
+                    from guardrail_inventory import invalidate_inventory
+                    invalidate_inventory()
                 except Exception as e:
                     print(f"Error deleting guardrail: {str(e)}")
             
@@ -487,11 +854,86 @@ def main():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Amazon Bedrock Guardrails Management Tool (interactive menu without a command)")
+    subparsers = parser.add_subparsers(dest="command", help="Command to run")
+    
+    # Desired-state commands
+    plan_parser = subparsers.add_parser("plan", help="Show the changes needed to reach a desired-state file")
+    plan_parser.add_argument("state", help="Desired-state JSON file with roles and users")
+    plan_parser.add_argument("--workers", type=int, default=8, help="Maximum number of concurrent calls")
+    
+    apply_parser = subparsers.add_parser("apply", help="Create, update and delete guardrails to reach a desired-state file")
+    apply_parser.add_argument("state", help="Desired-state JSON file with roles and users")
+    apply_parser.add_argument("--workers", type=int, default=8, help="Maximum number of concurrent calls")
+    apply_parser.add_argument("--rate", type=float, default=2.0, help="Maximum calls per second (default: 2)")
+    apply_parser.add_argument("--max-wait", type=int, default=300, help="Maximum seconds to wait for readiness")
+    apply_parser.add_argument("--yes", action="store_true", help="Do not ask for confirmation")
+    
+    # Inventory commands
+    list_parser = subparsers.add_parser("list", help="List guardrails")
+    list_parser.add_argument("--refresh", action="store_true", help="Fetch a new inventory snapshot instead of the cached one")
+    list_parser.add_argument("--role", help="Only list guardrails of this role")
+    
+    delete_parser = subparsers.add_parser("delete", help="Delete guardrails by ID or by tags")
+    delete_parser.add_argument("guardrail_ids", nargs="*", help="IDs of guardrails to delete")
+    delete_parser.add_argument("--role", help="Delete the guardrails of this role")
+    delete_parser.add_argument("--user", help="Delete the guardrails of this user")
+    delete_parser.add_argument("--older-than", type=float, metavar="DAYS", help="Delete guardrails created more than DAYS days ago")
+    delete_parser.add_argument("--dry-run", action="store_true", help="Only show the selected guardrails without deleting")
+    delete_parser.add_argument("--yes", action="store_true", help="Do not ask for confirmation")
+    delete_parser.add_argument("--workers", type=int, default=8, help="Maximum number of concurrent calls")
+    delete_parser.add_argument("--rate", type=float, default=2.0, help="Maximum delete calls per second (default: 2)")
+    
+    args = parser.parse_args()
+    
     try:
-        main()
+        if args.command is None:
+            main()
+        
+        elif args.command in ("plan", "apply"):
+            from guardrail_fleet import apply_plan, create_fleet_client, load_desired_state, plan_desired_state, print_plan
+            state = load_desired_state(args.state)
+            if state:
+                bedrock_client = create_fleet_client(max_workers=args.workers)
+                plan = plan_desired_state(state, bedrock_client, max_workers=args.workers)
+                print_plan(plan)
+                changes = plan["create"] or plan["update"] or plan["delete"]
+                if args.command == "apply" and changes:
+                    if args.yes or ask_yes_no_question("Do you want to apply this plan?", False):
+                        apply_plan(plan, state["config_file"], bedrock_client, max_workers=args.workers,
+                                   rate=args.rate, max_wait_time=args.max_wait)
+                    else:
+                        print("Apply cancelled.")
+        
+        elif args.command == "list":
+            from guardrail_inventory import find_guardrails_by_tag, load_inventory, print_inventory
+            snapshot = load_inventory(refresh=args.refresh)
+            records = find_guardrails_by_tag("RoleName", args.role) if args.role else snapshot["guardrails"]
+            print_inventory(records, snapshot["fetched_at"])
+        
+        elif args.command == "delete":
+            from guardrail_fleet import create_fleet_client, delete_guardrails, print_delete_plan, select_guardrails
+            bedrock_client = create_fleet_client(max_workers=args.workers)
+            if args.guardrail_ids:
+                records = [{"id": guardrail_id, "name": guardrail_id, "tags": {}} for guardrail_id in args.guardrail_ids]
+            elif args.role or args.user or args.older_than is not None:
+                records = select_guardrails(bedrock_client, role_name=args.role, user_id=args.user,
+                                            older_than_days=args.older_than, max_workers=args.workers)
+            else:
+                records = []
+                print("Error: Give guardrail IDs or at least one of --role, --user or --older-than.")
+            print_delete_plan(records)
+            if records and not args.dry_run:
+                if args.yes or ask_yes_no_question(f"Do you want to delete {len(records)} guardrails?", False):
+                    results = delete_guardrails(records, bedrock_client, max_workers=args.workers, rate=args.rate)
+                    deleted = sum(1 for r in results if r['status'] == 'DELETED')
+                    print(f"\nDeleted {deleted}/{len(results)} guardrails.")
+                else:
+                    print("Deletion cancelled.")
+    
     except KeyboardInterrupt:
         print("\n\nProgram terminated.")
     except Exception as e:
         print(f"\nAn error occurred: {str(e)}")
         import traceback
-        traceback.print_exc()
\ No newline at end of file
+        traceback.print_exc()
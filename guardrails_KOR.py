@@ -2,6 +2,15 @@ import boto3
 import json
 import time
 import os
+from guardrails import wait_for_guardrail_ready  # 준비 상태 대기 로직은 guardrails.py와 공유
+
+# wait_for_guardrail_ready가 출력하는 진행/오류 메시지
+WAIT_MESSAGES_KOR = {
+    "error": "가드레일 상태 확인 중 오류 발생: {error}",
+    "status": "현재 상태: {status}",
+    "ready": "가드레일이 {status} 상태가 되어 사용할 수 있습니다.",
+    "timeout": "경고: 최대 대기 시간을 초과했습니다. 현재 상태로 계속 진행합니다."
+}
 
 # AWS 리전 설정
 AWS_REGION = "us-east-1"  # 사용하려는 리전으로 변경 (예: us-east-1, ap-northeast-2 등)
@@ -238,33 +247,12 @@ def create_dynamic_guardrail(
         
         print(f"Guardrail created for {role_name}: {guardrail_id}")
         
-        # 가드레일이 생성되고 활성화될 때까지 대기
-        print(f"Waiting for guardrail to become active...")
-        time.sleep(5)  # 최소 대기 시간
-        
-        try:
-            max_wait_time = 60  # 최대 60초 대기
-            start_time = time.time()
-            while time.time() - start_time < max_wait_time:
-                status_response = bedrock_client.get_guardrail(
-                    guardrailIdentifier=guardrail_id
-                )
-                status = status_response.get('status')
-                print(f"Current status: {status}")
-    
-                # ACTIVE 또는 READY 상태면 진행
-                if status in ['ACTIVE', 'READY']:
-                    print(f"Guardrail is now {status} and ready to use.")
-                    break
-        
-                time.sleep(5)  # 5초마다 상태 확인
-
-            # 최대 대기 시간을 초과했을 경우
-            if time.time() - start_time >= max_wait_time:
-                print("Warning: Maximum wait time exceeded. Proceeding with current status.")
-        except Exception as status_error:
-            print(f"Error checking guardrail status: {str(status_error)}")
-            # 상태 확인에 실패해도 ID는 반환
+        # 가드레일이 준비될 때까지 대기 (지수 백오프, READY/FAILED 상태에서 즉시 종료)
+        print("가드레일이 준비될 때까지 대기 중...")
+        status = wait_for_guardrail_ready(guardrail_id, bedrock_client=bedrock_client, max_wait_time=60,
+                                          messages=WAIT_MESSAGES_KOR)
+        if status == 'FAILED':
+            print(f"경고: 가드레일 {guardrail_id} 생성에 실패했습니다 (FAILED).")
         
         return guardrail_id
     